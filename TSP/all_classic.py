@@ -3,6 +3,7 @@ import time
 import math
 import os
 import matplotlib.pyplot as plt
+from tour_output import save_result
 
 
 def read_tsp_file(file_path):
@@ -128,9 +129,9 @@ if __name__ == "__main__":
         total_execution_time += execution_time
         diff_result = get_diff_result(os.path.basename(file_path), tour_cost)
         print(f"TSP Name: {tsp_name}")
-        print(f"Optimal tour: {tour}")
         print(f"Tour cost: {tour_cost}")
         print(f"Difference from optimal: {diff_result}")
         print(f"Execution time: {execution_time} seconds")
+        save_result("all_classic", tsp_name, tour, tour_cost, execution_time)
         plot_graph(coordinates, tour, tsp_name)
     print(f"Total Execution Time: {total_execution_time} seconds")
@@ -1,6 +1,9 @@
 import time
 import numpy as np
 
+import metrics
+from cell_index import CellIndex
+
 
 def read_tsp_file(file_path):
     coordinates = {}
@@ -27,20 +30,10 @@ def read_tsp_file(file_path):
     return tsp_name, coordinates
 
 
-def chebyshev_distance(coord1, coord2):
-    return max(abs(coord1[0] - coord2[0]), abs(coord1[1] - coord2[1]))
-
-
 def generate_distance_matrix(coordinates):
-    num_nodes = len(coordinates)
-    node_to_index = {node_id: idx for idx, node_id in enumerate(coordinates.keys())}
-    distance_matrix = np.zeros((num_nodes, num_nodes))
-    for node_id1, coord1 in coordinates.items():
-        for node_id2, coord2 in coordinates.items():
-            idx1 = node_to_index[node_id1]
-            idx2 = node_to_index[node_id2]
-            distance_matrix[idx1][idx2] = chebyshev_distance(coord1, coord2)
-    return distance_matrix
+    # MAX_2D to metryka Czebyszewa w TSPLIB, liczona wektorowo
+    points = np.array(list(coordinates.values()))
+    return metrics.distance_matrix(points, "MAX_2D")
 
 
 def nearest_neighbor_partitioned_tsp(distance_matrix, partitions, node_to_index):
@@ -48,14 +41,13 @@ def nearest_neighbor_partitioned_tsp(distance_matrix, partitions, node_to_index)
     full_tour = []
     total_cost = 0
 
-    for part in partitions:
-        min_x, max_x, min_y, max_y = part
+    nodes = list(coordinates.keys())
+    index = CellIndex.from_partitions(np.array(list(coordinates.values()), dtype=float), partitions)
 
-        cities_in_partition = [
-            node_id
-            for node_id, coord in coordinates.items()
-            if min_x <= coord[0] <= max_x and min_y <= coord[1] <= max_y
-        ]
+    for cell in index:
+        cities_in_partition = [nodes[idx] for idx in cell.tolist()]
+        if not cities_in_partition:
+            continue
 
         start_node = cities_in_partition[
             0
@@ -3,6 +3,9 @@ import time
 import math
 import os
 import matplotlib.pyplot as plt
+import numpy as np
+from cell_index import CellIndex
+from tour_output import save_result, shortcut_tour
 
 
 def read_tsp_file(file_path):
@@ -55,14 +58,13 @@ def nearest_neighbor_partitioned_tsp(G, partitions, coordinates):
     full_tour = []
     total_cost = 0
 
-    for part in partitions:
-        min_x, max_x, min_y, max_y = part
+    nodes = list(coordinates.keys())
+    index = CellIndex.from_partitions(np.array(list(coordinates.values()), dtype=float), partitions)
 
-        cities_in_partition = [
-            node
-            for node, coord in coordinates.items()
-            if min_x <= coord[0] <= max_x and min_y <= coord[1] <= max_y
-        ]
+    for cell in index:
+        cities_in_partition = [nodes[idx] for idx in cell.tolist()]
+        if not cities_in_partition:
+            continue
         start_node = cities_in_partition[0]
         tour = [start_node]
         unvisited = cities_in_partition.copy()
@@ -171,9 +173,11 @@ if __name__ == "__main__":
         total_execution_time += execution_time
         diff_result = get_diff_result(os.path.basename(file_path), tour_cost)
         print(f"TSP Name: {tsp_name}")
-        print(f"Optimal tour: {full_tour}")
         print(f"Tour cost: {tour_cost}")
         print(f"Difference from optimal: {diff_result}")
         print(f"Execution time: {execution_time} seconds")
+        # Do pliku trafia trasa bez powtórzonych miast, z kosztem liczonym dla niej
+        saved_tour = shortcut_tour(full_tour)
+        save_result("all_divided", tsp_name, saved_tour, calculate_tour_cost(G, saved_tour), execution_time)
         plot_graph(coordinates, full_tour, tsp_name)
     print(f"Total Execution Time: {total_execution_time} seconds")
@@ -0,0 +1,207 @@
+import os
+import time
+
+import numpy as np
+
+from anytime import tour_cost
+from insertion import insertion_tour
+from metrics import read_tsp_instance, spatial_points, tour_length
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import get_diff_result
+
+# Wyżarzanie z ruchami oceniani partiami: w każdej partii losujemy batch_size ruchów 2-opt
+# i Or-opt z list sąsiadów, liczymy wszystkie delty naraz (indeksowanie tablic współrzędnych),
+# a z zaakceptowanych stosujemy te, których zakresy pozycji w trasie się nie nakładają.
+# Wtedy delty policzone dla trasy sprzed partii pozostają dokładne.
+
+
+def geometric_cooling(progress, initial_temperature, final_temperature):
+    return initial_temperature * (final_temperature / initial_temperature) ** progress
+
+
+def linear_cooling(progress, initial_temperature, final_temperature):
+    return initial_temperature + (final_temperature - initial_temperature) * progress
+
+
+COOLING_SCHEDULES = {
+    "geometric": geometric_cooling,
+    "linear": linear_cooling,
+}
+
+
+def edge_length(points, u, v):
+    return np.hypot(points[u, 0] - points[v, 0], points[u, 1] - points[v, 1])
+
+
+def two_opt_moves(points, tour, first, second):
+    # Ruch dla pozycji i < j: krawędzie (t[i], t[i+1]), (t[j], t[j+1]) -> (t[i], t[j]), (t[i+1], t[j+1]),
+    # czyli odwrócenie t[i+1..j]. Zwraca deltę i zakres pozycji [lo, hi], które ruch zmienia.
+    i, j = np.minimum(first, second), np.maximum(first, second)
+    valid = (j > i + 1) & (j + 1 < len(tour))
+    j_next = np.minimum(j + 1, len(tour) - 1)
+    a, b, c, d = tour[i], tour[np.minimum(i + 1, len(tour) - 1)], tour[j], tour[j_next]
+    delta = edge_length(points, a, c) + edge_length(points, b, d) - edge_length(points, a, b) - edge_length(points, c, d)
+    return delta, valid, i, j + 1
+
+
+def or_opt_moves(points, tour, start, target, length):
+    # Przeniesienie fragmentu t[start..start+length-1] między t[target] i t[target+1]
+    # w lepszej z dwóch orientacji; zwraca deltę, orientację i zakres zmienianych pozycji
+    last = len(tour) - 1
+    end = start + length - 1
+    valid = (start >= 1) & (end + 1 <= last) & (target + 1 <= last) & ((target < start - 1) | (target > end))
+    clip = lambda positions: np.clip(positions, 0, last)
+    p, s1, s2, n = tour[clip(start - 1)], tour[clip(start)], tour[clip(end)], tour[clip(end + 1)]
+    c, d = tour[clip(target)], tour[clip(target + 1)]
+    removed = edge_length(points, p, s1) + edge_length(points, s2, n) + edge_length(points, c, d)
+    joined = edge_length(points, p, n)
+    forward = joined + edge_length(points, c, s1) + edge_length(points, s2, d) - removed
+    backward = joined + edge_length(points, c, s2) + edge_length(points, s1, d) - removed
+    lo = np.where(target > end, start - 1, target)
+    hi = np.where(target > end, target + 1, end + 1)
+    return np.minimum(forward, backward), backward < forward, valid, lo, hi
+
+
+def apply_two_opt(tour, lo, hi):
+    tour[lo + 1:hi] = tour[lo + 1:hi][::-1].copy()
+
+
+def apply_or_opt(tour, start, length, target, reverse):
+    segment = tour[start:start + length].copy()
+    if reverse:
+        segment = segment[::-1]
+    if target > start:
+        tour[start:target + 1 - length] = tour[start + length:target + 1].copy()
+        tour[target + 1 - length:target + 1] = segment
+    else:
+        tour[target + 1 + length:start + length] = tour[target + 1:start].copy()
+        tour[target + 1:target + 1 + length] = segment
+
+
+def anneal(points, tour, neighbors, max_time=10, batch_size=4096, initial_temperature=None,
+           final_temperature=None, cooling="geometric", or_opt_ratio=0.3, max_segment=1000, seed=None):
+    # tour - otwarta trasa z indeksami miast. cooling - nazwa z COOLING_SCHEDULES albo funkcja
+    # (postęp 0..1, T0, Tk) -> temperatura. Bez podanych temperatur T0 to 0.3 średniej dodatniej
+    # delty pierwszej partii (start z dobrej trasy, więc nie chcemy jej całkiem rozbić),
+    # a Tk = T0 / 100. Zwraca najlepszą znalezioną trasę, jej koszt i liczbę ocenionych
+    # oraz wykonanych ruchów.
+    start_time = time.time()
+    rng = np.random.default_rng(seed)
+    schedule = COOLING_SCHEDULES[cooling] if isinstance(cooling, str) else cooling
+    points = np.ascontiguousarray(points, dtype=float)
+    tour = np.array(tour, dtype=np.int64)
+    num_nodes = len(tour)
+    position = np.empty(num_nodes, dtype=np.int64)
+    position[tour] = np.arange(num_nodes)
+    cost = tour_cost(points, tour)
+    best, best_cost = tour.copy(), cost
+    evaluated = applied = 0
+    if num_nodes < 8:
+        return best.tolist(), best_cost, evaluated, applied
+
+    while time.time() - start_time < max_time:
+        # Przesunięcie trasy o losową liczbę pozycji, żeby ruchy przez koniec tablicy
+        # (pomijane jako zawijające się) nie były zawsze te same
+        shift = int(rng.integers(num_nodes))
+        tour = np.roll(tour, shift)
+        position = (position + shift) % num_nodes
+
+        cities = rng.integers(num_nodes, size=batch_size)
+        targets = neighbors[cities, rng.integers(neighbors.shape[1], size=batch_size)]
+        is_or_opt = rng.random(batch_size) < or_opt_ratio
+        lengths = rng.integers(1, 4, size=batch_size)
+
+        delta, valid, lo, hi = two_opt_moves(points, tour, position[cities], position[targets])
+        or_delta, reverse, or_valid, or_lo, or_hi = or_opt_moves(
+            points, tour, position[cities], position[targets], lengths
+        )
+        delta = np.where(is_or_opt, or_delta, delta)
+        valid = np.where(is_or_opt, or_valid, valid)
+        lo = np.where(is_or_opt, or_lo, lo)
+        hi = np.where(is_or_opt, or_hi, hi)
+        valid &= hi - lo <= max_segment
+        evaluated += batch_size
+
+        if initial_temperature is None:
+            uphill = delta[valid & (delta > 0)]
+            initial_temperature = 0.3 * float(uphill.mean()) if len(uphill) else 1.0
+        if final_temperature is None:
+            final_temperature = initial_temperature / 100
+        progress = min(1.0, (time.time() - start_time) / max_time)
+        temperature = schedule(progress, initial_temperature, final_temperature)
+
+        with np.errstate(over="ignore"):
+            accepted = valid & ((delta < 0) | (rng.random(batch_size) < np.exp(-delta / max(temperature, 1e-12))))
+        candidates = np.flatnonzero(accepted)
+        if len(candidates) == 0:
+            continue
+        # Zachłannie po początku zakresu: ruch zostaje, jeśli zaczyna się za końcem
+        # wszystkich wcześniejszych zakresów (także odrzuconych - prościej i bez pętli)
+        candidates = candidates[np.argsort(lo[candidates], kind="stable")]
+        reach = np.maximum.accumulate(hi[candidates])
+        keep = np.ones(len(candidates), dtype=bool)
+        keep[1:] = lo[candidates[1:]] > reach[:-1]
+        chosen = candidates[keep]
+
+        starts = position[cities[chosen]]
+        move_targets = position[targets[chosen]]
+        for move, start, target in zip(chosen.tolist(), starts.tolist(), move_targets.tolist()):
+            if is_or_opt[move]:
+                apply_or_opt(tour, start, int(lengths[move]), target, reverse[move])
+            else:
+                apply_two_opt(tour, int(lo[move]), int(hi[move]))
+        for move in chosen.tolist():
+            position[tour[lo[move]:hi[move] + 1]] = np.arange(lo[move], hi[move] + 1)
+        cost += float(delta[chosen].sum())
+        applied += len(chosen)
+        if cost < best_cost - 1e-9:
+            best, best_cost = tour.copy(), cost
+
+    # Koszt liczony od nowa, żeby nie kumulować błędów zaokrągleń sum delt
+    return best.tolist(), tour_cost(points, best), evaluated, applied
+
+
+def annealing_tsp(coordinates, max_time=30, seed=None, metric="EUC_2D", **options):
+    # Wyżarzanie na współrzędnych z spatial_points, zwracany koszt w metryce instancji
+    start_time = time.time()
+    node_ids, points = coordinates_to_array(coordinates)
+    search_points = spatial_points(points, metric)
+    neighbors = nearest_neighbor_lists(search_points, k=8)
+
+    tour = insertion_tour(search_points, method="farthest")
+    remaining = max_time - (time.time() - start_time)
+    tour, _, _, _ = anneal(search_points, tour, neighbors, max_time=remaining, seed=seed, **options)
+    total_cost = tour_length(points, tour, metric)
+    tour = [node_ids[idx] for idx in tour]
+    tour.append(tour[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+    for file_path in files:
+        tsp_name, coordinates, metric = read_tsp_instance(file_path)
+        node_ids, points = coordinates_to_array(coordinates)
+        points = spatial_points(points, metric)
+        start = insertion_tour(points, method="farthest")
+        _, _, evaluated, applied = anneal(points, start, nearest_neighbor_lists(points, k=8), max_time=10, seed=0)
+        print(f"TSP Name: {tsp_name}")
+        print(f"Moves evaluated: {evaluated} ({evaluated / 10:.0f}/s), applied: {applied}")
+        for cooling in COOLING_SCHEDULES:
+            tour, tour_cost_value, execution_time = annealing_tsp(coordinates, max_time=10, seed=0, metric=metric,
+                                                                  cooling=cooling)
+            total_execution_time += execution_time
+            print(f"{cooling} cooling: {tour_cost_value} ({get_diff_result(os.path.basename(file_path), tour_cost_value)})")
+            print(f"Execution time: {execution_time} seconds")
+    print(f"Total Execution Time: {total_execution_time} seconds")
@@ -0,0 +1,180 @@
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from insertion import insertion_tour
+from metrics import read_tsp_instance, spatial_points, tour_length
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import get_diff_result
+from two_level_list import two_opt_or_opt
+
+# System mrówkowy MAX-MIN na grafie kandydatów: feromon i heurystyka są tablicami (n, k)
+# równoległymi do list k najbliższych sąsiadów, więc pamięć to O(nk), a nie O(n^2).
+# Mrówki budują trasy po listach sąsiadów; gdy wszyscy kandydaci są odwiedzeni,
+# idą do najbliższego nieodwiedzonego miasta, jak nearest_neighbor_tsp. Kolonia pracuje na
+# współrzędnych z spatial_points, a koszt zwracanej trasy liczymy w metryce instancji.
+shared = {}
+
+
+def attach_instance(points, neighbors):
+    shared["points"] = points
+    shared["neighbors"] = neighbors
+
+
+def candidate_heuristic(points, neighbors):
+    lengths = np.hypot(*(points[:, None, :] - points[neighbors]).transpose(2, 0, 1))
+    return 1.0 / np.maximum(lengths, 1e-9)
+
+
+def neighbor_slots(neighbors, u, v):
+    # Pozycja v na liście sąsiadów u (-1, jeśli krawędzi nie ma w grafie kandydatów)
+    match = neighbors[u] == v[:, None]
+    return np.where(match.any(axis=1), match.argmax(axis=1), -1)
+
+
+def tour_costs(points, tours):
+    # Długości wielu zamkniętych tras naraz, tours - tablica (liczba tras, n)
+    following = np.roll(tours, -1, axis=1)
+    return np.hypot(*(points[tours] - points[following]).transpose(2, 0, 1)).sum(axis=1)
+
+
+def construct_tours(choice, num_ants, rng):
+    # Wszystkie mrówki partii robią krok jednocześnie: wybór z listy kandydatów
+    # z prawdopodobieństwem proporcjonalnym do choice = tau^alpha * eta^beta
+    points, neighbors = shared["points"], shared["neighbors"]
+    num_nodes = len(points)
+    ants = np.arange(num_ants)
+    tours = np.empty((num_ants, num_nodes), dtype=np.int32)
+    visited = np.zeros((num_ants, num_nodes), dtype=bool)
+    current = rng.integers(num_nodes, size=num_ants)
+    tours[:, 0] = current
+    visited[ants, current] = True
+    for step in range(1, num_nodes):
+        candidates = neighbors[current]
+        weights = choice[current] * ~visited[ants[:, None], candidates]
+        cumulative = np.cumsum(weights, axis=1)
+        threshold = (1.0 - rng.random(num_ants)) * cumulative[:, -1]
+        picked = np.minimum((cumulative < threshold[:, None]).sum(axis=1), neighbors.shape[1] - 1)
+        following = candidates[ants, picked]
+        stuck = np.flatnonzero(cumulative[:, -1] <= 0)
+        if len(stuck):
+            gaps = np.hypot(*(points[None, :, :] - points[current[stuck], None, :]).transpose(2, 0, 1))
+            gaps[visited[stuck]] = np.inf
+            following[stuck] = gaps.argmin(axis=1)
+        tours[:, step] = following
+        visited[ants, following] = True
+        current = following
+    return tours
+
+
+def ant_batch(task):
+    # Partia mrówek w jednym procesie; opcjonalnie każda trasa poprawiona 2-opt/Or-opt
+    # w czasie, który został do deadline (time.time() całej kolonii), po nim trasy zostają bez poprawek
+    choice, num_ants, local_search, seed, deadline = task
+    points, neighbors = shared["points"], shared["neighbors"]
+    tours = construct_tours(choice, num_ants, np.random.default_rng(seed))
+    if local_search:
+        for ant in range(num_ants):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            tours[ant] = two_opt_or_opt(points, tours[ant].tolist(), neighbors, max_time=remaining).to_list()
+    return tours, tour_costs(points, tours)
+
+
+def deposit(pheromone, neighbors, tour, amount):
+    # Krawędzie trasy w obu kierunkach; te spoza grafu kandydatów pomijamy
+    following = np.roll(tour, -1)
+    for u, v in ((tour, following), (following, tour)):
+        slots = neighbor_slots(neighbors, u, v)
+        inside = slots >= 0
+        np.add.at(pheromone, (u[inside], slots[inside]), amount)
+
+
+def ant_colony_tsp(coordinates, ants=20, alpha=1.0, beta=2.0, rho=0.2, p_best=0.05, k=10, local_search=True,
+                   global_best_every=5, restart_after=50, workers=None, max_time=60, seed=None, metric="EUC_2D"):
+    start_time = time.time()
+    workers = workers or os.cpu_count()
+    node_ids, instance_points = coordinates_to_array(coordinates)
+    points = spatial_points(instance_points, metric)
+    num_nodes = len(points)
+    neighbors = nearest_neighbor_lists(points, k=min(k, num_nodes - 1))
+    heuristic = candidate_heuristic(points, neighbors) ** beta
+    seeds = random.Random(seed)
+
+    # Trasa z wstawiania służy tylko do startowego poziomu feromonu
+    start = np.array(insertion_tour(points, method="farthest"), dtype=np.int32)
+    best, best_cost = None, np.inf
+    # Granice MMAS: tau_max = 1 / (rho * C*), tau_min z prawdopodobieństwa p_best zbudowania
+    # najlepszej trasy po zbieżności (średnio k / 2 kandydatów do wyboru w kroku)
+    decay = p_best ** (1.0 / num_nodes)
+    bounds = lambda cost: (
+        1.0 / (rho * cost),
+        min(1.0, (1.0 - decay) / ((neighbors.shape[1] / 2 - 1) * decay)) / (rho * cost),
+    )
+    tau_max, tau_min = bounds(float(tour_costs(points, start[None, :])[0]))
+    pheromone = np.full(neighbors.shape, tau_max)
+
+    batches = [len(batch) for batch in np.array_split(np.arange(ants), min(workers, ants))]
+    iteration = stale = 0
+    with multiprocessing.get_context().Pool(len(batches), initializer=attach_instance,
+                                            initargs=(points, neighbors)) as pool:
+        while best is None or time.time() - start_time < max_time:
+            choice = pheromone ** alpha * heuristic
+            tasks = [(choice, size, local_search, seeds.randrange(2 ** 32), start_time + max_time) for size in batches]
+            results = pool.map(ant_batch, tasks)
+            tours = np.vstack([tours for tours, _ in results])
+            costs = np.concatenate([costs for _, costs in results])
+            iteration += 1
+
+            leader = int(costs.argmin())
+            stale += 1
+            if costs[leader] < best_cost - 1e-9:
+                best, best_cost = tours[leader].copy(), float(costs[leader])
+                tau_max, tau_min = bounds(best_cost)
+                stale = 0
+
+            pheromone *= 1.0 - rho
+            if iteration % global_best_every == 0:
+                deposit(pheromone, neighbors, best, 1.0 / best_cost)
+            else:
+                deposit(pheromone, neighbors, tours[leader], 1.0 / costs[leader])
+            np.clip(pheromone, tau_min, tau_max, out=pheromone)
+            # Stagnacja: feromon wraca do tau_max, najlepsza trasa zostaje
+            if stale >= restart_after:
+                pheromone.fill(tau_max)
+                stale = 0
+
+    total_cost = tour_length(instance_points, best, metric)
+    tour = [node_ids[idx] for idx in best.tolist()]
+    tour.append(tour[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+    ]
+    for file_path in files:
+        tsp_name, coordinates, metric = read_tsp_instance(file_path)
+        print(f"TSP Name: {tsp_name}")
+        for local_search in (False, True):
+            tour, tour_cost_value, execution_time = ant_colony_tsp(
+                coordinates, local_search=local_search, max_time=30, seed=0, metric=metric
+            )
+            total_execution_time += execution_time
+            label = "MMAS + 2-opt/Or-opt" if local_search else "MMAS"
+            print(f"{label}: {tour_cost_value} ({get_diff_result(os.path.basename(file_path), tour_cost_value)})")
+            print(f"Execution time: {execution_time} seconds")
+    print(f"Total Execution Time: {total_execution_time} seconds")
@@ -0,0 +1,251 @@
+import hashlib
+import math
+import os
+import random
+import struct
+import time
+from array import array
+
+import numpy as np
+
+from insertion import insertion_tour
+from metrics import read_tsp_instance, spatial_points, tour_length
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import get_diff_result
+from two_level_list import TwoLevelList, two_opt_pass, two_opt_two_level, undo_exchanges
+
+# Nagłówek checkpointu: magic, wersja, liczba miast, iteracja, koszt, indeks stanu RNG,
+# odcisk instancji (sha256 identyfikatorów i współrzędnych)
+CHECKPOINT_MAGIC = b"TSPF"
+CHECKPOINT_HEADER = struct.Struct("<4sHIQdI32s")
+
+
+def instance_fingerprint(node_ids, points):
+    digest = hashlib.sha256()
+    digest.update(np.asarray(node_ids, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(points, dtype=float).tobytes())
+    return digest.digest()
+
+
+def tour_cost(points, tour):
+    closed = np.append(np.asarray(tour), tour[0])
+    return float(np.hypot(*(points[closed[1:]] - points[closed[:-1]]).T).sum())
+
+
+def write_checkpoint(path, tour, cost, iteration, rng, fingerprint=bytes(32)):
+    # Zapis przez plik tymczasowy i os.replace, żeby przerwane zadanie
+    # nie zostawiło uszkodzonego checkpointu
+    version, internal_state, _ = rng.getstate()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(CHECKPOINT_HEADER.pack(
+            CHECKPOINT_MAGIC, version, len(tour), iteration, cost, internal_state[-1], fingerprint
+        ))
+        file.write(array("I", internal_state[:-1]).tobytes())
+        file.write(array("i", tour).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, num_nodes, iteration, cost, state_index, fingerprint = CHECKPOINT_HEADER.unpack_from(data)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError(f"{path} is not a TSP checkpoint")
+
+    offset = CHECKPOINT_HEADER.size
+    internal_state = array("I")
+    internal_state.frombytes(data[offset:offset + 624 * 4])
+    offset += 624 * 4
+    tour = array("i")
+    tour.frombytes(data[offset:offset + num_nodes * 4])
+
+    rng = random.Random()
+    rng.setstate((version, tuple(internal_state) + (state_index,), None))
+    return list(tour), cost, iteration, rng, fingerprint
+
+
+def double_bridge(tour, rng, window=50):
+    # Lokalny double-bridge: trzy cięcia w oknie o długości window,
+    # żeby późniejszy 2-opt miał do naprawienia tylko mały fragment
+    num_nodes = len(tour)
+    start = rng.randrange(num_nodes)
+    tour = tour[start:] + tour[:start]
+    span = min(window, num_nodes - 1)
+    i, j, k = sorted(rng.sample(range(1, span + 1), 3))
+    new_tour = tour[:i] + tour[j:k] + tour[i:j] + tour[k:]
+    touched = {tour[i - 1], tour[i], tour[j - 1], tour[j], tour[k - 1], tour[k % num_nodes]}
+    return new_tour, list(touched)
+
+
+def double_bridge_two_level(tour_list, rng, x, y, window=50):
+    # Ten sam ruch na TwoLevelList jako trzy wymiany krawędzi (a-B-C-d -> a-C-B-d), bez
+    # kopiowania trasy. Zwraca dziennik wymian (do cofnięcia), miasta końców i zmianę kosztu.
+    num_nodes = len(tour_list)
+    city = rng.randrange(num_nodes)
+    span = min(window, num_nodes - 1)
+    i, j, k = sorted(rng.sample(range(1, span + 1), 3))
+    stretch = [city]
+    for _ in range(k):
+        stretch.append(tour_list.next(stretch[-1]))
+    a, b1, b2, c1, c2, d = stretch[i - 1], stretch[i], stretch[j - 1], stretch[j], stretch[k - 1], stretch[k]
+
+    def dist(u, v):
+        return math.hypot(x[u] - x[v], y[u] - y[v])
+
+    journal = [(a, b1, c2, d), (a, c2, c1, b2), (c2, b2, b1, d)]
+    for move in journal:
+        tour_list.exchange(*move)
+    delta = dist(a, c1) + dist(c2, b1) + dist(b2, d) - dist(a, b1) - dist(b2, c1) - dist(c2, d)
+    return journal, list({a, b1, b2, c1, c2, d}), delta
+
+
+def publish(progress, tour, cost, elapsed):
+    # progress to funkcja zwrotna albo kolejka (queue.Queue / multiprocessing.Queue)
+    if progress is None:
+        return
+    if hasattr(progress, "put_nowait"):
+        progress.put_nowait((tour, cost, elapsed))
+    else:
+        progress(tour, cost, elapsed)
+
+
+def anytime_two_opt(points, tour, max_time=50, progress=None, checkpoint_path=None,
+                    checkpoint_interval=30, rng=None, iteration=0, node_ids=None,
+                    lower_bound=None, target_gap=None, progress_interval=0.0, instance_points=None,
+                    metric="EUC_2D"):
+    # Iterowany 2-opt: perturbacja double-bridge + lokalna naprawa, akceptujemy tylko poprawy.
+    # Trasa to jedna TwoLevelList przez wszystkie iteracje: perturbację i 2-opt wykonujemy
+    # na niej, koszt liczymy z delt, a odrzuconą próbę cofamy z dziennika wymian.
+    # Poprawy są publikowane nie częściej niż co progress_interval sekund (ostatnia zawsze),
+    # a co checkpoint_interval sekund zapisywany jest checkpoint.
+    # Z lower_bound i target_gap (w %) kończymy, gdy trasa jest dość blisko ograniczenia dolnego.
+    # Z instance_points publikowany i zwracany koszt to tour_length w metryce instancji.
+    start_time = time.time()
+    rng = rng or random.Random()
+    neighbors = nearest_neighbor_lists(points, k=10)
+    last_report = -math.inf
+    pending = False
+    published_cost = None
+
+    best = two_opt_two_level(points, tour, neighbors, max_time=max_time)
+    best_cost = tour_cost(points, best)
+    num_nodes = len(best)
+    tour_list = TwoLevelList(best)
+    x, y = points[:, 0].tolist(), points[:, 1].tolist()
+    neighbor_rows = neighbors.tolist()
+    fingerprint = instance_fingerprint(range(num_nodes) if node_ids is None else node_ids, points)
+
+    def report(cost, force=False):
+        nonlocal last_report, pending, published_cost
+        if progress is None:
+            return
+        now = time.time()
+        if not force and now - last_report < progress_interval:
+            pending = True
+            return
+        labelled = tour_list.to_list()
+        if instance_points is not None:
+            cost = tour_length(instance_points, labelled, metric)
+        if node_ids is not None:
+            labelled = [node_ids[idx] for idx in labelled]
+        publish(progress, labelled + labelled[:1], cost, now - start_time)
+        last_report, pending, published_cost = now, False, cost
+
+    report(best_cost)
+    last_checkpoint = time.time()
+
+    def good_enough(cost):
+        return lower_bound is not None and target_gap is not None and cost <= lower_bound * (1 + target_gap / 100)
+
+    while num_nodes >= 8 and time.time() - start_time < max_time and not good_enough(best_cost):
+        iteration += 1
+        journal, touched, delta = double_bridge_two_level(tour_list, rng, x, y)
+        remaining = max_time - (time.time() - start_time)
+        delta += two_opt_pass(tour_list, x, y, neighbor_rows, touched, max_time=remaining, journal=journal)
+        if delta < -1e-9:
+            best_cost += delta
+            report(best_cost)
+        else:
+            undo_exchanges(tour_list, journal)
+
+        if checkpoint_path and time.time() - last_checkpoint >= checkpoint_interval:
+            write_checkpoint(checkpoint_path, tour_list.to_list(), best_cost, iteration, rng, fingerprint)
+            last_checkpoint = time.time()
+
+    # Koszt liczony od nowa, żeby nie kumulować błędów zaokrągleń sum delt
+    best = tour_list.to_list()
+    best_cost = tour_cost(points, best) if instance_points is None else tour_length(instance_points, best, metric)
+    if pending or published_cost != best_cost:
+        report(best_cost, force=True)
+    if checkpoint_path:
+        write_checkpoint(checkpoint_path, best, best_cost, iteration, rng, fingerprint)
+    return best, best_cost, iteration
+
+
+def anytime_tsp(coordinates, max_time=50, progress=None, checkpoint_path=None,
+                checkpoint_interval=30, resume=False, seed=None, lower_bound=None, target_gap=None,
+                progress_interval=0.0, metric="EUC_2D"):
+    # Przeszukiwanie na współrzędnych z spatial_points (w tej przestrzeni jest też lower_bound);
+    # koszty w postępie i zwracany koszt są w metryce instancji
+    start_time = time.time()
+    node_ids, points = coordinates_to_array(coordinates)
+    search_points = spatial_points(points, metric)
+
+    if resume and checkpoint_path and os.path.exists(checkpoint_path):
+        tour, _, iteration, rng, fingerprint = read_checkpoint(checkpoint_path)
+        if fingerprint != instance_fingerprint(node_ids, search_points):
+            raise ValueError(f"Checkpoint {checkpoint_path} was written for a different instance")
+    else:
+        tour = insertion_tour(search_points, method="farthest")
+        iteration = 0
+        rng = random.Random(seed)
+
+    remaining = max_time - (time.time() - start_time)
+    tour, total_cost, _ = anytime_two_opt(
+        search_points, tour, max_time=remaining, progress=progress, checkpoint_path=checkpoint_path,
+        checkpoint_interval=checkpoint_interval, rng=rng, iteration=iteration, node_ids=node_ids,
+        lower_bound=lower_bound, target_gap=target_gap, progress_interval=progress_interval,
+        instance_points=points, metric=metric,
+    )
+    tour = [node_ids[idx] for idx in tour]
+    tour.append(tour[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+
+    def show_progress(tour, cost, elapsed):
+        print(f"  {elapsed:8.2f} s  {cost:.1f}")
+
+    if not os.path.exists("checkpoints"):
+        os.makedirs("checkpoints")
+    for file_path in files:
+        tsp_name, coordinates, metric = read_tsp_instance(file_path)
+        tour, tour_cost_value, execution_time = anytime_tsp(
+            coordinates,
+            max_time=10,
+            metric=metric,
+            progress=show_progress,
+            checkpoint_path=os.path.join("checkpoints", f"{tsp_name}.ckpt"),
+            resume=True,
+        )
+        total_execution_time += execution_time
+        diff_result = get_diff_result(os.path.basename(file_path), tour_cost_value)
+        print(f"TSP Name: {tsp_name}")
+        print(f"Tour cost: {tour_cost_value}")
+        print(f"Difference from optimal: {diff_result}")
+        print(f"Execution time: {execution_time} seconds")
+    print(f"Total Execution Time: {total_execution_time} seconds")
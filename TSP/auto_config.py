@@ -0,0 +1,311 @@
+import json
+import math
+import os
+import random
+import time
+
+import numpy as np
+
+import kernels
+from anytime import anytime_two_opt
+from generator import generate_instance
+from insertion import insertion_tour
+from metrics import read_tsp_instance, spatial_points, tour_length
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from out_of_core import tile_grid, tile_ids
+from show_quality import get_diff_result
+from tour_output import append_summary
+from two_level_list import two_opt_or_opt
+
+# Model kosztu etapów: czas = exp(log_a) * size^b * clustering^c (+ stały narzut "overhead" na kawałek)
+# sekund, pamięć = m * size^e MB.
+# Współczynniki startowe pochodzą z pomiarów na instancjach jednostajnych (calibrate_model),
+# a każde uruchomienie zapisuje przewidziany i rzeczywisty czas, z których model jest poprawiany.
+COST_MODEL_PATH = "cost_model.json"
+COST_LOG_PATH = os.path.join("results", "cost_log.jsonl")
+DEFAULT_MODEL = {
+    "farthest_insertion": {"time": [-9.82, 1.02, 0.0], "memory": [5e-4, 1.0]},
+    "or_opt": {"time": [-10.08, 1.02, 0.0], "memory": [1e-3, 1.0]},
+    "nearest_neighbor_matrix": {"time": [-15.14, 1.79, 0.0], "memory": [1.6e-5, 2.0], "overhead": 2.0e-4},
+    "neighbor_lists": {"time": [-11.51, 1.0, 0.0], "memory": [2e-4, 1.0]},
+}
+SAFETY = 0.8
+MIN_PARTITION_SIZE = 16
+
+
+def load_model(path=COST_MODEL_PATH):
+    # Etapy, których nie ma w zapisanym modelu (starszym niż DEFAULT_MODEL), biorą wartości startowe
+    model = json.loads(json.dumps(DEFAULT_MODEL))
+    if os.path.exists(path):
+        with open(path) as file:
+            model.update(json.load(file))
+    return model
+
+
+def save_model(model, path=COST_MODEL_PATH):
+    with open(path, "w") as file:
+        json.dump(model, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def clustering_ratio(points, sample_size=2000, seed=0):
+    # Średnia odległość do najbliższego sąsiada względem oczekiwanej dla rozkładu
+    # jednostajnego (0.5 * sqrt(pole / n)); < 1 oznacza skupiska
+    rng = np.random.default_rng(seed)
+    points = np.asarray(points, dtype=float)
+    sample = points[rng.choice(len(points), size=min(sample_size, len(points)), replace=False)]
+    if len(sample) < 2:
+        return 1.0
+    nearest = nearest_neighbor_lists(sample, k=1)[:, 0]
+    observed = np.hypot(*(sample - sample[nearest]).T).mean()
+    # Próbka jest rzadsza niż całość, więc oczekiwaną odległość liczymy dla liczności próbki
+    area = max(np.ptp(points[:, 0]) * np.ptp(points[:, 1]), 1e-12)
+    expected = 0.5 * math.sqrt(area / len(sample))
+    return float(max(observed / expected, 1e-3))
+
+
+def predict(model, stage, size, clustering=1.0, count=1):
+    # count kawałków po size miast (etap dzielony na partycje); pamięć - jednego kawałka naraz
+    log_a, b, c = model[stage]["time"]
+    m, e = model[stage]["memory"]
+    seconds = count * (math.exp(log_a) * max(size, 1) ** b * clustering ** c + model[stage].get("overhead", 0.0))
+    memory = m * max(size, 1) ** e
+    return seconds, memory
+
+
+def plan_pipeline(num_nodes, clustering, time_budget, memory_budget, model):
+    # Najpierw wariant jakościowy (farthest insertion + Or-opt + iterowany 2-opt przez resztę
+    # czasu); jeśli się nie mieści, najbliższy sąsiad na partycjach z najmniejszą liczbą
+    # partycji, która mieści się w budżecie, i Or-opt przez pozostały czas. Poprawa
+    # potrzebuje list k najbliższych sąsiadów, więc ich budowa też musi się zmieścić.
+    budget = SAFETY * time_budget
+    construction, construction_memory = predict(model, "farthest_insertion", num_nodes, clustering)
+    lists, lists_memory = predict(model, "neighbor_lists", num_nodes, clustering)
+    improvement, improvement_memory = predict(model, "or_opt", num_nodes, clustering)
+    if (construction + lists + improvement <= budget
+            and max(construction_memory, lists_memory, improvement_memory) <= memory_budget):
+        return {
+            "constructor": "farthest_insertion", "partitions": 1,
+            "improvement": "or_opt+iterated_two_opt",
+            "predicted": {"farthest_insertion": construction, "neighbor_lists": lists, "or_opt": improvement},
+            "improvement_budget": budget - construction - lists,
+        }
+
+    # Liczba partycji rośnie czwórkami (siatka 1x1, 2x2, 4x4, ...); narzut na partycję
+    # sprawia, że więcej partycji nie zawsze jest szybsze, więc jeśli nic się nie mieści,
+    # zostaje wariant o najmniejszym przewidywanym czasie
+    options = []
+    partitions = 1
+    while True:
+        size = math.ceil(num_nodes / partitions)
+        construction, memory = predict(model, "nearest_neighbor_matrix", size, clustering, count=partitions)
+        if memory <= memory_budget:
+            options.append((construction, partitions))
+            if construction <= budget:
+                break
+        if size <= MIN_PARTITION_SIZE:
+            break
+        partitions *= 4
+    if not options:
+        # Żaden wariant nie mieści się w pamięci - zostają najmniejsze partycje
+        options.append((construction, partitions))
+    construction, partitions = options[-1] if options[-1][0] <= budget else min(options)
+    improvement, _ = predict(model, "or_opt", num_nodes, clustering)
+    remaining = budget - construction - lists
+    if remaining <= 0 or lists_memory > memory_budget:
+        return {
+            "constructor": "nearest_neighbor_matrix", "partitions": partitions, "improvement": "none",
+            "predicted": {"nearest_neighbor_matrix": construction}, "improvement_budget": 0.0,
+        }
+    return {
+        "constructor": "nearest_neighbor_matrix", "partitions": partitions, "improvement": "or_opt",
+        "predicted": {"nearest_neighbor_matrix": construction, "neighbor_lists": lists,
+                      "or_opt": min(improvement, remaining)},
+        "improvement_budget": remaining,
+    }
+
+
+def partitioned_nearest_neighbor(points, partitions):
+    # Partycje z kwantyli (jak kafelki w out_of_core), odwiedzane wężykiem; w każdej
+    # najbliższy sąsiad po macierzy odległości, zaczynając od miasta najbliższego końcowi
+    # poprzedniej partycji
+    tile_budget = max(1, math.ceil(len(points) / partitions / 0.8))
+    col_edges, row_edges = tile_grid(points, tile_budget)
+    tiles = tile_ids(points, col_edges, row_edges)
+    by_tile = np.argsort(tiles, kind="stable")
+    offsets = np.searchsorted(tiles[by_tile], np.arange(tiles.max() + 2))
+    tour = []
+    for tile in range(len(offsets) - 1):
+        cities = by_tile[offsets[tile]:offsets[tile + 1]]
+        if len(cities) == 0:
+            continue
+        matrix = kernels.distance_matrix(points[cities])
+        start = 0
+        if tour:
+            last = points[tour[-1]]
+            start = int(np.argmin(np.hypot(points[cities, 0] - last[0], points[cities, 1] - last[1])))
+        tour.extend(cities[kernels.nearest_neighbor_order(matrix, start)].tolist())
+    return tour
+
+
+def run_pipeline(points, plan, time_budget, seed=None):
+    # Zwraca trasę i rzeczywiste czasy etapów; etapy poprawy same pilnują budżetu, a listy
+    # sąsiadów budujemy tylko wtedy, gdy według planu zdążą przed końcem budżetu
+    start_time = time.time()
+    actual = {}
+    if plan["constructor"] == "farthest_insertion":
+        tour = insertion_tour(points, method="farthest")
+    else:
+        tour = partitioned_nearest_neighbor(points, plan["partitions"])
+    actual[plan["constructor"]] = time.time() - start_time
+
+    remaining = SAFETY * time_budget - (time.time() - start_time)
+    if plan["improvement"] != "none" and len(tour) >= 8 and plan["predicted"]["neighbor_lists"] < remaining:
+        stage_start = time.time()
+        neighbors = nearest_neighbor_lists(points, k=8)
+        actual["neighbor_lists"] = time.time() - stage_start
+        stage_start = time.time()
+        remaining = SAFETY * time_budget - (time.time() - start_time)
+        tour = two_opt_or_opt(points, tour, neighbors, max_time=remaining).to_list()
+        # Czas przerwanego Or-optu nic nie mówi o modelu, zapisujemy tylko zbieżny
+        if time.time() - stage_start < 0.95 * remaining:
+            actual["or_opt"] = time.time() - stage_start
+        remaining = SAFETY * time_budget - (time.time() - start_time)
+        if plan["improvement"] == "or_opt+iterated_two_opt" and remaining > 0:
+            tour, _, _ = anytime_two_opt(points, tour, max_time=remaining, rng=random.Random(seed))
+    return tour, actual
+
+
+def recalibrate(model, records, rate=0.3, min_records=5):
+    # Przy wystarczającej liczbie pomiarów o różnych rozmiarach dopasowujemy wszystkie
+    # współczynniki czasu (MNK w skali log); inaczej przesuwamy tylko log_a w stronę
+    # średniego log(rzeczywisty / przewidziany). Przewidywania liczymy obecnym modelem, a nie
+    # bierzemy zapisanych w logu, więc ponowne użycie tych samych pomiarów zbiega do nich
+    # zamiast przesuwać model dalej.
+    for stage in model:
+        rows = [
+            (record["stage_sizes"][stage], record["clustering"], record["stage_counts"][stage],
+             record["actual"][stage])
+            for record in records
+            if stage in record["actual"] and record["actual"][stage] > 1e-3
+        ]
+        if not rows:
+            continue
+        sizes = np.array([row[0] for row in rows], dtype=float)
+        if len(rows) >= min_records and sizes.max() >= 4 * sizes.min():
+            overhead = model[stage].get("overhead", 0.0)
+            per_piece = np.log([max(row[3] / row[2] - overhead, 1e-9) for row in rows])
+            log_clustering = np.log([row[1] for row in rows])
+            # Wykładnik skupienia dopasowujemy tylko, gdy pomiary różnią się skupieniem
+            if np.ptp(log_clustering) >= 0.5:
+                design = np.column_stack([np.ones(len(rows)), np.log(sizes), log_clustering])
+                coefficients, *_ = np.linalg.lstsq(design, per_piece, rcond=None)
+            else:
+                c = model[stage]["time"][2]
+                design = np.column_stack([np.ones(len(rows)), np.log(sizes)])
+                coefficients, *_ = np.linalg.lstsq(design, per_piece - c * log_clustering, rcond=None)
+                coefficients = [*coefficients, c]
+            model[stage]["time"] = [float(value) for value in coefficients]
+        else:
+            predicted = [predict(model, stage, size, clustering, count)[0] for size, clustering, count, _ in rows]
+            shift = float(np.mean(np.log([row[3] / value for row, value in zip(rows, predicted)])))
+            model[stage]["time"][0] += rate * shift
+    return model
+
+
+def read_cost_log(path=COST_LOG_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def auto_tsp(coordinates, time_budget=10, memory_budget=1024, model=None, log_path=COST_LOG_PATH, seed=None,
+             metric="EUC_2D"):
+    start_time = time.time()
+    node_ids, points = coordinates_to_array(coordinates)
+    search_points = spatial_points(points, metric)
+    model = model or load_model()
+    clustering = clustering_ratio(search_points)
+
+    plan = plan_pipeline(len(points), clustering, time_budget, memory_budget, model)
+    tour, actual = run_pipeline(search_points, plan, time_budget - (time.time() - start_time), seed=seed)
+    total_cost = tour_length(points, tour, metric)
+
+    if log_path:
+        size = math.ceil(len(points) / plan["partitions"])
+        record = {
+            "n": len(points), "clustering": clustering, "time_budget": time_budget, "plan": plan["constructor"],
+            "partitions": plan["partitions"], "predicted": plan["predicted"], "actual": actual,
+            "stage_sizes": {stage: size if stage == "nearest_neighbor_matrix" else len(points) for stage in actual},
+            "stage_counts": {stage: plan["partitions"] if stage == "nearest_neighbor_matrix" else 1 for stage in actual},
+            "total_time": time.time() - start_time,
+        }
+        directory = os.path.dirname(log_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        append_summary(log_path, record)
+
+    tour = [node_ids[idx] for idx in tour]
+    tour.append(tour[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time, plan
+
+
+def calibrate_model(sizes=(1000, 4000, 16000), kind="uniform"):
+    # Pomiar każdego etapu osobno na instancjach syntetycznych i dopasowanie wykładników
+    model = json.loads(json.dumps(DEFAULT_MODEL))
+    records = []
+    for num_nodes in sizes:
+        points = generate_instance(kind, num_nodes)
+        clustering = clustering_ratio(points)
+        actual = {}
+        stage_start = time.time()
+        tour = insertion_tour(points, method="farthest")
+        actual["farthest_insertion"] = time.time() - stage_start
+        stage_start = time.time()
+        neighbors = nearest_neighbor_lists(points, k=8)
+        actual["neighbor_lists"] = time.time() - stage_start
+        stage_start = time.time()
+        two_opt_or_opt(points, tour, neighbors, max_time=600)
+        actual["or_opt"] = time.time() - stage_start
+        size = min(num_nodes, 4000)
+        stage_start = time.time()
+        kernels.nearest_neighbor_order(kernels.distance_matrix(points[:size]), 0)
+        actual["nearest_neighbor_matrix"] = time.time() - stage_start
+        records.append({
+            "clustering": clustering, "actual": actual,
+            "predicted": {stage: predict(model, stage, num_nodes, clustering)[0] for stage in actual},
+            "stage_sizes": {"farthest_insertion": num_nodes, "neighbor_lists": num_nodes, "or_opt": num_nodes,
+                            "nearest_neighbor_matrix": size},
+            "stage_counts": {stage: 1 for stage in actual},
+        })
+    return recalibrate(model, records, min_records=len(sizes))
+
+
+if __name__ == "__main__":
+    model = load_model()
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+    for time_budget in (0.5, 5):
+        for file_path in files:
+            tsp_name, coordinates, metric = read_tsp_instance(file_path)
+            tour, tour_cost, execution_time, plan = auto_tsp(coordinates, time_budget=time_budget, model=model,
+                                                             metric=metric)
+            print(f"TSP Name: {tsp_name}, budget {time_budget} s")
+            print(f"Plan: {plan['constructor']} x{plan['partitions']} + {plan['improvement']}")
+            print(f"Tour cost: {tour_cost} ({get_diff_result(os.path.basename(file_path), tour_cost)})")
+            print(f"Execution time: {execution_time} seconds")
+
+    # Poprawka modelu na podstawie zapisanych przewidywań i rzeczywistych czasów
+    model = recalibrate(model, read_cost_log())
+    save_model(model)
+    print(f"Recalibrated model saved to {COST_MODEL_PATH}")
@@ -0,0 +1,148 @@
+import math
+import os
+import time
+
+import numpy as np
+
+import show_very_fast
+from cell_index import CellIndex, grid_cell_ids, partition_edges
+from metrics import read_tsp_instance, scalar_distance
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from parallel_local_search import STICKY
+from show_quality import get_diff_result
+from two_level_list import two_opt_or_opt
+
+
+def border_halo(points, partitions, order, width=3.0):
+    # Miasta w pasie o szerokości width średnich odstępów między miastami wokół wewnętrznych
+    # linii siatki oraz otoczenia końców krawędzi trasy przechodzących między komórkami (zszyć).
+    # Tylko wektorowe porównania - żadnych list sąsiadów dla całej instancji.
+    x_edges, y_edges = partition_edges(partitions)
+    span = points.max(axis=0) - points.min(axis=0)
+    band = width * math.sqrt(max(span[0] * span[1], 1e-12) / len(points))
+    near = np.zeros(len(points), dtype=bool)
+    for axis, edges in ((0, x_edges), (1, y_edges)):
+        for edge in edges[1:-1].tolist():
+            near |= np.abs(points[:, axis] - edge) <= band
+    cells = grid_cell_ids(points, x_edges, y_edges)[order]
+    jumps = np.flatnonzero(cells != np.roll(cells, -1))
+    # Zszycie zaczyna się w dowolnym miejscu komórki, więc razem z jego końcami bierzemy
+    # miasta z ich otoczenia (siatka o boku band, sprawdzamy 3x3 komórki wokół końca) -
+    # inaczej 2-opt nie miałby z czym ich połączyć
+    fine = np.floor((points - points.min(axis=0)) / band).astype(np.int64)
+    rows = int(fine[:, 1].max()) + 1
+    index = CellIndex(fine[:, 0] * rows + fine[:, 1], (int(fine[:, 0].max()) + 1) * rows)
+    for city in np.unique(np.concatenate([order[jumps], order[(jumps + 1) % len(order)]])).tolist():
+        column, row = fine[city].tolist()
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                if 0 <= row + dy < rows and 0 <= column + dx < len(index) // rows:
+                    members = index.cell((column + dx) * rows + row + dy)
+                    close = np.hypot(points[members, 0] - points[city, 0], points[members, 1] - points[city, 1]) <= band
+                    near[members[close]] = True
+    return near
+
+
+def refine_partition_borders(coordinates, tour, partitions, k=8, max_time=10, distance=None, width=3.0):
+    # tour - zamknięta trasa z identyfikatorami miast; miasta powtórzone w trasie
+    # (np. all16 zamyka trasę każdej partycji) zostają tylko przy pierwszym wystąpieniu.
+    # 2-opt/Or-opt działa tylko na miastach halo: odcinek trasy między kolejnymi miastami
+    # halo staje się jedną krawędzią, której ruchy nie mogą usunąć (jak w parallel_local_search).
+    # Zwraca poprawioną trasę, liczbę miast halo i zmianę kosztu.
+    node_ids, points = coordinates_to_array(coordinates)
+    ids = np.asarray(node_ids)
+    by_id = np.argsort(ids)
+    positions = by_id[np.searchsorted(ids[by_id], np.asarray(tour))]
+    _, first = np.unique(positions, return_index=True)
+    order = positions[np.sort(first)]
+
+    halo_positions = np.flatnonzero(border_halo(points, partitions, order, width=width)[order])
+    halo = order[halo_positions]
+    num_halo = len(halo)
+    if num_halo < 8:
+        return list(tour), num_halo, 0.0
+
+    # Lokalny indeks i to miasto halo[i]; krawędź (i, i + 1) jest stała, jeśli w trasie
+    # między nimi leżą inne miasta - zapamiętujemy je w kierunku od i do i + 1
+    following = np.roll(halo_positions, -1)
+    following[-1] += len(order)
+    gaps = np.flatnonzero(following - halo_positions > 1).tolist()
+    cyclic = np.concatenate([order, order])
+    inner = {}
+    for i in gaps:
+        inner[(i, (i + 1) % num_halo)] = cyclic[halo_positions[i] + 1:following[i]]
+    fixed = set(inner) | {(v, u) for u, v in inner}
+
+    local_points = points[halo]
+    if distance is None:
+        x, y = local_points[:, 0].tolist(), local_points[:, 1].tolist()
+
+        def base_distance(u, v):
+            return math.hypot(x[u] - x[v], y[u] - y[v])
+    else:
+        local_coordinates = [coordinates[node_ids[city]] for city in halo.tolist()]
+
+        def base_distance(u, v):
+            return distance(local_coordinates[u], local_coordinates[v])
+
+    def local_distance(u, v):
+        if (u, v) in fixed:
+            return -STICKY
+        return base_distance(u, v)
+
+    def free_cost(local_tour):
+        return sum(
+            base_distance(u, v)
+            for u, v in zip(local_tour, local_tour[1:] + local_tour[:1])
+            if (u, v) not in fixed
+        )
+
+    neighbors = nearest_neighbor_lists(local_points, k=min(k, num_halo - 1))
+    before = free_cost(list(range(num_halo)))
+    local_tour = two_opt_or_opt(
+        local_points, list(range(num_halo)), neighbors, max_time=max_time, distance=local_distance
+    ).to_list(start=0)
+    change = free_cost(local_tour) - before
+
+    refined = []
+    halo = halo.tolist()
+    for u, v in zip(local_tour, local_tour[1:] + local_tour[:1]):
+        refined.append(halo[u])
+        if (u, v) in inner:
+            refined.extend(inner[(u, v)].tolist())
+        elif (v, u) in inner:
+            refined.extend(inner[(v, u)][::-1].tolist())
+    refined = [node_ids[idx] for idx in refined]
+    refined.append(refined[0])
+    return refined, num_halo, change
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+    for file_path in files:
+        tsp_name, tour, tour_cost, execution_time = show_very_fast.nearest_neighbor_partitioned_tsp(
+            file_path, refine_borders=False
+        )
+        _, coordinates, metric = read_tsp_instance(file_path)
+        partitions = show_very_fast.partition_space(coordinates)
+
+        start_time = time.time()
+        refined, halo_size, change = refine_partition_borders(
+            coordinates, tour, partitions, distance=scalar_distance(metric)
+        )
+        refine_time = time.time() - start_time
+        refined_cost = tour_cost + change
+        total_execution_time += execution_time + refine_time
+        print(f"TSP Name: {tsp_name}")
+        print(f"Tour cost: {tour_cost} ({get_diff_result(os.path.basename(file_path), tour_cost)})")
+        print(f"Refined tour cost: {refined_cost} ({get_diff_result(os.path.basename(file_path), refined_cost)})")
+        print(f"Border halo: {halo_size} of {len(coordinates)} cities")
+        print(f"Execution time: {execution_time} + {refine_time} seconds")
+    print(f"Total Execution Time: {total_execution_time} seconds")
@@ -0,0 +1,54 @@
+import math
+
+import numpy as np
+
+# Indeks miast w komórkach siatki w układzie CSR: order to indeksy miast posortowane
+# po komórkach, a miasta komórki c to order[offsets[c]:offsets[c + 1]] (widok, bez kopii).
+# Komórki są półotwarte [a, b), tylko ostatnia w każdym wymiarze obejmuje prawą granicę,
+# więc każde miasto trafia do dokładnie jednej komórki.
+
+
+def partition_edges(partitions):
+    # Granice kwadratowej siatki z listy prostokątów (min_x, max_x, min_y, max_y)
+    # w kolejności z partition_space: i (x) zewnętrzne, j (y) wewnętrzne
+    side = math.isqrt(len(partitions))
+    if side * side != len(partitions):
+        raise ValueError(f"Expected a square grid of partitions, got {len(partitions)}")
+    x_edges = [partitions[i * side][0] for i in range(side)] + [partitions[-1][1]]
+    y_edges = [partitions[j][2] for j in range(side)] + [partitions[side - 1][3]]
+    return np.array(x_edges), np.array(y_edges)
+
+
+def grid_cell_ids(points, x_edges, y_edges):
+    # Numer komórki i * (liczba wierszy) + j, jak kolejność prostokątów w partition_space
+    column = np.digitize(points[:, 0], x_edges[1:-1])
+    row = np.digitize(points[:, 1], y_edges[1:-1])
+    return column * (len(y_edges) - 1) + row
+
+
+class CellIndex:
+    def __init__(self, cell_ids, num_cells):
+        # Sortowanie stabilne zachowuje kolejność wejścia w komórce; dla małych typów
+        # całkowitych NumPy sortuje pozycyjnie, więc budowa jest liniowa
+        cell_ids = np.asarray(cell_ids)
+        if num_cells <= np.iinfo(np.int16).max:
+            cell_ids = cell_ids.astype(np.int16)
+        self.order = np.argsort(cell_ids, kind="stable")
+        self.offsets = np.zeros(num_cells + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell_ids, minlength=num_cells), out=self.offsets[1:])
+
+    @classmethod
+    def from_partitions(cls, points, partitions):
+        x_edges, y_edges = partition_edges(partitions)
+        cell_ids = grid_cell_ids(np.asarray(points, dtype=float), x_edges, y_edges)
+        return cls(cell_ids, (len(x_edges) - 1) * (len(y_edges) - 1))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def cell(self, cell):
+        return self.order[self.offsets[cell]:self.offsets[cell + 1]]
+
+    def __iter__(self):
+        for cell in range(len(self)):
+            yield self.cell(cell)
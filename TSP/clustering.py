@@ -0,0 +1,96 @@
+import math
+
+import numpy as np
+
+from neighbors import coordinates_to_array
+
+
+def squared_distances(points, centers):
+    return ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+
+
+def kmeans_plus_plus(points, num_clusters, rng):
+    centers = [points[rng.integers(len(points))]]
+    closest = squared_distances(points, np.array(centers))[:, 0]
+    for _ in range(1, num_clusters):
+        total = closest.sum()
+        idx = rng.choice(len(points), p=closest / total) if total > 0 else rng.integers(len(points))
+        centers.append(points[idx])
+        closest = np.minimum(closest, ((points - points[idx]) ** 2).sum(axis=1))
+    return np.array(centers)
+
+
+def minibatch_kmeans(points, num_clusters, batch_size=1024, iterations=100, seed=0):
+    rng = np.random.default_rng(seed)
+    sample = points[rng.choice(len(points), size=min(len(points), 10 * batch_size), replace=False)]
+    centers = kmeans_plus_plus(sample, num_clusters, rng)
+    counts = np.zeros(num_clusters)
+
+    for _ in range(iterations):
+        batch = points[rng.integers(len(points), size=min(batch_size, len(points)))]
+        labels = squared_distances(batch, centers).argmin(axis=1)
+        # Aktualizacja środków ze współczynnikiem uczenia 1 / liczba przypisanych punktów
+        batch_counts = np.bincount(labels, minlength=num_clusters)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, batch)
+        counts += batch_counts
+        moved = batch_counts > 0
+        rate = batch_counts[moved] / counts[moved]
+        centers[moved] += rate[:, None] * (sums[moved] / batch_counts[moved, None] - centers[moved])
+
+    return centers
+
+
+def balanced_assignment(points, centers, max_size):
+    # Każdy punkt idzie do najbliższego środka; z przepełnionych klastrów zostają
+    # najbliższe max_size punkty, reszta szuka najbliższego klastra z wolnym miejscem
+    num_clusters = len(centers)
+    distances = squared_distances(points, centers)
+    labels = np.full(len(points), -1)
+    free = np.full(num_clusters, max_size)
+    pending = np.arange(len(points))
+
+    while len(pending):
+        options = distances[pending].copy()
+        options[:, free == 0] = np.inf
+        choice = options.argmin(axis=1)
+        order = np.lexsort((options[np.arange(len(pending)), choice], choice))
+        sorted_choice = choice[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_choice, sorted_choice)
+        accepted = rank < free[sorted_choice]
+        labels[pending[order[accepted]]] = sorted_choice[accepted]
+        free -= np.bincount(sorted_choice[accepted], minlength=num_clusters)
+        pending = pending[order[~accepted]]
+
+    return labels
+
+
+def order_clusters(centers):
+    # Kolejność odwiedzania klastrów - najbliższy sąsiad po środkach klastrów
+    order = [0]
+    remaining = set(range(1, len(centers)))
+    while remaining:
+        last = centers[order[-1]]
+        nearest = min(remaining, key=lambda idx: ((centers[idx] - last) ** 2).sum())
+        order.append(nearest)
+        remaining.remove(nearest)
+    return order
+
+
+def cluster_partitions(coordinates, num_clusters=16, max_size=None, slack=0.25, seed=0):
+    node_ids, points = coordinates_to_array(coordinates)
+    num_clusters = max(1, min(num_clusters, len(node_ids)))
+    if max_size is None:
+        max_size = math.ceil(len(node_ids) / num_clusters * (1 + slack))
+    # Limit musi pozwalać zmieścić wszystkie miasta
+    num_clusters = max(num_clusters, math.ceil(len(node_ids) / max_size))
+
+    centers = minibatch_kmeans(points, num_clusters, seed=seed)
+    labels = balanced_assignment(points, centers, max_size)
+
+    partitions = []
+    for cluster in order_clusters(centers):
+        members = np.flatnonzero(labels == cluster)
+        if len(members):
+            partitions.append([node_ids[idx] for idx in members])
+    return partitions
@@ -0,0 +1,134 @@
+import math
+import os
+import time
+
+import numpy as np
+
+from generator import uniform_instance
+from metrics import scalar_distance
+from neighbors import coordinates_to_array
+from show_quality import nearest_neighbor_tsp, read_tsp_file
+
+
+def leader_labels(points, radius):
+    # Zachłannie w kolejności wejścia: miasto dołącza do najbliższego lidera w promieniu radius,
+    # a jeśli takiego nie ma, samo zostaje liderem. Liderów szukamy w siatce o boku radius
+    # (komórka miasta i 8 sąsiednich). Grupa mieści się w kole o promieniu radius wokół lidera.
+    cells = np.floor((points - points.min(axis=0)) / radius).astype(np.int64).tolist()
+    x, y = points[:, 0].tolist(), points[:, 1].tolist()
+    leaders = {}
+    label = list(range(len(points)))
+    for city, (cx, cy) in enumerate(cells):
+        best, best_distance = city, math.inf
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for leader in leaders.get((i, j), ()):
+                    d = math.hypot(x[leader] - x[city], y[leader] - y[city])
+                    if d <= radius and d < best_distance:
+                        best, best_distance = leader, d
+        if best == city:
+            leaders.setdefault((cx, cy), []).append(city)
+        label[city] = best
+    return np.array(label, dtype=np.int64)
+
+
+def collapse_duplicates(points, epsilon=0.0):
+    # Miasta o tych samych współrzędnych łączymy w jedno; przy epsilon > 0 dodatkowo
+    # miasta bliskie sobie, ale tak, żeby średnica grupy nie przekroczyła epsilon
+    # (lider i miasta w promieniu epsilon / 2). Zwraca indeksy reprezentantów i dla
+    # każdego miasta numer jego reprezentanta w zredukowanym zbiorze.
+    points = np.asarray(points, dtype=float)
+    _, representatives, parent = np.unique(points, axis=0, return_index=True, return_inverse=True)
+    # Reprezentanci w kolejności wejścia, żeby zredukowana instancja zachowała kolejność miast
+    order = np.argsort(representatives)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    representatives, parent = representatives[order], rank[parent.ravel()]
+    if epsilon > 0 and len(representatives):
+        # Lider jest pierwszym miastem swojej grupy, więc kolejność wejścia zostaje zachowana
+        leaders, leader_rank = np.unique(leader_labels(points[representatives], epsilon / 2), return_inverse=True)
+        representatives, parent = representatives[leaders], leader_rank.ravel()[parent]
+    return representatives, parent
+
+
+def group_members(parent, representatives):
+    # Dla każdego reprezentanta lista pozostałych miast jego grupy (CSR: members, offsets)
+    by_group = np.argsort(parent, kind="stable")
+    offsets = np.searchsorted(parent[by_group], np.arange(len(representatives) + 1))
+    is_member = np.ones(len(parent), dtype=bool)
+    is_member[representatives] = False
+    return by_group, offsets, is_member
+
+
+def expand_tour(tour, parent, representatives):
+    # tour - trasa po indeksach zredukowanego zbioru; każdego reprezentanta zastępujemy
+    # nim samym i zaraz po nim pozostałymi miastami jego grupy
+    by_group, offsets, is_member = group_members(parent, representatives)
+    by_group = by_group.tolist()
+    offsets = offsets.tolist()
+    expanded = []
+    for group in tour:
+        expanded.append(int(representatives[group]))
+        expanded.extend(city for city in by_group[offsets[group]:offsets[group + 1]] if is_member[city])
+    return expanded
+
+
+def collapsed_tsp(coordinates, solver=nearest_neighbor_tsp, epsilon=0.0, distance=None):
+    # solver(coordinates) -> (zamknięta trasa, koszt, czas), jak pozostałe solvery w repo.
+    # Dokładne duplikaty wracają do trasy za darmo; przy epsilon > 0 dochodzi koszt
+    # przejść wewnątrz grup, liczony funkcją distance w metryce solvera (domyślnie EUC_2D,
+    # w której miasta bliższe niż 0.5 są w odległości 0).
+    start_time = time.time()
+    node_ids, points = coordinates_to_array(coordinates)
+    representatives, parent = collapse_duplicates(points, epsilon=epsilon)
+    reduced = {node_ids[idx]: coordinates[node_ids[idx]] for idx in representatives.tolist()}
+
+    reduced_tour, total_cost, _ = solver(reduced)
+    node_to_group = {node_ids[idx]: group for group, idx in enumerate(representatives.tolist())}
+    tour = expand_tour([node_to_group[node_id] for node_id in reduced_tour[:-1]], parent, representatives)
+
+    if epsilon > 0:
+        distance = distance or scalar_distance("EUC_2D")
+        position = points.tolist()
+        group_of = parent.tolist()
+        first_city = representatives.tolist()
+        for i, city in enumerate(tour):
+            following = tour[(i + 1) % len(tour)]
+            if group_of[city] == group_of[following]:
+                total_cost += distance(position[city], position[following])
+            elif city != first_city[group_of[city]]:
+                # Grupę opuszczamy z ostatniego członka, a nie z reprezentanta
+                total_cost += distance(position[city], position[following]) - distance(
+                    position[first_city[group_of[city]]], position[following]
+                )
+    tour = [node_ids[idx] for idx in tour]
+    tour.append(tour[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time
+
+
+if __name__ == "__main__":
+    # Instancja z duplikatami: 3000 miast, z których 2000 to kopie albo punkty odległe o < 0.5
+    rng = np.random.default_rng(0)
+    base = uniform_instance(1000) / 100
+    copies = base[rng.integers(len(base), size=2000)] + rng.uniform(-0.2, 0.2, size=(2000, 2)) * (rng.random((2000, 1)) < 0.5)
+    points = np.vstack([base, copies])
+    coordinates = {idx + 1: (x, y) for idx, (x, y) in enumerate(points.tolist())}
+
+    for epsilon in (0.0, 0.5):
+        representatives, _ = collapse_duplicates(points, epsilon=epsilon)
+        tour, tour_cost, execution_time = collapsed_tsp(coordinates, epsilon=epsilon)
+        print(f"epsilon={epsilon}: {len(points)} cities -> {len(representatives)} solved")
+        print(f"Tour cost: {tour_cost}")
+        print(f"Execution time: {execution_time} seconds")
+    tour, tour_cost, execution_time = nearest_neighbor_tsp(coordinates)
+    print(f"Without collapsing: {len(points)} cities solved")
+    print(f"Tour cost: {tour_cost}")
+    print(f"Execution time: {execution_time} seconds")
+
+    tsp_name, coordinates = read_tsp_file(os.path.join("files", "pr2392.tsp"))
+    _, points = coordinates_to_array(coordinates)
+    print(f"{tsp_name}: {len(points)} cities, {len(collapse_duplicates(points)[0])} distinct")
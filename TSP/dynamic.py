@@ -0,0 +1,367 @@
+import heapq
+import math
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from insertion import insertion_tour
+from metrics import read_tsp_instance, scalar_distance, spatial_points
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import get_diff_result
+from two_level_list import two_opt_or_opt
+
+
+class DynamicTour:
+    # Trasa zmieniająca się w czasie: miasta można dodawać, usuwać i przesuwać.
+    # Trasa to lista dwukierunkowa (succ/pred na slotach), indeks przestrzenny to siatka
+    # kubełków. Po zmianie naprawiamy trasę 2-optem i Or-optem tylko wokół zmienionych
+    # miast, więc koszt aktualizacji zależy od wielkości zmiany, a nie od n.
+    # Siatka i kandydaci liczeni są na x, y z spatial_points, koszt - w metryce instancji
+    # na oryginalnych współrzędnych (position).
+    __slots__ = ("ids", "position", "x", "y", "succ", "pred", "alive", "slot_of", "free", "cell_size",
+                 "cells", "bounds", "cost", "k", "max_reverse", "metric", "distance")
+
+    def __init__(self, coordinates, tour=None, k=8, max_reverse=1000, max_time=10, metric="EUC_2D"):
+        if not coordinates:
+            raise ValueError("DynamicTour needs at least one city")
+        node_ids, instance_points = coordinates_to_array(coordinates)
+        points = spatial_points(instance_points, metric)
+        self.metric = metric
+        self.distance = scalar_distance(metric)
+        self.ids = list(node_ids)
+        self.position = [tuple(point) for point in instance_points.tolist()]
+        self.x = points[:, 0].tolist()
+        self.y = points[:, 1].tolist()
+        self.alive = [True] * len(node_ids)
+        self.slot_of = {node_id: slot for slot, node_id in enumerate(node_ids)}
+        self.free = []
+        self.k = k
+        self.max_reverse = max_reverse
+
+        if tour is None:
+            order = insertion_tour(points, method="farthest")
+            if len(order) >= 5:
+                order = two_opt_or_opt(points, order, nearest_neighbor_lists(points, k=k), max_time=max_time).to_list()
+        else:
+            order = [self.slot_of[node_id] for node_id in tour]
+            if len(order) > 1 and order[0] == order[-1]:
+                order = order[:-1]
+        self.succ = [0] * len(node_ids)
+        self.pred = [0] * len(node_ids)
+        for position, slot in enumerate(order):
+            following = order[(position + 1) % len(order)]
+            self.succ[slot] = following
+            self.pred[following] = slot
+
+        # Rozmiar komórki dobrany tak, żeby na komórkę przypadały średnio ~2 miasta
+        width = max(np.ptp(points[:, 0]), np.ptp(points[:, 1]), 1.0)
+        self.cell_size = width / max(1.0, math.sqrt(len(points) / 2))
+        self.cells = {}
+        # Prostokąt komórek, w których były miasta (tylko rośnie) - dalej pierścienie nie sięgają
+        self.bounds = [math.inf, math.inf, -math.inf, -math.inf]
+        for slot in range(len(node_ids)):
+            self.place(slot)
+        self.cost = sum(self.dist(slot, self.succ[slot]) for slot in order) if len(order) > 1 else 0.0
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def __contains__(self, node_id):
+        return node_id in self.slot_of
+
+    def dist(self, a, b):
+        return self.distance(self.position[a], self.position[b])
+
+    def cell(self, slot):
+        return int(self.x[slot] // self.cell_size), int(self.y[slot] // self.cell_size)
+
+    def place(self, slot):
+        i, j = self.cell(slot)
+        self.cells.setdefault((i, j), []).append(slot)
+        bounds = self.bounds
+        bounds[0], bounds[1] = min(bounds[0], i), min(bounds[1], j)
+        bounds[2], bounds[3] = max(bounds[2], i), max(bounds[3], j)
+
+    def tour(self, start=None):
+        # Zamknięta trasa z identyfikatorami miast, jak zwracają pozostałe solvery
+        if not self.slot_of:
+            return []
+        first = self.slot_of[start] if start is not None else next(iter(self.slot_of.values()))
+        tour = [self.ids[first]]
+        slot = self.succ[first]
+        while slot != first:
+            tour.append(self.ids[slot])
+            slot = self.succ[slot]
+        tour.append(tour[0])
+        return tour
+
+    def nearest(self, x, y, count, exclude=-1):
+        # Przeszukiwanie obwodów kolejnych pierścieni komórek wokół punktu, przyciętych do
+        # prostokąta zajętych komórek; kończymy, gdy count-ty kandydat jest bliżej niż dowolne
+        # miasto z kolejnego pierścienia. Punkt spoza prostokąta albo zbyt wiele odwiedzonych
+        # komórek (pusty obszar wokół odległego miasta) - przegląd wszystkich miast
+        cx, cy = int(x // self.cell_size), int(y // self.cell_size)
+        low_i, low_j, high_i, high_j = self.bounds
+        enough = min(count, len(self.slot_of) - (exclude >= 0))
+        if enough <= 0:
+            return []
+        if not (low_i <= cx <= high_i and low_j <= cy <= high_j):
+            return self.nearest_scan(x, y, count, exclude)
+        max_ring = max(cx - low_i, high_i - cx, cy - low_j, high_j - cy)
+        budget = 2 * len(self.cells) + 9
+        found = []
+        for ring in range(max_ring + 1):
+            if ring == 0:
+                cells = [(cx, cy)]
+            else:
+                columns = range(max(cx - ring, low_i), min(cx + ring, high_i) + 1)
+                rows = range(max(cy - ring + 1, low_j), min(cy + ring - 1, high_j) + 1)
+                cells = [(i, j) for j in (cy - ring, cy + ring) if low_j <= j <= high_j for i in columns]
+                cells += [(i, j) for i in (cx - ring, cx + ring) if low_i <= i <= high_i for j in rows]
+            budget -= len(cells)
+            if budget < 0:
+                return self.nearest_scan(x, y, count, exclude)
+            for cell in cells:
+                for slot in self.cells.get(cell, ()):
+                    if slot != exclude:
+                        found.append((math.hypot(self.x[slot] - x, self.y[slot] - y), slot))
+            if len(found) >= enough:
+                found.sort()
+                if found[enough - 1][0] <= ring * self.cell_size:
+                    break
+        found.sort()
+        return [slot for _, slot in found[:count]]
+
+    def nearest_scan(self, x, y, count, exclude=-1):
+        return heapq.nsmallest(count, (slot for slot in self.slot_of.values() if slot != exclude),
+                               key=lambda slot: math.hypot(self.x[slot] - x, self.y[slot] - y))
+
+    def neighbors(self, slot):
+        return self.nearest(self.x[slot], self.y[slot], self.k, exclude=slot)
+
+    def add(self, node_id, position, repair=True):
+        if node_id in self.slot_of:
+            raise ValueError(f"City {node_id} is already in the tour")
+        position = (float(position[0]), float(position[1]))
+        x, y = spatial_points(np.array([position]), self.metric)[0].tolist()
+        if self.free:
+            slot = self.free.pop()
+            self.ids[slot], self.position[slot], self.x[slot], self.y[slot] = node_id, position, x, y
+            self.alive[slot] = True
+        else:
+            slot = len(self.ids)
+            self.ids.append(node_id)
+            self.position.append(position)
+            self.x.append(x)
+            self.y.append(y)
+            self.succ.append(slot)
+            self.pred.append(slot)
+            self.alive.append(True)
+
+        if not self.slot_of:
+            self.succ[slot] = self.pred[slot] = slot
+        else:
+            # Najtańsze wstawienie obok jednego z k najbliższych miast trasy
+            best_delta, best_edge = math.inf, None
+            for near in self.nearest(self.x[slot], self.y[slot], self.k):
+                for a, b in ((near, self.succ[near]), (self.pred[near], near)):
+                    delta = self.dist(a, slot) + self.dist(slot, b) - self.dist(a, b)
+                    if delta < best_delta:
+                        best_delta, best_edge = delta, (a, b)
+            a, b = best_edge
+            self.succ[a], self.pred[slot], self.succ[slot], self.pred[b] = slot, a, b, slot
+            self.cost += best_delta
+        self.slot_of[node_id] = slot
+        self.place(slot)
+        if repair:
+            self.repair([slot])
+
+    def remove(self, node_id, repair=True):
+        slot = self.slot_of.pop(node_id)
+        a, b = self.pred[slot], self.succ[slot]
+        if a != slot:
+            self.cost += self.dist(a, b) - self.dist(a, slot) - self.dist(slot, b)
+            self.succ[a], self.pred[b] = b, a
+        else:
+            self.cost = 0.0
+        self.cells[self.cell(slot)].remove(slot)
+        self.alive[slot] = False
+        self.free.append(slot)
+        if repair and a != slot:
+            self.repair([a, b])
+
+    def move(self, node_id, position, repair=True):
+        self.remove(node_id, repair=False)
+        self.add(node_id, position, repair=repair)
+
+    def update(self, added=None, removed=(), moved=None):
+        # Zmiana wsadowa: najpierw wszystkie edycje, potem jedna wspólna naprawa
+        touched = []
+        for node_id in removed:
+            slot = self.slot_of[node_id]
+            touched.extend([self.pred[slot], self.succ[slot]])
+            self.remove(node_id, repair=False)
+        for node_id, position in (moved or {}).items():
+            slot = self.slot_of[node_id]
+            touched.extend([self.pred[slot], self.succ[slot]])
+            self.move(node_id, position, repair=False)
+            touched.append(self.slot_of[node_id])
+        for node_id, position in (added or {}).items():
+            self.add(node_id, position, repair=False)
+            touched.append(self.slot_of[node_id])
+        self.repair([slot for slot in touched if self.alive[slot]])
+
+    def reverse_path(self, first, last):
+        # Odwraca ścieżkę first -> ... -> last (idąc po succ)
+        before, after = self.pred[first], self.succ[last]
+        slot = first
+        while True:
+            following = self.succ[slot]
+            self.succ[slot], self.pred[slot] = self.pred[slot], following
+            if slot == last:
+                break
+            slot = following
+        self.succ[before], self.pred[last] = last, before
+        self.succ[first], self.pred[after] = after, first
+
+    def path_within(self, first, last):
+        # Czy last jest osiągalne z first w co najwyżej max_reverse krokach
+        slot = first
+        for _ in range(self.max_reverse):
+            if slot == last:
+                return True
+            slot = self.succ[slot]
+        return False
+
+    def two_opt_move(self, a, b, c, d):
+        # Krawędzie (a, b), (c, d), b = succ(a), d = succ(c) zastępujemy (a, c), (b, d);
+        # odwracamy krótszą z dwóch ścieżek, o ile mieści się w max_reverse
+        if self.path_within(b, c):
+            self.reverse_path(b, c)
+        elif self.path_within(d, a):
+            self.reverse_path(d, a)
+        else:
+            return False
+        return True
+
+    def try_two_opt(self, a):
+        for forward in (True, False):
+            b = self.succ[a] if forward else self.pred[a]
+            d_ab = self.dist(a, b)
+            for c in self.neighbors(a):
+                d_ac = self.dist(a, c)
+                if d_ac >= d_ab:
+                    break
+                d = self.succ[c] if forward else self.pred[c]
+                if c == b or d == a:
+                    continue
+                delta = d_ac + self.dist(b, d) - d_ab - self.dist(c, d)
+                if delta < -1e-9:
+                    moved = self.two_opt_move(a, b, c, d) if forward else self.two_opt_move(d, c, b, a)
+                    if moved:
+                        self.cost += delta
+                        return [a, b, c, d]
+        return None
+
+    def try_or_opt(self, a, max_segment=3):
+        # Przeniesienie segmentu 1-3 miast zaczynającego się w a w inne miejsce trasy
+        first = last = a
+        for _ in range(max_segment):
+            p, q = self.pred[first], self.succ[last]
+            if q == p or q == first:
+                return None
+            removal_gain = self.dist(p, first) + self.dist(last, q) - self.dist(p, q)
+            segment = set()
+            slot = first
+            while True:
+                segment.add(slot)
+                if slot == last:
+                    break
+                slot = self.succ[slot]
+            for c in self.neighbors(first) + self.neighbors(last):
+                if c in segment:
+                    continue
+                for u, v in ((c, self.succ[c]), (self.pred[c], c)):
+                    if u in segment or v in segment:
+                        continue
+                    base = self.dist(u, v)
+                    forward = self.dist(u, first) + self.dist(last, v) - base
+                    backward = self.dist(u, last) + self.dist(first, v) - base
+                    if min(forward, backward) < removal_gain - 1e-9:
+                        self.succ[p], self.pred[q] = q, p
+                        if backward < forward:
+                            self.relink_reversed(first, last, u, v)
+                        else:
+                            self.succ[u], self.pred[first] = first, u
+                            self.succ[last], self.pred[v] = v, last
+                        self.cost += min(forward, backward) - removal_gain
+                        return [p, q, u, v, first, last]
+            last = self.succ[last]
+        return None
+
+    def relink_reversed(self, first, last, u, v):
+        # Wstawia odłączony segment first..last między u i v w odwrotnej kolejności
+        slot = first
+        while True:
+            following = self.succ[slot]
+            self.succ[slot], self.pred[slot] = self.pred[slot], following
+            if slot == last:
+                break
+            slot = following
+        self.succ[u], self.pred[last] = last, u
+        self.succ[first], self.pred[v] = v, first
+
+    def repair(self, slots):
+        # Kolejka "don't look bits" zasiana zmienionymi miastami i ich sąsiadami
+        if len(self.slot_of) < 8:
+            return
+        queue = deque()
+        queued = set()
+        for slot in slots:
+            for seed in [slot] + self.neighbors(slot):
+                if seed not in queued:
+                    queued.add(seed)
+                    queue.append(seed)
+        while queue:
+            a = queue.popleft()
+            queued.discard(a)
+            touched = self.try_two_opt(a) or self.try_or_opt(a)
+            if touched:
+                for slot in touched + [a]:
+                    if slot not in queued:
+                        queued.add(slot)
+                        queue.append(slot)
+
+
+if __name__ == "__main__":
+    files = [
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+    rng = np.random.default_rng(0)
+    for file_path in files:
+        tsp_name, coordinates, metric = read_tsp_instance(file_path)
+        start_time = time.time()
+        dynamic = DynamicTour(coordinates, metric=metric)
+        build_time = time.time() - start_time
+        print(f"TSP Name: {tsp_name}")
+        print(f"Tour cost: {dynamic.cost} ({get_diff_result(os.path.basename(file_path), dynamic.cost)})")
+        print(f"Build time: {build_time} seconds")
+
+        node_ids = list(coordinates)
+        points = np.array(list(coordinates.values()))
+        low, high = points.min(axis=0), points.max(axis=0)
+        for change in (1, 10, 100):
+            removed = rng.choice(node_ids, size=change, replace=False).tolist()
+            start_time = time.time()
+            dynamic.update(removed=removed)
+            dynamic.update(added={node_id: coordinates[node_id] for node_id in removed})
+            moved = {int(node_id): tuple(rng.uniform(low, high)) for node_id in rng.choice(node_ids, size=change)}
+            dynamic.update(moved=moved)
+            update_time = time.time() - start_time
+            coordinates.update(moved)
+            print(f"{change:4d} cities removed, re-added and moved: {update_time * 1000:.1f} ms, "
+                  f"tour cost {dynamic.cost:.0f}")
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+
+# Współrzędne w kwadracie 1 000 000 x 1 000 000, jak w instancjach DIMACS TSP Challenge
+SIDE = 1_000_000
+
+
+def uniform_instance(num_nodes, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, SIDE, size=(num_nodes, 2))
+
+
+def clustered_instance(num_nodes, num_clusters=None, seed=0):
+    # Środki klastrów losowane jednostajnie, miasta z rozkładu normalnego wokół środków
+    rng = np.random.default_rng(seed)
+    num_clusters = num_clusters or max(1, num_nodes // 100)
+    centers = rng.uniform(0, SIDE, size=(num_clusters, 2))
+    labels = rng.integers(num_clusters, size=num_nodes)
+    spread = SIDE / (4 * np.sqrt(num_clusters))
+    points = centers[labels] + rng.normal(0, spread, size=(num_nodes, 2))
+    return np.clip(points, 0, SIDE)
+
+
+def grid_instance(num_nodes, jitter=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(num_nodes)))
+    step = SIDE / side
+    xs, ys = np.meshgrid(np.arange(side), np.arange(side), indexing="ij")
+    points = np.column_stack([xs.ravel(), ys.ravel()])[:num_nodes] * step
+    if jitter:
+        points = points + rng.uniform(-jitter, jitter, size=points.shape) * step
+    return points
+
+
+def dimacs_instance(num_nodes, kind="E", seed=0):
+    # Odpowiedniki generatorów portcgen (E - jednostajne) i portgen (C - klastry
+    # o n/10 środkach i odchyleniu SIDE / sqrt(n)) z DIMACS Challenge, współrzędne całkowite
+    rng = np.random.default_rng(seed)
+    if kind == "E":
+        return rng.integers(0, SIDE, size=(num_nodes, 2)).astype(float)
+    num_centers = max(1, num_nodes // 10)
+    centers = rng.integers(0, SIDE, size=(num_centers, 2))
+    labels = rng.integers(num_centers, size=num_nodes)
+    points = centers[labels] + rng.normal(0, SIDE / np.sqrt(num_nodes), size=(num_nodes, 2))
+    return np.floor(np.clip(points, 0, SIDE - 1))
+
+
+def generate_instance(kind, num_nodes, seed=0):
+    if kind == "uniform":
+        return uniform_instance(num_nodes, seed=seed)
+    if kind == "clustered":
+        return clustered_instance(num_nodes, seed=seed)
+    if kind == "grid":
+        return grid_instance(num_nodes, seed=seed)
+    if kind in ("dimacs_E", "dimacs_C"):
+        return dimacs_instance(num_nodes, kind=kind[-1], seed=seed)
+    raise ValueError(f"Unknown instance kind: {kind}")
+
+
+def write_tsp_file(file_path, name, points, comment=""):
+    # Cała sekcja współrzędnych jest formatowana naraz i zapisywana jednym wywołaniem write
+    integral = np.all(points == np.round(points))
+    fmt = "%d %d %d\n" if integral else "%d %.6f %.6f\n"
+    ids = np.arange(1, len(points) + 1)
+    rows = np.column_stack([ids, points])
+    body = "".join(fmt % tuple(row) for row in rows.tolist())
+    header = (
+        f"NAME : {name}\n"
+        f"COMMENT : {comment or f'{len(points)}-city synthetic instance'}\n"
+        "TYPE : TSP\n"
+        f"DIMENSION : {len(points)}\n"
+        "EDGE_WEIGHT_TYPE : EUC_2D\n"
+        "NODE_COORD_SECTION\n"
+    )
+    with open(file_path, "w", buffering=1 << 20) as file:
+        file.write(header)
+        file.write(body)
+        file.write("EOF\n")
+
+
+def generate_tsp_file(output_dir, kind, num_nodes, seed=0):
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    name = f"{kind}{num_nodes}_{seed}"
+    file_path = os.path.join(output_dir, f"{name}.tsp")
+    points = generate_instance(kind, num_nodes, seed=seed)
+    write_tsp_file(file_path, name, points, comment=f"{kind} instance, seed {seed}")
+    return file_path
+
+
+if __name__ == "__main__":
+    for kind in ("uniform", "clustered", "grid", "dimacs_E", "dimacs_C"):
+        for num_nodes in (1000, 10000, 100000, 1000000):
+            file_path = generate_tsp_file("generated", kind, num_nodes)
+            print(f"Generated: {file_path}")
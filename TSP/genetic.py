@@ -0,0 +1,343 @@
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from anytime import double_bridge, tour_cost
+from insertion import insertion_tour
+from metrics import read_tsp_instance, spatial_points, tour_length
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import get_diff_result
+from two_level_list import two_opt_or_opt
+
+# Algorytm genetyczny w modelu wysp: każda wyspa (proces) ma własną populację tras
+# (permutacje int32) i przez epoch_time sekund krzyżuje je krzyżowaniem w stylu EAX.
+# Po każdej epoce najlepsza trasa wyspy trafia do następnej wyspy w pierścieniu.
+# Wyspy liczą odległości na współrzędnych z spatial_points; koszt wyniku jest w metryce instancji.
+shared = {}
+
+
+def attach_instance(points, neighbors):
+    shared["points"] = points
+    shared["neighbors"] = neighbors
+    shared["x"], shared["y"] = points[:, 0].tolist(), points[:, 1].tolist()
+    shared["neighbor_rows"] = neighbors.tolist()
+
+
+def distance(u, v):
+    return math.hypot(shared["x"][u] - shared["x"][v], shared["y"][u] - shared["y"][v])
+
+
+def adjacent(tour):
+    # succ[c], pred[c] - następnik i poprzednik miasta c w trasie
+    succ = np.empty_like(tour)
+    pred = np.empty_like(tour)
+    succ[tour] = np.roll(tour, -1)
+    pred[tour] = np.roll(tour, 1)
+    return succ, pred
+
+
+def common_edges(first, second):
+    # Maska krawędzi (first[i], first[i+1]), które występują też w second
+    succ, pred = adjacent(second)
+    following = np.roll(first, -1)
+    return (succ[first] == following) | (pred[first] == following)
+
+
+def ab_cycles(first, second, rng):
+    # Rozkład krawędzi różniących rodziców na AB-cykle: cykle, w których krawędzie
+    # z first (A) i second (B) występują naprzemiennie. Krawędzie wspólne pomijamy.
+    links = ({}, {})
+    for side, (tour, other) in enumerate(((first, second), (second, first))):
+        different = ~common_edges(tour, other)
+        for u, v in zip(tour[different].tolist(), np.roll(tour, -1)[different].tolist()):
+            links[side].setdefault(u, []).append(v)
+            links[side].setdefault(v, []).append(u)
+
+    cycles = []
+    origins = list(links[0])
+    rng.shuffle(origins)
+    for origin in origins:
+        while links[0][origin]:
+            # Krawędź path[i] -> path[i+1] jest z A dla parzystych i, z B dla nieparzystych;
+            # powrót do miasta na pozycji o tej samej parzystości zamyka AB-cykl
+            path, positions = [origin], {origin: [0]}
+            while True:
+                side = (len(path) - 1) % 2
+                current = path[-1]
+                following = links[side][current].pop(rng.randrange(len(links[side][current])))
+                links[side][following].remove(current)
+                path.append(following)
+                last = len(path) - 1
+                earlier = [p for p in positions.get(following, ()) if p % 2 == last % 2]
+                if earlier:
+                    p = earlier[-1]
+                    cycles.append((p % 2, path[p:]))
+                    for idx in range(p + 1, last):
+                        positions[path[idx]].remove(idx)
+                    del path[p + 1:]
+                    if len(path) == 1:
+                        break
+                else:
+                    positions.setdefault(following, []).append(last)
+    return cycles
+
+
+def apply_cycle(links, cycle):
+    # Z trasy A usuwamy krawędzie A cyklu i dodajemy jego krawędzie B; powstają podtrasy.
+    # Zwraca zmianę długości i miasta, których krawędzie się zmieniły.
+    first_side, cities = cycle
+    delta = 0.0
+    edges = list(zip(cities[:-1], cities[1:]))
+    for i, (u, v) in enumerate(edges):
+        if (first_side + i) % 2 == 0:
+            links[u][links[u].index(v)] = -1
+            links[v][links[v].index(u)] = -1
+            delta -= distance(u, v)
+    for i, (u, v) in enumerate(edges):
+        if (first_side + i) % 2 == 1:
+            links[u][links[u].index(-1)] = v
+            links[v][links[v].index(-1)] = u
+            delta += distance(u, v)
+    return delta, set(cities)
+
+
+def subtour_labels(links):
+    label = [-1] * len(links)
+    members = []
+    for origin in range(len(links)):
+        if label[origin] >= 0:
+            continue
+        cycle = [origin]
+        label[origin] = len(members)
+        previous, current = origin, links[origin][0]
+        while current != origin:
+            label[current] = len(members)
+            cycle.append(current)
+            previous, current = current, links[current][0] if links[current][0] != previous else links[current][1]
+        members.append(cycle)
+    return label, members
+
+
+def merge_subtours(links, touched, is_common):
+    # Naprawa potomka: najmniejszą podtrasę łączymy z inną najtańszą wymianą dwóch krawędzi
+    # (u, u2), (v, v2) -> (u, v), (u2, v2) lub (u, v2), (u2, v), gdzie v jest z listy sąsiadów u.
+    # Krawędzi wspólnych rodzicom nie usuwamy; każda podtrasa ma jakąś inną krawędź,
+    # bo nie może być w całości podtrasą A.
+    label, members = subtour_labels(links)
+    delta = 0.0
+    alive = set(range(len(members)))
+
+    def exchanges(pairs):
+        best = None
+        for u, v in pairs:
+            for u2 in links[u]:
+                if is_common(u, u2):
+                    continue
+                removed_u = distance(u, u2)
+                for v2 in links[v]:
+                    if is_common(v, v2):
+                        continue
+                    removed = removed_u + distance(v, v2)
+                    for x, y in ((v, v2), (v2, v)):
+                        change = distance(u, x) + distance(u2, y) - removed
+                        if best is None or change < best[0]:
+                            best = (change, u, u2, v, v2, x, y)
+        return best
+
+    while len(alive) > 1:
+        smallest = min(alive, key=lambda group: len(members[group]))
+        best = exchanges(
+            (u, v) for u in members[smallest] for v in shared["neighbor_rows"][u] if label[v] != smallest
+        )
+        if best is None:
+            # Na listach sąsiadów nie ma dozwolonej wymiany - bierzemy najbliższą parę miast
+            # z usuwalnymi krawędziami, z podtrasy i spoza niej
+            points = shared["points"]
+            removable = [city for city in range(len(links)) if not all(is_common(city, v) for v in links[city])]
+            inside = np.array([city for city in removable if label[city] == smallest])
+            outside = np.array([city for city in removable if label[city] != smallest])
+            distances = np.hypot(*(points[outside][None, :, :] - points[inside][:, None, :]).transpose(2, 0, 1))
+            row, column = np.unravel_index(int(np.argmin(distances)), distances.shape)
+            best = exchanges([(int(inside[row]), int(outside[column]))])
+        change, u, u2, v, v2, x, y = best
+        links[u][links[u].index(u2)] = x
+        links[u2][links[u2].index(u)] = y
+        links[x][links[x].index(v2 if x == v else v)] = u
+        links[y][links[y].index(v if x == v else v2)] = u2
+        delta += change
+        touched.update((u, u2, v, v2))
+        other = label[v]
+        for city in members[smallest]:
+            label[city] = other
+        members[other].extend(members[smallest])
+        alive.remove(smallest)
+    return delta
+
+
+def links_to_tour(links):
+    tour = [0]
+    previous, current = links[0][1], 0
+    for _ in range(len(links) - 1):
+        previous, current = current, links[current][0] if links[current][0] != previous else links[current][1]
+        tour.append(current)
+    return tour
+
+
+def eax_crossover(first, first_cost, second, rng, children=10):
+    # Krzyżowanie w stylu EAX: potomek to trasa A, w której krawędzie A jednego AB-cyklu
+    # zastąpiono krawędziami B, a powstałe podtrasy połączono. Wszystkie krawędzie wspólne
+    # rodzicom zostają. Z children losowych AB-cykli zwracamy najkrótszego potomka
+    # (trasa, koszt, zmienione miasta) albo None, gdy rodzice są tą samą trasą.
+    cycles = ab_cycles(first, second, rng)
+    if not cycles:
+        return None
+    succ, pred = adjacent(first)
+    base_links = [list(pair) for pair in zip(succ.tolist(), pred.tolist())]
+    second_succ, second_pred = (side.tolist() for side in adjacent(second))
+
+    def is_common(u, v):
+        return v in base_links[u] and (second_succ[u] == v or second_pred[u] == v)
+    best = None
+    for cycle in rng.sample(cycles, min(children, len(cycles))):
+        links = [pair[:] for pair in base_links]
+        delta, touched = apply_cycle(links, cycle)
+        delta += merge_subtours(links, touched, is_common)
+        if best is None or delta < best[0]:
+            best = (delta, links, touched)
+    delta, links, touched = best
+    return links_to_tour(links), first_cost + delta, list(touched)
+
+
+def improve(tour, active=None, max_time=60):
+    points, neighbors = shared["points"], shared["neighbors"]
+    tour = two_opt_or_opt(points, tour, neighbors, max_time=max_time, active=active).to_list()
+    return np.array(tour, dtype=np.int32), tour_cost(points, tour)
+
+
+def perturbed_population(tour, cost, population_size, rng, deadline=math.inf):
+    # Trasa i jej kopie po serii lokalnych perturbacji double-bridge z naprawą.
+    # Po deadline (czas z time.time()) przestajemy dokładać trasy, więc populacja bywa mniejsza.
+    population = [(tour, cost)]
+    while len(population) < population_size and time.time() < deadline:
+        candidate, touched = tour.tolist(), set()
+        for _ in range(max(1, len(tour) // 20)):
+            candidate, cities = double_bridge(candidate, rng)
+            touched.update(cities)
+        population.append(improve(candidate, active=list(touched), max_time=max(deadline - time.time(), 0)))
+    return [tour for tour, _ in population], [cost for _, cost in population]
+
+
+def evolve_island(task):
+    population, costs, immigrant, start, population_size, children, epoch_time, seed = task
+    start_time = time.time()
+    deadline = start_time + epoch_time
+    rng = random.Random(seed)
+    if population is None:
+        population, costs = perturbed_population(*improve(start.tolist(), max_time=epoch_time), population_size, rng,
+                                                 deadline)
+    elif len(population) < population_size:
+        # Poprzednia epoka nie zdążyła zbudować całej populacji - uzupełniamy ją kopiami najlepszej trasy
+        best = min(range(len(costs)), key=costs.__getitem__)
+        extra, extra_costs = perturbed_population(population[best], costs[best], population_size - len(population) + 1,
+                                                  rng, deadline)
+        population, costs = list(population) + extra[1:], list(costs) + extra_costs[1:]
+    costs = list(costs)
+
+    def admit(tour, cost, replaced):
+        # Bez duplikatów (po koszcie), żeby populacja nie zbiegła do jednej trasy
+        if cost < costs[replaced] - 1e-9 and all(abs(cost - other) > 1e-9 for other in costs):
+            population[replaced], costs[replaced] = tour, cost
+            return True
+        return False
+
+    if immigrant is not None:
+        admit(*immigrant, replaced=max(range(len(costs)), key=costs.__getitem__))
+
+    generations = 0
+    while len(population) > 1 and time.time() - start_time < epoch_time:
+        # Jak w EAX: losowa kolejność, pary (A, B) = (p[i], p[i+1]), potomek zastępuje A
+        order = rng.sample(range(len(population)), len(population))
+        admitted = 0
+        for i, j in zip(order, order[1:] + order[:1]):
+            if time.time() - start_time >= epoch_time:
+                break
+            offspring = eax_crossover(population[i], costs[i], population[j], rng, children=children)
+            if offspring is None:
+                continue
+            child, _, touched = offspring
+            remaining = epoch_time - (time.time() - start_time)
+            admitted += admit(*improve(child, active=touched, max_time=max(remaining, 0)), replaced=i)
+        else:
+            if not admitted:
+                # Populacja zbiegła się - zaczynamy od nowa od perturbacji najlepszej trasy
+                best = min(range(len(costs)), key=costs.__getitem__)
+                population, costs = perturbed_population(population[best], costs[best], population_size, rng, deadline)
+        generations += 1
+    return population, costs, generations
+
+
+def genetic_tsp(coordinates, workers=None, population_size=30, children=10, max_time=600, epoch_time=10, k=8,
+                seed=None, metric="EUC_2D"):
+    start_time = time.time()
+    workers = workers or os.cpu_count()
+    node_ids, points = coordinates_to_array(coordinates)
+    search_points = spatial_points(points, metric)
+    neighbors = nearest_neighbor_lists(search_points, k=k)
+    start = np.array(insertion_tour(search_points, method="farthest"), dtype=np.int32)
+    seed = random.Random(seed).randrange(2 ** 32)
+
+    islands = [(None, None)] * workers
+    with multiprocessing.get_context().Pool(workers, initializer=attach_instance,
+                                            initargs=(search_points, neighbors)) as pool:
+        epoch = 0
+        while True:
+            remaining = max_time - (time.time() - start_time)
+            if remaining <= 0:
+                break
+            # Migracja w pierścieniu: wyspa i dostaje najlepszą trasę wyspy i-1
+            immigrants = [None] * workers
+            if epoch > 0 and workers > 1:
+                for island, (population, costs) in enumerate(islands):
+                    best = int(np.argmin(costs))
+                    immigrants[(island + 1) % workers] = (population[best], costs[best])
+            tasks = [
+                (population, costs, immigrants[island], start, population_size, children,
+                 min(epoch_time, remaining), seed + epoch * workers + island)
+                for island, (population, costs) in enumerate(islands)
+            ]
+            islands = [(population, costs) for population, costs, _ in pool.map(evolve_island, tasks)]
+            epoch += 1
+
+    tour, _ = min(
+        ((population[i], costs[i]) for population, costs in islands for i in range(len(costs))),
+        key=lambda individual: individual[1],
+    )
+    total_cost = tour_length(points, tour, metric)
+    tour = [node_ids[idx] for idx in tour.tolist()]
+    tour.append(tour[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+    ]
+    for file_path in files:
+        tsp_name, coordinates, metric = read_tsp_instance(file_path)
+        tour, tour_cost_value, execution_time = genetic_tsp(coordinates, max_time=300, seed=0, metric=metric)
+        total_execution_time += execution_time
+        print(f"TSP Name: {tsp_name}")
+        print(f"Tour cost: {tour_cost_value}")
+        print(f"Difference from optimal: {get_diff_result(os.path.basename(file_path), tour_cost_value)}")
+        print(f"Execution time: {execution_time} seconds")
+    print(f"Total Execution Time: {total_execution_time} seconds")
@@ -0,0 +1,258 @@
+import heapq
+import math
+import os
+import time
+
+import numpy as np
+
+from metrics import read_tsp_instance, spatial_points, tour_length
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import get_diff_result
+
+
+def convex_hull(points):
+    # Algorytm Andrew (monotone chain), zwraca indeksy w kolejności przeciwnej do wskazówek zegara
+    order = np.lexsort((points[:, 1], points[:, 0])).tolist()
+    x, y = points[:, 0].tolist(), points[:, 1].tolist()
+
+    def cross(o, a, b):
+        return (x[a] - x[o]) * (y[b] - y[o]) - (y[a] - y[o]) * (x[b] - x[o])
+
+    lower = []
+    for idx in order:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], idx) <= 0:
+            lower.pop()
+        lower.append(idx)
+    upper = []
+    for idx in reversed(order):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], idx) <= 0:
+            upper.pop()
+        upper.append(idx)
+
+    hull = lower[:-1] + upper[:-1]
+    return hull if hull else order[:1]
+
+
+def reverse_neighbor_lists(neighbors):
+    # Dla każdego miasta: miasta, które mają je na swojej liście sąsiadów (układ CSR)
+    num_nodes = len(neighbors)
+    flat = neighbors.ravel()
+    owners = np.repeat(np.arange(num_nodes), neighbors.shape[1])
+    order = np.argsort(flat, kind="stable")
+    offsets = np.searchsorted(flat[order], np.arange(num_nodes + 1))
+    return owners[order].tolist(), offsets.tolist()
+
+
+class TourGrid:
+    # Siatka miast już wstawionych do trasy - pozwala znaleźć najbliższe miasto trasy
+    # przeszukując pierścienie komórek zamiast całej trasy
+    __slots__ = ("x", "y", "min_x", "min_y", "cell_size", "cells_per_side", "cells")
+
+    def __init__(self, points):
+        self.x, self.y = points[:, 0].tolist(), points[:, 1].tolist()
+        self.min_x, self.min_y = points.min(axis=0).tolist()
+        span = max(float((points.max(axis=0) - points.min(axis=0)).max()), 1e-9)
+        self.cells_per_side = max(1, int(math.sqrt(len(points) / 2)))
+        self.cell_size = span / self.cells_per_side
+        self.cells = [[] for _ in range(self.cells_per_side * self.cells_per_side)]
+
+    def _cell(self, city):
+        side = self.cells_per_side
+        cx = min(int((self.x[city] - self.min_x) / self.cell_size), side - 1)
+        cy = min(int((self.y[city] - self.min_y) / self.cell_size), side - 1)
+        return cx, cy
+
+    def add(self, city):
+        cx, cy = self._cell(city)
+        self.cells[cx * self.cells_per_side + cy].append(city)
+
+    def nearest(self, city, count=1):
+        # Zwraca do count najbliższych miast trasy jako listę (odległość, miasto)
+        side = self.cells_per_side
+        cx, cy = self._cell(city)
+        x, y = self.x[city], self.y[city]
+        found = []
+        for ring in range(side):
+            if len(found) >= count and found[count - 1][0] <= (ring - 1) * self.cell_size:
+                break
+            for gx in range(max(cx - ring, 0), min(cx + ring, side - 1) + 1):
+                edge_x = gx == cx - ring or gx == cx + ring
+                step = 1 if edge_x else 2 * ring
+                for gy in range(cy - ring, cy + ring + 1, max(step, 1)):
+                    if gy < 0 or gy >= side:
+                        continue
+                    for other in self.cells[gx * side + gy]:
+                        found.append((math.hypot(self.x[other] - x, self.y[other] - y), other))
+            found.sort()
+            del found[count:]
+        return found
+
+
+def insertion_tour(points, method="cheapest", k=10, should_stop=None):
+    # should_stop() - sprawdzane co 1024 wstawienia; gdy zwróci True, pozostałe miasta
+    # trafiają od razu za najbliższe miasto trasy (szybko, ale bez wyboru najlepszej krawędzi)
+    num_nodes = len(points)
+    if num_nodes <= 3:
+        return list(range(num_nodes))
+
+    x, y = points[:, 0].tolist(), points[:, 1].tolist()
+
+    def dist(u, v):
+        return math.hypot(x[u] - x[v], y[u] - y[v])
+
+    neighbors = nearest_neighbor_lists(points, k=k).tolist()
+    reverse_owners, reverse_offsets = reverse_neighbor_lists(np.array(neighbors))
+
+    hull = convex_hull(points)
+    succ = [-1] * num_nodes
+    pred = [-1] * num_nodes
+    for i, city in enumerate(hull):
+        succ[city] = hull[(i + 1) % len(hull)]
+        pred[city] = hull[i - 1]
+    in_tour = [False] * num_nodes
+    grid = TourGrid(points)
+    for city in hull:
+        in_tour[city] = True
+        grid.add(city)
+
+    # Odległość do najbliższego miasta na trasie - na starcie liczona wektorowo do otoczki,
+    # potem aktualizowana tylko dla miast, które mają nowo wstawione miasto na liście sąsiadów
+    hull_points = points[hull]
+    nearest_tour = np.empty(num_nodes, dtype=np.int64)
+    nearest_dist = np.empty(num_nodes)
+    for start in range(0, num_nodes, 4096):
+        block = points[start:start + 4096]
+        d = np.hypot(block[:, None, 0] - hull_points[None, :, 0], block[:, None, 1] - hull_points[None, :, 1])
+        nearest_tour[start:start + 4096] = np.asarray(hull)[d.argmin(axis=1)]
+        nearest_dist[start:start + 4096] = d.min(axis=1)
+    nearest_tour = nearest_tour.tolist()
+    nearest_dist = nearest_dist.tolist()
+
+    def best_position(city, anchors=()):
+        best_cost, best_v = math.inf, -1
+        anchors = [nearest_tour[city], *anchors] + [v for v in neighbors[city] if in_tour[v]]
+        for v in anchors:
+            for a in (v, pred[v]):
+                b = succ[a]
+                cost = dist(a, city) + dist(city, b) - dist(a, b)
+                if cost < best_cost:
+                    best_cost, best_v = cost, a
+        return best_cost, best_v
+
+    heap = []
+    best_cost = [math.inf] * num_nodes
+    for city in range(num_nodes):
+        if in_tour[city]:
+            continue
+        if method == "cheapest":
+            best_cost[city] = best_position(city)[0]
+            heap.append((best_cost[city], city))
+        else:
+            heap.append((-nearest_dist[city], city))
+    heapq.heapify(heap)
+
+    remaining = num_nodes - len(hull)
+    while remaining:
+        if should_stop is not None and remaining % 1024 == 0 and should_stop():
+            for city in range(num_nodes):
+                if not in_tour[city]:
+                    a = nearest_tour[city]
+                    b = succ[a]
+                    succ[a], pred[city], succ[city], pred[b] = city, a, b, city
+                    in_tour[city] = True
+            break
+        key, city = heapq.heappop(heap)
+        if in_tour[city]:
+            continue
+        if method == "cheapest":
+            if key != best_cost[city]:
+                continue
+            cost, a = best_position(city)
+            if cost > key + 1e-9:
+                # Krawędź, na którą celowaliśmy, zniknęła - wpis był nieaktualny
+                best_cost[city] = cost
+                heapq.heappush(heap, (cost, city))
+                continue
+        else:
+            if -key != nearest_dist[city]:
+                continue
+            # Odległość w kopcu jest tylko oszacowaniem, ale miejsce wstawienia
+            # szukamy przy faktycznie najbliższych miastach trasy
+            cost, a = best_position(city, [other for _, other in grid.nearest(city, count=4)])
+
+        b = succ[a]
+        succ[a], pred[city], succ[city], pred[b] = city, a, b, city
+        in_tour[city] = True
+        grid.add(city)
+        remaining -= 1
+
+        affected = reverse_owners[reverse_offsets[city]:reverse_offsets[city + 1]]
+        for other in affected:
+            if in_tour[other]:
+                continue
+            d = dist(other, city)
+            if d < nearest_dist[other]:
+                nearest_dist[other] = d
+                nearest_tour[other] = city
+                if method != "cheapest":
+                    heapq.heappush(heap, (-d, other))
+        if method == "cheapest":
+            # Nowe krawędzie (a, city) i (city, b) mogą obniżyć koszt tylko miastom w pobliżu
+            for anchor in (city, a, b):
+                for other in reverse_owners[reverse_offsets[anchor]:reverse_offsets[anchor + 1]]:
+                    if in_tour[other]:
+                        continue
+                    cost, _ = best_position(other)
+                    if cost < best_cost[other]:
+                        best_cost[other] = cost
+                        heapq.heappush(heap, (cost, other))
+
+    tour = [hull[0]]
+    for _ in range(num_nodes - 1):
+        tour.append(succ[tour[-1]])
+    return tour
+
+
+def insertion_tsp(coordinates, method="cheapest", k=10, metric="EUC_2D"):
+    start_time = time.time()
+    node_ids, points = coordinates_to_array(coordinates)
+
+    tour = insertion_tour(spatial_points(points, metric), method=method, k=k)
+    total_cost = tour_length(points, tour, metric)
+    tour.append(tour[0])
+    tour = [node_ids[idx] for idx in tour]
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time
+
+
+def cheapest_insertion_tsp(coordinates, k=10, metric="EUC_2D"):
+    return insertion_tsp(coordinates, method="cheapest", k=k, metric=metric)
+
+
+def farthest_insertion_tsp(coordinates, k=10, metric="EUC_2D"):
+    return insertion_tsp(coordinates, method="farthest", k=k, metric=metric)
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+    for file_path in files:
+        tsp_name, coordinates, metric = read_tsp_instance(file_path)
+        for method in ("cheapest", "farthest"):
+            tour, tour_cost, execution_time = insertion_tsp(coordinates, method=method, metric=metric)
+            total_execution_time += execution_time
+            diff_result = get_diff_result(os.path.basename(file_path), tour_cost)
+            print(f"TSP Name: {tsp_name} ({method} insertion)")
+            print(f"Tour cost: {tour_cost}")
+            print(f"Difference from optimal: {diff_result}")
+            print(f"Execution time: {execution_time} seconds")
+    print(f"Total Execution Time: {total_execution_time} seconds")
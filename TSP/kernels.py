@@ -0,0 +1,168 @@
+import math
+import time
+
+import numpy as np
+
+import metrics
+
+# Gorące pętle w dwóch wersjach: pętla (kompilowana przez Numbę, jeśli jest zainstalowana)
+# i wersja NumPy używana, gdy Numby nie ma. Obie wybierają pierwszy indeks przy remisie
+# i liczą delty w tej samej kolejności działań, więc dają identyczne wyniki.
+try:
+    import numba
+except ImportError:
+    numba = None
+
+HAVE_NUMBA = numba is not None
+
+
+def jit(function):
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+def nearest_neighbor_order_loop(distance_matrix, start):
+    num_nodes = distance_matrix.shape[0]
+    visited = np.zeros(num_nodes, dtype=np.bool_)
+    order = np.empty(num_nodes, dtype=np.int64)
+    order[0] = start
+    visited[start] = True
+    for step in range(1, num_nodes):
+        current = order[step - 1]
+        best = -1
+        best_distance = np.inf
+        for candidate in range(num_nodes):
+            if not visited[candidate] and (best < 0 or distance_matrix[current, candidate] < best_distance):
+                best = candidate
+                best_distance = distance_matrix[current, candidate]
+        order[step] = best
+        visited[best] = True
+    return order
+
+
+def nearest_neighbor_order_numpy(distance_matrix, start):
+    num_nodes = distance_matrix.shape[0]
+    unvisited = np.delete(np.arange(num_nodes), start)
+    order = np.empty(num_nodes, dtype=np.int64)
+    order[0] = start
+    for step in range(1, num_nodes):
+        position = int(np.argmin(distance_matrix[order[step - 1], unvisited]))
+        order[step] = unvisited[position]
+        unvisited = np.delete(unvisited, position)
+    return order
+
+
+def best_two_opt_move_loop(tour, distance_matrix):
+    # Najlepsze pojedyncze odwrócenie tour[i:j] (jak w pętli show_quality.two_opt)
+    length = tour.shape[0]
+    best_delta = 0.0
+    best_i = -1
+    best_j = -1
+    for i in range(1, length - 2):
+        a = tour[i - 1]
+        b = tour[i]
+        d_ab = distance_matrix[a, b]
+        for j in range(i + 2, length):
+            c = tour[j - 1]
+            d = tour[j]
+            delta = distance_matrix[a, c] + distance_matrix[b, d] - d_ab - distance_matrix[c, d]
+            if delta < best_delta:
+                best_delta = delta
+                best_i = i
+                best_j = j
+    return best_delta, best_i, best_j
+
+
+def best_two_opt_move_numpy(tour, distance_matrix):
+    length = len(tour)
+    best_delta, best_i, best_j = 0.0, -1, -1
+    for i in range(1, length - 2):
+        a, b = tour[i - 1], tour[i]
+        c, d = tour[i + 1:length - 1], tour[i + 2:length]
+        delta = distance_matrix[a, c] + distance_matrix[b, d] - distance_matrix[a, b] - distance_matrix[c, d]
+        position = int(np.argmin(delta))
+        if delta[position] < best_delta:
+            best_delta, best_i, best_j = float(delta[position]), i, i + 2 + position
+    return best_delta, best_i, best_j
+
+
+def euc_2d_matrix_loop(points):
+    num_nodes = points.shape[0]
+    matrix = np.empty((num_nodes, num_nodes))
+    for i in range(num_nodes):
+        matrix[i, i] = 0.0
+        for j in range(i + 1, num_nodes):
+            value = math.floor(math.hypot(points[i, 0] - points[j, 0], points[i, 1] - points[j, 1]) + 0.5)
+            matrix[i, j] = value
+            matrix[j, i] = value
+    return matrix
+
+
+if HAVE_NUMBA:
+    nearest_neighbor_order_jit = jit(nearest_neighbor_order_loop)
+    best_two_opt_move_jit = jit(best_two_opt_move_loop)
+    euc_2d_matrix_jit = jit(euc_2d_matrix_loop)
+
+
+def nearest_neighbor_order(distance_matrix, start=0):
+    if HAVE_NUMBA:
+        return nearest_neighbor_order_jit(np.ascontiguousarray(distance_matrix, dtype=float), start)
+    return nearest_neighbor_order_numpy(distance_matrix, start)
+
+
+def best_two_opt_move(tour, distance_matrix):
+    tour = np.asarray(tour, dtype=np.int64)
+    if HAVE_NUMBA:
+        return best_two_opt_move_jit(tour, np.ascontiguousarray(distance_matrix, dtype=float))
+    return best_two_opt_move_numpy(tour, distance_matrix)
+
+
+def distance_matrix(points, metric="EUC_2D"):
+    if HAVE_NUMBA and metric == "EUC_2D":
+        return euc_2d_matrix_jit(np.ascontiguousarray(points, dtype=float))
+    return metrics.distance_matrix(points, metric)
+
+
+def benchmark(function, *args, repeat=3):
+    best = math.inf
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+
+if __name__ == "__main__":
+    # Czas każdego jądra: interpretowana pętla (stan sprzed zmian), NumPy i Numba
+    rng = np.random.default_rng(0)
+    for num_nodes in (200, 1000, 2000):
+        points = rng.uniform(0, 10000, size=(num_nodes, 2))
+        matrix = metrics.distance_matrix(points)
+        tour = np.append(nearest_neighbor_order_numpy(matrix, 0), 0)
+        kernels = {
+            "nearest neighbor selection": (
+                nearest_neighbor_order_loop, nearest_neighbor_order_numpy,
+                nearest_neighbor_order_jit if HAVE_NUMBA else None, (matrix, 0),
+            ),
+            "2-opt pair loop": (
+                best_two_opt_move_loop, best_two_opt_move_numpy,
+                best_two_opt_move_jit if HAVE_NUMBA else None, (tour, matrix),
+            ),
+            "EUC_2D matrix builder": (
+                euc_2d_matrix_loop, metrics.distance_matrix,
+                euc_2d_matrix_jit if HAVE_NUMBA else None, (points,),
+            ),
+        }
+        for name, (loop, vectorized, compiled, args) in kernels.items():
+            loop_time = benchmark(loop, *args, repeat=1)
+            numpy_time = benchmark(vectorized, *args)
+            line = (f"n={num_nodes:5d}  {name:28s} python {loop_time:9.4f} s  "
+                    f"numpy {numpy_time:9.4f} s ({loop_time / numpy_time:7.1f}x)")
+            if compiled is not None:
+                compiled(*args)
+                jit_time = benchmark(compiled, *args)
+                line += f"  numba {jit_time:9.4f} s ({loop_time / jit_time:7.1f}x)"
+            print(line)
+    if not HAVE_NUMBA:
+        print("Numba is not installed - only the NumPy fallback was measured")
@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import queue
+import random
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from anytime import anytime_two_opt
+from insertion import insertion_tour
+from neighbors import coordinates_to_array
+from metrics import read_tsp_instance, spatial_points
+from show_quality import get_diff_result
+
+# Podgląd na żywo: solver publikuje migawki trasy nie częściej niż co interval sekund
+# do małej kolejki, a osobny proces rysuje je z blittingiem (aktualizuje tylko dane linii
+# na zapamiętanym tle). Gdy rysowanie nie nadąża, migawki są odrzucane, a nie kolejkowane.
+SNAPSHOT_QUEUE_SIZE = 2
+
+
+class SnapshotQueue:
+    # Opakowanie kolejki dla anytime.publish: trasa idzie jako tablica int32 (szybsze
+    # serializowanie niż lista), a pełna kolejka nie zatrzymuje solvera
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.dropped = 0
+
+    def put_nowait(self, snapshot):
+        tour, cost, elapsed = snapshot
+        try:
+            self.snapshots.put_nowait((np.asarray(tour, dtype=np.int32), cost, elapsed))
+        except queue.Full:
+            self.dropped += 1
+
+
+def latest_snapshot(snapshots):
+    # Czeka na migawkę i zwraca najnowszą dostępną; None oznacza koniec
+    snapshot = snapshots.get()
+    while snapshot is not None:
+        try:
+            newer = snapshots.get_nowait()
+        except queue.Empty:
+            break
+        if newer is None:
+            snapshots.put(None)
+            break
+        snapshot = newer
+    return snapshot
+
+
+def view_process(snapshots, points, title, save_path=None):
+    # Podgląd ma niższy priorytet niż solver, żeby przy zajętych rdzeniach nie zabierał mu czasu
+    if hasattr(os, "nice"):
+        os.nice(10)
+    fig, ax = plt.subplots(figsize=(10, 10))
+    ax.scatter(points[:, 0], points[:, 1], s=2, color="gray")
+    ax.set_title(title)
+    ax.set_xlabel("X Coordinate")
+    ax.set_ylabel("Y Coordinate")
+    ax.grid(True)
+    line, = ax.plot([], [], "-", linewidth=0.8, animated=True)
+    label = ax.text(0.01, 0.99, "", transform=ax.transAxes, va="top", animated=True)
+
+    background = None
+
+    def refresh_background(event=None):
+        nonlocal background
+        background = fig.canvas.copy_from_bbox(fig.bbox)
+
+    fig.canvas.mpl_connect("draw_event", refresh_background)
+    plt.show(block=False)
+    fig.canvas.draw()
+
+    frames = 0
+    while True:
+        snapshot = latest_snapshot(snapshots)
+        if snapshot is None:
+            break
+        tour, cost, elapsed = snapshot
+        line.set_data(points[tour, 0], points[tour, 1])
+        label.set_text(f"{elapsed:7.2f} s   cost {cost:.0f}   frame {frames}")
+        fig.canvas.restore_region(background)
+        ax.draw_artist(line)
+        ax.draw_artist(label)
+        fig.canvas.blit(fig.bbox)
+        fig.canvas.flush_events()
+        frames += 1
+
+    if save_path:
+        line.set_animated(False)
+        label.set_animated(False)
+        fig.savefig(save_path)
+    plt.close(fig)
+
+
+def start_view(points, title, save_path=None):
+    snapshots = multiprocessing.Queue(maxsize=SNAPSHOT_QUEUE_SIZE)
+    viewer = multiprocessing.Process(target=view_process, args=(snapshots, points, title, save_path), daemon=True)
+    viewer.start()
+    return snapshots, viewer
+
+
+def stop_view(snapshots, viewer, timeout=10):
+    # Podgląd mógł paść (brak ekranu, błąd backendu) albo utknąć - wtedy nikt nie odbierze
+    # migawek z pełnej kolejki i zwykłe put(None) zawiesiłoby solver na zawsze
+    if viewer.is_alive():
+        try:
+            snapshots.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        viewer.join(timeout)
+    if viewer.is_alive():
+        viewer.terminate()
+        viewer.join()
+    if viewer.exitcode != 0:
+        # Niedoczytane migawki w potoku nie mogą blokować zakończenia procesu solvera
+        snapshots.cancel_join_thread()
+
+
+def live_anytime_tsp(coordinates, max_time=50, interval=0.2, title="", save_path=None, seed=None, metric="EUC_2D"):
+    # Podgląd i przeszukiwanie na współrzędnych z spatial_points, wynik w metryce instancji
+    start_time = time.time()
+    node_ids, points = coordinates_to_array(coordinates)
+    search_points = spatial_points(points, metric)
+    snapshots, viewer = start_view(search_points, title, save_path=save_path)
+    progress = SnapshotQueue(snapshots)
+
+    tour = insertion_tour(search_points, method="farthest")
+    remaining = max_time - (time.time() - start_time)
+    tour, total_cost, iteration = anytime_two_opt(
+        search_points, tour, max_time=remaining, progress=progress, rng=random.Random(seed),
+        progress_interval=interval, instance_points=points, metric=metric,
+    )
+    stop_view(snapshots, viewer)
+    tour = [node_ids[idx] for idx in tour]
+    tour.append(tour[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time, iteration
+
+
+if __name__ == "__main__":
+    file_path = "files/pr2392.tsp"
+    tsp_name, coordinates, metric = read_tsp_instance(file_path)
+    if not os.path.exists("plots"):
+        os.makedirs("plots")
+
+    # Przepustowość solvera (liczba iteracji double-bridge w tym samym czasie) bez i z podglądem
+    _, points = coordinates_to_array(coordinates)
+    points = spatial_points(points, metric)
+    start = insertion_tour(points, method="farthest")
+    _, plain_cost, plain_iterations = anytime_two_opt(points, start, max_time=20, rng=random.Random(0))
+    tour, tour_cost, execution_time, live_iterations = live_anytime_tsp(
+        coordinates, max_time=20, title=f"{tsp_name} (live)", save_path=os.path.join("plots", f"{tsp_name}_live.png"),
+        seed=0, metric=metric,
+    )
+    print(f"TSP Name: {tsp_name}")
+    print(f"Tour cost: {tour_cost} ({get_diff_result(os.path.basename(file_path), tour_cost)})")
+    print(f"Iterations without view: {plain_iterations}, with view: {live_iterations} "
+          f"({100 * (1 - live_iterations / plain_iterations):.1f}% fewer)")
+    print(f"Execution time: {execution_time} seconds")
@@ -0,0 +1,168 @@
+import os
+import time
+
+import numpy as np
+
+from anytime import anytime_tsp, tour_cost
+from insertion import insertion_tour
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import read_tsp_file, get_diff_result
+
+
+def candidate_edges(points, k=10):
+    # Nieskierowany graf kandydatów z list k najbliższych sąsiadów, bez powtórzeń
+    neighbors = nearest_neighbor_lists(points, k=k)
+    u = np.repeat(np.arange(len(points)), neighbors.shape[1])
+    v = neighbors.ravel().astype(np.int64)
+    u, v = np.minimum(u, v), np.maximum(u, v)
+    edges = np.unique(u * len(points) + v)
+    u, v = edges // len(points), edges % len(points)
+    u, v = connect_components(points, u, v)
+    weights = np.hypot(*(points[u] - points[v]).T)
+    return u, v, weights
+
+
+def find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def components(num_nodes, u, v):
+    parent = list(range(num_nodes))
+    for a, b in zip(u.tolist(), v.tolist()):
+        ra, rb = find(parent, a), find(parent, b)
+        if ra != rb:
+            parent[ra] = rb
+    return np.array([find(parent, x) for x in range(num_nodes)])
+
+
+def connect_components(points, u, v):
+    # Graf kNN dla danych z klastrami bywa niespójny. Najkrótsza krawędź wychodząca
+    # z komponentu należy do MST (własność cięcia), więc dokładamy właśnie takie krawędzie.
+    labels = components(len(points), u, v)
+    extra_u, extra_v = [], []
+    while len(np.unique(labels)) > 1:
+        roots, sizes = np.unique(labels, return_counts=True)
+        inside = np.flatnonzero(labels == roots[sizes.argmin()])
+        outside = np.flatnonzero(labels != roots[sizes.argmin()])
+        best = (np.inf, -1, -1)
+        for start in range(0, len(inside), 512):
+            block = inside[start:start + 512]
+            d = np.hypot(points[block, None, 0] - points[None, outside, 0],
+                         points[block, None, 1] - points[None, outside, 1])
+            row, col = np.unravel_index(d.argmin(), d.shape)
+            if d[row, col] < best[0]:
+                best = (d[row, col], block[row], outside[col])
+        extra_u.append(best[1])
+        extra_v.append(best[2])
+        labels[labels == labels[best[1]]] = labels[best[2]]
+    return np.append(u, extra_u).astype(np.int64), np.append(v, extra_v).astype(np.int64)
+
+
+def minimum_one_tree(num_nodes, u, v, weights):
+    # MST (Kruskal) + druga najtańsza krawędź liścia, dla którego ta krawędź jest najdroższa
+    order = np.argsort(weights, kind="stable")
+    parent = list(range(num_nodes))
+    in_tree = np.zeros(len(weights), dtype=bool)
+    u_list, v_list = u.tolist(), v.tolist()
+    joined = 0
+    for edge in order.tolist():
+        ra, rb = find(parent, u_list[edge]), find(parent, v_list[edge])
+        if ra != rb:
+            parent[ra] = rb
+            in_tree[edge] = True
+            joined += 1
+            if joined == num_nodes - 1:
+                break
+
+    degree = np.bincount(u[in_tree], minlength=num_nodes) + np.bincount(v[in_tree], minlength=num_nodes)
+    # Najtańsza krawędź spoza drzewa dla każdego wierzchołka
+    off_tree = ~in_tree
+    second = np.full(num_nodes, np.inf)
+    np.minimum.at(second, u[off_tree], weights[off_tree])
+    np.minimum.at(second, v[off_tree], weights[off_tree])
+    leaves = np.flatnonzero(degree == 1)
+    special = leaves[second[leaves].argmax()]
+    extra = np.flatnonzero(off_tree & ((u == special) | (v == special)))
+    extra = extra[weights[extra].argmin()]
+    in_tree[extra] = True
+    degree[u[extra]] += 1
+    degree[v[extra]] += 1
+
+    return float(weights[in_tree].sum()), degree
+
+
+def held_karp_bound(points, upper_bound=None, max_iterations=200, k=10, max_time=None):
+    # Optymalizacja subgradientowa mnożników pi (Held-Karp). Ograniczenie liczone jest
+    # na grafie kandydatów; przy k=10 zawiera on w praktyce wszystkie krawędzie 1-drzewa.
+    start_time = time.time()
+    num_nodes = len(points)
+    if num_nodes < 3:
+        return 0.0
+    u, v, weights = candidate_edges(points, k=k)
+    if upper_bound is None:
+        upper_bound = tour_cost(points, insertion_tour(points, method="farthest"))
+
+    pi = np.zeros(num_nodes)
+    best_bound = -np.inf
+    step_scale = 2.0
+    stalled = 0
+    previous_direction = np.zeros(num_nodes)
+    for _ in range(max_iterations):
+        tree_weight, degree = minimum_one_tree(num_nodes, u, v, weights + pi[u] + pi[v])
+        bound = tree_weight - 2 * pi.sum()
+        if bound > best_bound + 1e-9:
+            best_bound = bound
+            stalled = 0
+        else:
+            stalled += 1
+            if stalled >= 10:
+                step_scale /= 2
+                stalled = 0
+
+        subgradient = degree - 2
+        norm = float((subgradient ** 2).sum())
+        if norm == 0 or step_scale < 1e-4:
+            break
+        if max_time is not None and time.time() - start_time >= max_time:
+            break
+        # Kierunek z pamięcią poprzedniego subgradientu, jak w LKH
+        direction = 0.7 * subgradient + 0.3 * previous_direction
+        previous_direction = direction
+        step = step_scale * (upper_bound - bound) / norm
+        pi += step * direction
+
+    return best_bound
+
+
+def gap_to_bound(total_cost, bound):
+    return (total_cost / bound - 1) * 100
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+    for file_path in files:
+        tsp_name, coordinates = read_tsp_file(file_path)
+        start_time = time.time()
+        _, points = coordinates_to_array(coordinates)
+        bound = held_karp_bound(points)
+        # Poprawiamy trasę tylko do momentu, aż będzie w granicy 5% od ograniczenia
+        tour, total_cost, _ = anytime_tsp(coordinates, max_time=50, lower_bound=bound, target_gap=5)
+        execution_time = time.time() - start_time
+        total_execution_time += execution_time
+        print(f"TSP Name: {tsp_name}")
+        print(f"Held-Karp bound: {bound}")
+        print(f"Tour cost: {total_cost}")
+        print(f"Gap to bound: {gap_to_bound(total_cost, bound):.2f}%")
+        print(f"Difference from optimal: {get_diff_result(os.path.basename(file_path), total_cost)}")
+        print(f"Execution time: {execution_time} seconds")
+    print(f"Total Execution Time: {total_execution_time} seconds")
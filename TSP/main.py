@@ -2,6 +2,7 @@ import random
 import time
 import networkx as nx
 import matplotlib.pyplot as plt
+from tour_output import save_result
 
 
 # pytania czy zaczynac od random, czy wyswietlac te wykresy, czemu jest róznica w execution time ,
@@ -92,8 +93,8 @@ if __name__ == "__main__":
     tour, tour_cost, execution_time = nearest_neighbor_tsp(G)
 
     print(f"TSP Name: {tsp_name}")
-    print(f"Optimal tour: {tour}")
     print(f"Tour cost: {tour_cost}")
     print(f"Execution time: {execution_time} seconds")
+    save_result("main", tsp_name, tour, tour_cost, execution_time)
 
     plot_graph(G, tour)
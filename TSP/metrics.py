@@ -0,0 +1,141 @@
+import math
+
+import numpy as np
+
+# Jądra odległości TSPLIB. Każde przyjmuje tablice współrzędnych o kształtach
+# dających się rozgłaszać (..., 2) i zwraca tablicę odległości.
+GEO_PI = 3.141592
+GEO_RADIUS = 6378.388
+
+
+def nint(values):
+    return np.floor(values + 0.5)
+
+
+def euc_2d(a, b):
+    return nint(np.hypot(a[..., 0] - b[..., 0], a[..., 1] - b[..., 1]))
+
+
+def ceil_2d(a, b):
+    return np.ceil(np.hypot(a[..., 0] - b[..., 0], a[..., 1] - b[..., 1]))
+
+
+def att(a, b):
+    r = np.sqrt(((a[..., 0] - b[..., 0]) ** 2 + (a[..., 1] - b[..., 1]) ** 2) / 10.0)
+    t = nint(r)
+    return np.where(t < r, t + 1, t)
+
+
+def geo_radians(values):
+    degrees = np.trunc(values)
+    minutes = values - degrees
+    return GEO_PI * (degrees + 5.0 * minutes / 3.0) / 180.0
+
+
+def geo(a, b):
+    lat_a, lon_a = geo_radians(a[..., 0]), geo_radians(a[..., 1])
+    lat_b, lon_b = geo_radians(b[..., 0]), geo_radians(b[..., 1])
+    q1 = np.cos(lon_a - lon_b)
+    q2 = np.cos(lat_a - lat_b)
+    q3 = np.cos(lat_a + lat_b)
+    inner = np.clip(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3), -1.0, 1.0)
+    return np.trunc(GEO_RADIUS * np.arccos(inner) + 1.0)
+
+
+def man_2d(a, b):
+    return nint(np.abs(a[..., 0] - b[..., 0]) + np.abs(a[..., 1] - b[..., 1]))
+
+
+def max_2d(a, b):
+    return np.maximum(nint(np.abs(a[..., 0] - b[..., 0])), nint(np.abs(a[..., 1] - b[..., 1])))
+
+
+METRICS = {
+    "EUC_2D": euc_2d,
+    "CEIL_2D": ceil_2d,
+    "ATT": att,
+    "GEO": geo,
+    "MAN_2D": man_2d,
+    "MAX_2D": max_2d,
+}
+
+
+def get_metric(name):
+    if name not in METRICS:
+        raise ValueError(f"Unsupported EDGE_WEIGHT_TYPE: {name}")
+    return METRICS[name]
+
+
+def read_tsp_instance(file_path):
+    # Jak read_tsp_file, ale zwraca też EDGE_WEIGHT_TYPE z nagłówka (domyślnie EUC_2D)
+    coordinates = {}
+    tsp_name = ""
+    edge_weight_type = "EUC_2D"
+    with open(file_path, "r") as file:
+        lines = file.readlines()
+
+    node_coord_section = False
+    for line in lines:
+        if line.startswith("NAME"):
+            tsp_name = line.split(":")[1].strip()
+        elif line.startswith("EDGE_WEIGHT_TYPE"):
+            edge_weight_type = line.split(":")[1].strip()
+        elif line.startswith("NODE_COORD_SECTION"):
+            node_coord_section = True
+            continue
+        elif line.startswith("EOF"):
+            break
+        elif node_coord_section and line.strip():
+            node_info = line.strip().split()
+            node_id = int(node_info[0])
+            x = float(node_info[1])
+            y = float(node_info[2])
+            coordinates[node_id] = (x, y)
+
+    return tsp_name, coordinates, edge_weight_type
+
+
+def distance_matrix(points, metric="EUC_2D", block_size=2048):
+    # Macierz liczona blokami wierszy, żeby tablice pośrednie nie rosły jak n^2 * 2
+    kernel = get_metric(metric)
+    points = np.asarray(points, dtype=float)
+    matrix = np.empty((len(points), len(points)))
+    for start in range(0, len(points), block_size):
+        block = points[start:start + block_size]
+        matrix[start:start + block_size] = kernel(block[:, None, :], points[None, :, :])
+    return matrix
+
+
+def distances_from(points, source, metric="EUC_2D"):
+    # Odległości jednego miasta do wszystkich - np. krok najbliższego sąsiada
+    return get_metric(metric)(np.asarray(source, dtype=float)[None, :], points)
+
+
+def scalar_distance(metric="EUC_2D"):
+    # Wersja skalarna (na krotkach współrzędnych) do pojedynczych zapytań w pętlach
+    if metric == "EUC_2D":
+        return lambda a, b: math.floor(math.hypot(a[0] - b[0], a[1] - b[1]) + 0.5)
+    if metric == "CEIL_2D":
+        return lambda a, b: math.ceil(math.hypot(a[0] - b[0], a[1] - b[1]))
+    if metric == "MAN_2D":
+        return lambda a, b: math.floor(abs(a[0] - b[0]) + abs(a[1] - b[1]) + 0.5)
+    if metric == "MAX_2D":
+        return lambda a, b: max(math.floor(abs(a[0] - b[0]) + 0.5), math.floor(abs(a[1] - b[1]) + 0.5))
+    kernel = get_metric(metric)
+    return lambda a, b: float(kernel(np.asarray(a, dtype=float), np.asarray(b, dtype=float)))
+
+
+def spatial_points(points, metric="EUC_2D"):
+    # Współrzędne, na których można budować indeks przestrzenny (kNN, siatki).
+    # Dla GEO rzutujemy szerokość/długość geograficzną na płaszczyznę (równoodległościowo).
+    points = np.asarray(points, dtype=float)
+    if metric != "GEO":
+        return points
+    latitude, longitude = geo_radians(points[:, 0]), geo_radians(points[:, 1])
+    return np.column_stack([longitude * np.cos(latitude), latitude]) * GEO_RADIUS
+
+
+def tour_length(points, tour, metric="EUC_2D"):
+    closed = np.append(np.asarray(tour), tour[0])
+    points = np.asarray(points, dtype=float)
+    return float(get_metric(metric)(points[closed[:-1]], points[closed[1:]]).sum())
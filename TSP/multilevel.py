@@ -0,0 +1,162 @@
+import os
+import time
+
+import numpy as np
+
+from generator import uniform_instance
+from insertion import insertion_tour
+from metrics import read_tsp_instance, spatial_points, tour_length
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import get_diff_result
+from two_level_list import two_opt_or_opt
+
+
+def match_pairs(points, k=4):
+    # Zachłanne skojarzenie po krawędziach grafu k najbliższych sąsiadów od najkrótszej.
+    # Remisy (siatki, instancje DIMACS) rozstrzyga kolejność indeksów, więc pary powstają
+    # także tam, gdzie wzajemnie najbliższych sąsiadów prawie nie ma.
+    neighbors = nearest_neighbor_lists(points, k=min(k, len(points) - 1))
+    u = np.repeat(np.arange(len(points)), neighbors.shape[1])
+    v = neighbors.ravel().astype(np.int64)
+    lengths = np.hypot(points[u, 0] - points[v, 0], points[u, 1] - points[v, 1])
+    order = np.lexsort((np.maximum(u, v), np.minimum(u, v), lengths))
+    matched = bytearray(len(points))
+    first, second = [], []
+    for a, b in zip(u[order].tolist(), v[order].tolist()):
+        if not matched[a] and not matched[b]:
+            matched[a] = matched[b] = 1
+            first.append(a)
+            second.append(b)
+    return np.array(first, dtype=np.int64), np.array(second, dtype=np.int64), np.frombuffer(matched, dtype=np.uint8)
+
+
+def coarsen(points, weights):
+    # Łączy skojarzone pary miast w jedno miasto w środku ciężkości pary
+    first, second, matched = match_pairs(points)
+    single = np.flatnonzero(matched == 0)
+
+    num_coarse = len(first) + len(single)
+    parent = np.empty(len(points), dtype=np.int64)
+    parent[first] = np.arange(len(first))
+    parent[second] = np.arange(len(first))
+    parent[single] = np.arange(len(first), num_coarse)
+
+    coarse_weights = np.bincount(parent, weights=weights, minlength=num_coarse)
+    coarse_points = np.column_stack([
+        np.bincount(parent, weights=points[:, 0] * weights, minlength=num_coarse),
+        np.bincount(parent, weights=points[:, 1] * weights, minlength=num_coarse),
+    ]) / coarse_weights[:, None]
+    return coarse_points, coarse_weights, parent
+
+
+def nearest_neighbor_tour(points):
+    visited = np.zeros(len(points), dtype=bool)
+    tour = [0]
+    visited[0] = True
+    for _ in range(len(points) - 1):
+        row = np.hypot(points[:, 0] - points[tour[-1], 0], points[:, 1] - points[tour[-1], 1])
+        row[visited] = np.inf
+        nearest_neighbor = int(np.argmin(row))
+        tour.append(nearest_neighbor)
+        visited[nearest_neighbor] = True
+    return tour
+
+
+def uncoarsen(points, parent, coarse_tour):
+    # Każde miasto grubszego poziomu zastępujemy jego dziećmi (jednym lub dwoma),
+    # wybierając kolejność pary tak, żeby przejście od poprzedniego miasta było krótsze
+    order = np.argsort(parent, kind="stable")
+    offsets = np.searchsorted(parent[order], np.arange(parent.max() + 2)).tolist()
+    order = order.tolist()
+    x, y = points[:, 0].tolist(), points[:, 1].tolist()
+
+    tour = []
+    for coarse in coarse_tour:
+        children = order[offsets[coarse]:offsets[coarse + 1]]
+        if len(children) == 2 and tour:
+            last = tour[-1]
+            a, b = children
+            if (x[b] - x[last]) ** 2 + (y[b] - y[last]) ** 2 < (x[a] - x[last]) ** 2 + (y[a] - y[last]) ** 2:
+                children = [b, a]
+        tour.extend(children)
+    return tour
+
+
+def multilevel_tour(points, coarse_size=1000, max_time=60, k=8):
+    start_time = time.time()
+    levels = []
+    current, weights = points, np.ones(len(points))
+    while len(current) > max(coarse_size, 2):
+        coarse_points, weights, parent = coarsen(current, weights)
+        if len(coarse_points) > 0.95 * len(current):
+            break
+        levels.append((current, parent))
+        current = coarse_points
+
+    # Budżet czasu dzielimy po równo między rozwiązanie najgrubszego poziomu i kolejne poziomy
+    level_budget = max(max_time - (time.time() - start_time), 0) / (len(levels) + 1)
+    # Najgrubszy poziom bywa większy od coarse_size, gdy skojarzenie przestaje zmniejszać
+    # instancję - wtedy zamiast kwadratowego najbliższego sąsiada wstawianie na siatce
+    if len(current) > coarse_size:
+        tour = insertion_tour(current, method="farthest")
+    else:
+        tour = nearest_neighbor_tour(current)
+    if len(current) >= 5:
+        remaining = max_time - (time.time() - start_time)
+        tour = two_opt_or_opt(
+            current, tour, nearest_neighbor_lists(current, k=k), max_time=min(level_budget, max(remaining, 0))
+        ).to_list()
+
+    for level_points, parent in reversed(levels):
+        tour = uncoarsen(level_points, parent, tour)
+        remaining = max_time - (time.time() - start_time)
+        tour = two_opt_or_opt(
+            level_points, tour, nearest_neighbor_lists(level_points, k=k),
+            max_time=min(level_budget, max(remaining, 0)),
+        ).to_list()
+    return tour
+
+
+def multilevel_tsp(coordinates, coarse_size=1000, max_time=60, metric="EUC_2D"):
+    start_time = time.time()
+    node_ids, points = coordinates_to_array(coordinates)
+
+    tour = multilevel_tour(spatial_points(points, metric), coarse_size=coarse_size, max_time=max_time)
+    total_cost = tour_length(points, tour, metric)
+    tour = [node_ids[idx] for idx in tour]
+    tour.append(tour[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+    for file_path in files:
+        tsp_name, coordinates, metric = read_tsp_instance(file_path)
+        tour, tour_cost_value, execution_time = multilevel_tsp(coordinates, coarse_size=200, metric=metric)
+        total_execution_time += execution_time
+        diff_result = get_diff_result(os.path.basename(file_path), tour_cost_value)
+        print(f"TSP Name: {tsp_name}")
+        print(f"Tour cost: {tour_cost_value}")
+        print(f"Difference from optimal: {diff_result}")
+        print(f"Execution time: {execution_time} seconds")
+
+    # Instancja, której generate_complete_graph nie zmieściłby w pamięci
+    points = uniform_instance(200000)
+    coordinates = {idx + 1: (x, y) for idx, (x, y) in enumerate(points.tolist())}
+    tour, tour_cost_value, execution_time = multilevel_tsp(coordinates)
+    total_execution_time += execution_time
+    print("TSP Name: uniform200000")
+    print(f"Tour cost: {tour_cost_value}")
+    print(f"Execution time: {execution_time} seconds")
+    print(f"Total Execution Time: {total_execution_time} seconds")
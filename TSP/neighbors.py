@@ -0,0 +1,60 @@
+import numpy as np
+
+
+def coordinates_to_array(coordinates):
+    node_ids = list(coordinates.keys())
+    points = np.array([coordinates[node_id] for node_id in node_ids], dtype=float)
+    return node_ids, points
+
+
+def nearest_neighbor_lists(points, k=8):
+    # Dzielimy płaszczyznę na siatkę, tak żeby w komórce było średnio ~k miast,
+    # i szukamy sąsiadów tylko w pierścieniach komórek wokół danej komórki
+    num_nodes = len(points)
+    k = min(k, num_nodes - 1)
+    neighbors = np.zeros((num_nodes, max(k, 0)), dtype=np.int32)
+    if k <= 0:
+        return neighbors
+
+    min_xy = points.min(axis=0)
+    span = np.maximum(points.max(axis=0) - min_xy, 1e-9)
+    cells_per_side = max(1, int(np.sqrt(num_nodes / k)))
+    cell_size = span / cells_per_side
+    cell_xy = np.minimum(((points - min_xy) / cell_size).astype(np.int64), cells_per_side - 1)
+    cell_id = cell_xy[:, 0] * cells_per_side + cell_xy[:, 1]
+
+    order = np.argsort(cell_id, kind="stable")
+    offsets = np.searchsorted(cell_id[order], np.arange(cells_per_side * cells_per_side + 1))
+
+    for cx in range(cells_per_side):
+        for cy in range(cells_per_side):
+            cell = cx * cells_per_side + cy
+            members = order[offsets[cell]:offsets[cell + 1]]
+            if len(members) == 0:
+                continue
+
+            ring = 1
+            while True:
+                x0, x1 = max(cx - ring, 0), min(cx + ring, cells_per_side - 1)
+                y0, y1 = max(cy - ring, 0), min(cy + ring, cells_per_side - 1)
+                candidates = np.concatenate([
+                    order[offsets[x * cells_per_side + y0]:offsets[x * cells_per_side + y1 + 1]]
+                    for x in range(x0, x1 + 1)
+                ])
+                covers_all = x0 == 0 and y0 == 0 and x1 == y1 == cells_per_side - 1
+                if len(candidates) > k:
+                    deltas = points[members][:, None, :] - points[candidates][None, :, :]
+                    distances = np.sqrt((deltas ** 2).sum(axis=2))
+                    distances[candidates[None, :] == members[:, None]] = np.inf
+                    nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                    nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+                    # Każde miasto spoza pierścienia jest dalej niż ring * cell_size,
+                    # więc jeśli k-ty sąsiad jest bliżej, wynik jest dokładny
+                    if covers_all or nearest_distances.max() <= ring * cell_size.min():
+                        break
+                ring += 1
+
+            nearest = np.take_along_axis(nearest, np.argsort(nearest_distances, axis=1), axis=1)
+            neighbors[members] = candidates[nearest]
+
+    return neighbors
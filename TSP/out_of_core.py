@@ -0,0 +1,253 @@
+import os
+import resource
+import time
+from itertools import islice
+
+import numpy as np
+
+from generator import SIDE
+from metrics import get_metric, spatial_points
+from multilevel import multilevel_tour
+from show_quality import get_diff_result
+
+# Tryb "out-of-core": współrzędne, podział na kafelki i trasa leżą w plikach .npy
+# otwieranych jako memmap, a w pamięci jest naraz co najwyżej jeden kafelek
+# (tile_budget miast) i jeden blok wczytywanych wierszy (chunk_size).
+
+
+def tsp_to_memmap(file_path, work_dir, chunk_size=100000):
+    # Strumieniowe wczytanie pliku .tsp do ids.npy i coords.npy bez budowania słownika
+    tsp_name = ""
+    metric = "EUC_2D"
+    dimension = None
+    with open(file_path, "r") as file:
+        for line in file:
+            if line.startswith("NAME"):
+                tsp_name = line.split(":")[1].strip()
+            elif line.startswith("EDGE_WEIGHT_TYPE"):
+                metric = line.split(":")[1].strip()
+            elif line.startswith("DIMENSION"):
+                dimension = int(line.split(":")[1])
+            elif line.startswith("NODE_COORD_SECTION"):
+                break
+        if dimension is None:
+            raise ValueError(f"{file_path}: DIMENSION is required for out-of-core reading")
+
+        ids = np.lib.format.open_memmap(os.path.join(work_dir, "ids.npy"), mode="w+", dtype=np.int64, shape=(dimension,))
+        coords = np.lib.format.open_memmap(os.path.join(work_dir, "coords.npy"), mode="w+", dtype=float, shape=(dimension, 2))
+        count = 0
+        while count < dimension:
+            lines = [line for line in islice(file, chunk_size) if line.strip() and not line.startswith("EOF")]
+            if not lines:
+                break
+            rows = np.array(" ".join(lines).split(), dtype=float).reshape(-1, 3)
+            ids[count:count + len(rows)] = rows[:, 0]
+            coords[count:count + len(rows)] = rows[:, 1:]
+            count += len(rows)
+    if count != dimension:
+        raise ValueError(f"{file_path}: expected {dimension} cities, found {count}")
+    ids.flush()
+    coords.flush()
+    return tsp_name, metric, ids, coords
+
+
+def points_to_memmap(points_chunks, num_nodes, work_dir):
+    # To samo dla instancji generowanych blokami (miasta numerowane od 1)
+    ids = np.lib.format.open_memmap(os.path.join(work_dir, "ids.npy"), mode="w+", dtype=np.int64, shape=(num_nodes,))
+    coords = np.lib.format.open_memmap(os.path.join(work_dir, "coords.npy"), mode="w+", dtype=float, shape=(num_nodes, 2))
+    count = 0
+    for chunk in points_chunks:
+        ids[count:count + len(chunk)] = np.arange(count + 1, count + len(chunk) + 1)
+        coords[count:count + len(chunk)] = chunk
+        count += len(chunk)
+    ids.flush()
+    coords.flush()
+    return ids, coords
+
+
+def tile_grid(coords, tile_budget, sample_size=100000, seed=0):
+    # Kolumny wg kwantyli x, a w każdej kolumnie wiersze wg kwantyli y, liczone na próbce -
+    # dzięki temu kafelki mają podobną liczbę miast także dla instancji z klastrami
+    num_nodes = len(coords)
+    num_tiles = max(1, int(np.ceil(num_nodes / (0.8 * tile_budget))))
+    num_cols = int(np.ceil(np.sqrt(num_tiles)))
+    num_rows = int(np.ceil(num_tiles / num_cols))
+
+    rng = np.random.default_rng(seed)
+    sample_idx = np.sort(rng.choice(num_nodes, size=min(sample_size, num_nodes), replace=False))
+    sample = np.asarray(coords[sample_idx])
+
+    col_edges = np.quantile(sample[:, 0], np.linspace(0, 1, num_cols + 1)[1:-1])
+    sample_cols = np.searchsorted(col_edges, sample[:, 0], side="right")
+    row_edges = np.empty((num_cols, num_rows - 1))
+    for col in range(num_cols):
+        column = sample[sample_cols == col, 1]
+        if len(column) == 0:
+            column = sample[:, 1]
+        row_edges[col] = np.quantile(column, np.linspace(0, 1, num_rows + 1)[1:-1])
+    return col_edges, row_edges
+
+
+def tile_ids(points, col_edges, row_edges):
+    # Numeracja kafelków wężykiem (w nieparzystych kolumnach od góry), więc kolejne
+    # kafelki zawsze ze sobą sąsiadują
+    num_rows = row_edges.shape[1] + 1
+    cols = np.searchsorted(col_edges, points[:, 0], side="right")
+    rows = np.empty(len(points), dtype=np.int64)
+    for col in np.unique(cols):
+        mask = cols == col
+        rows[mask] = np.searchsorted(row_edges[col], points[mask, 1], side="right")
+    rows = np.where(cols % 2 == 1, num_rows - 1 - rows, rows)
+    return cols * num_rows + rows
+
+
+def build_tiles(coords, work_dir, tile_budget=50000, chunk_size=100000, sample_size=100000):
+    # Sortowanie przez zliczanie na dysku: pierwszy przebieg liczy miasta w kafelkach,
+    # drugi rozrzuca ich indeksy do tiles.npy; offsets[t]:offsets[t + 1] to kafelek t
+    col_edges, row_edges = tile_grid(coords, tile_budget, sample_size=sample_size)
+    num_tiles = (len(col_edges) + 1) * (row_edges.shape[1] + 1)
+    num_nodes = len(coords)
+
+    counts = np.zeros(num_tiles, dtype=np.int64)
+    sums = np.zeros((num_tiles, 2))
+    for start in range(0, num_nodes, chunk_size):
+        points = np.asarray(coords[start:start + chunk_size])
+        tiles = tile_ids(points, col_edges, row_edges)
+        counts += np.bincount(tiles, minlength=num_tiles)
+        sums[:, 0] += np.bincount(tiles, weights=points[:, 0], minlength=num_tiles)
+        sums[:, 1] += np.bincount(tiles, weights=points[:, 1], minlength=num_tiles)
+
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    centers = sums / np.maximum(counts, 1)[:, None]
+    order = np.lib.format.open_memmap(os.path.join(work_dir, "tiles.npy"), mode="w+", dtype=np.int64, shape=(num_nodes,))
+    cursor = offsets[:-1].copy()
+    for start in range(0, num_nodes, chunk_size):
+        tiles = tile_ids(np.asarray(coords[start:start + chunk_size]), col_edges, row_edges)
+        by_tile = np.argsort(tiles, kind="stable")
+        sorted_tiles = tiles[by_tile]
+        rank = np.arange(len(tiles)) - np.searchsorted(sorted_tiles, sorted_tiles)
+        order[cursor[sorted_tiles] + rank] = start + by_tile
+        cursor += np.bincount(tiles, minlength=num_tiles)
+    order.flush()
+    np.save(os.path.join(work_dir, "tile_offsets.npy"), offsets)
+    return order, offsets, centers
+
+
+def open_path(points, tour, entry, exit_point, distance):
+    # Rozcina zamkniętą trasę kafelka na ścieżkę: wybiera krawędź do usunięcia i kierunek
+    # tak, żeby ścieżka zaczynała się blisko końca poprzedniego kafelka (entry)
+    # i kończyła blisko środka następnego (exit_point)
+    tour = np.asarray(tour)
+    following = np.roll(tour, -1)
+    removed = distance(points[tour], points[following])
+    forward = -removed
+    backward = -removed
+    if entry is not None:
+        forward = forward + distance(entry[None, :], points[following])
+        backward = backward + distance(entry[None, :], points[tour])
+    if exit_point is not None:
+        forward = forward + distance(exit_point[None, :], points[tour])
+        backward = backward + distance(exit_point[None, :], points[following])
+    cut_forward, cut_backward = int(np.argmin(forward)), int(np.argmin(backward))
+    if forward[cut_forward] <= backward[cut_backward]:
+        return np.roll(tour, -(cut_forward + 1))
+    return np.roll(tour, -(cut_backward + 1))[::-1]
+
+
+def tile_pieces(start, end, tile_budget):
+    # Kafelek większy niż budżet (np. wiele miast w jednym punkcie) dzielimy na kawałki
+    for piece_start in range(start, end, tile_budget):
+        yield piece_start, min(piece_start + tile_budget, end)
+
+
+def out_of_core_tour(coords, ids, work_dir, metric="EUC_2D", tile_budget=50000, time_per_tile=5,
+                     chunk_size=100000):
+    distance = get_metric(metric)
+    order, offsets, centers = build_tiles(coords, work_dir, tile_budget=tile_budget, chunk_size=chunk_size)
+    tour_path = os.path.join(work_dir, "tour.npy")
+    tour = np.lib.format.open_memmap(tour_path, mode="w+", dtype=np.int64, shape=(len(coords),))
+
+    nonempty = [tile for tile in range(len(offsets) - 1) if offsets[tile + 1] > offsets[tile]]
+    total_cost = 0.0
+    written = 0
+    first_point = last_point = None
+    for position, tile in enumerate(nonempty):
+        exit_point = centers[nonempty[position + 1]] if position + 1 < len(nonempty) else None
+        for start, end in tile_pieces(offsets[tile], offsets[tile + 1], tile_budget):
+            # Sortujemy indeksy kafelka, żeby odczyt z memmapy szedł kolejno po pliku
+            idx = np.sort(np.asarray(order[start:end]))
+            points = np.asarray(coords[idx])
+            local = multilevel_tour(spatial_points(points, metric), coarse_size=1000, max_time=time_per_tile)
+            path = open_path(points, local, last_point, exit_point, distance)
+
+            path_points = points[path]
+            total_cost += float(distance(path_points[:-1], path_points[1:]).sum())
+            if last_point is None:
+                first_point = path_points[0]
+            else:
+                total_cost += float(distance(last_point, path_points[0]))
+            last_point = path_points[-1]
+
+            tour[written:written + len(path)] = np.asarray(ids[idx[path]])
+            written += len(path)
+
+    total_cost += float(distance(last_point, first_point))
+    tour.flush()
+    return tour_path, total_cost
+
+
+def out_of_core_tsp(file_path, work_dir, tile_budget=50000, time_per_tile=5, chunk_size=100000):
+    # Zwraca ścieżkę do tour.npy (otwartej trasy z identyfikatorami miast) zamiast listy
+    start_time = time.time()
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+    tsp_name, metric, ids, coords = tsp_to_memmap(file_path, work_dir, chunk_size=chunk_size)
+    tour_path, total_cost = out_of_core_tour(
+        coords, ids, work_dir, metric=metric, tile_budget=tile_budget,
+        time_per_tile=time_per_tile, chunk_size=chunk_size,
+    )
+    end_time = time.time()
+    execution_time = end_time - start_time
+    return tsp_name, tour_path, total_cost, execution_time
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+    for file_path in files:
+        tsp_name, tour_path, tour_cost, execution_time = out_of_core_tsp(
+            file_path, os.path.join("out_of_core", os.path.basename(file_path)), tile_budget=1000, time_per_tile=2
+        )
+        total_execution_time += execution_time
+        print(f"TSP Name: {tsp_name}")
+        print(f"Tour cost: {tour_cost}")
+        print(f"Difference from optimal: {get_diff_result(os.path.basename(file_path), tour_cost)}")
+        print(f"Tour written to: {tour_path}")
+        print(f"Execution time: {execution_time} seconds")
+
+    # Instancja 2 000 000 miast generowana blokami prosto do memmapy
+    num_nodes = 2000000
+    work_dir = os.path.join("out_of_core", "uniform2000000")
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+    rng = np.random.default_rng(0)
+    chunks = (rng.uniform(0, SIDE, size=(min(1000000, num_nodes - start), 2)) for start in range(0, num_nodes, 1000000))
+    start_time = time.time()
+    ids, coords = points_to_memmap(chunks, num_nodes, work_dir)
+    tour_path, tour_cost = out_of_core_tour(coords, ids, work_dir, tile_budget=50000, time_per_tile=5)
+    execution_time = time.time() - start_time
+    total_execution_time += execution_time
+    print("TSP Name: uniform2000000")
+    print(f"Tour cost: {tour_cost}")
+    print(f"Tour written to: {tour_path}")
+    print(f"Execution time: {execution_time} seconds")
+    print(f"Peak RSS: {peak_rss_mb():.0f} MB")
+    print(f"Total Execution Time: {total_execution_time} seconds")
@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from insertion import insertion_tour
+from metrics import scalar_distance, spatial_points, tour_length
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import read_tsp_file, get_diff_result
+from two_level_list import two_opt_or_opt
+
+# Równoległy 2-opt/Or-opt: trasa leży w pamięci współdzielonej, każdy proces poprawia
+# swój ciągły fragment z ustalonymi końcami i zapisuje go w to samo miejsce tablicy.
+# Fragmenty są rozłączne, więc nie trzeba żadnej synchronizacji poza końcem rundy.
+STICKY = 1e18
+
+shared = {}
+
+
+def attach_shared(tour_name, points_name, num_nodes, metric):
+    tour_memory = shared_memory.SharedMemory(name=tour_name)
+    points_memory = shared_memory.SharedMemory(name=points_name)
+    shared["memory"] = (tour_memory, points_memory)
+    shared["tour"] = np.ndarray((num_nodes,), dtype=np.int64, buffer=tour_memory.buf)
+    shared["points"] = np.ndarray((num_nodes, 2), dtype=float, buffer=points_memory.buf)
+    shared["metric"] = metric
+
+
+def improve_path(points, metric="EUC_2D", max_time=10, k=8):
+    # Ścieżka 0 -> ... -> m-1 z ustalonymi końcami: zamykamy ją w cykl krawędzią (m-1, 0)
+    # o bardzo ujemnej długości, więc żaden ruch 2-opt/Or-opt jej nie usunie
+    num_nodes = len(points)
+    if num_nodes < 8:
+        return list(range(num_nodes))
+    last = num_nodes - 1
+    base_distance = scalar_distance(metric)
+    coordinates = points.tolist()
+
+    def distance(u, v):
+        if (u == 0 and v == last) or (u == last and v == 0):
+            return -STICKY
+        return base_distance(coordinates[u], coordinates[v])
+
+    neighbors = nearest_neighbor_lists(spatial_points(points, metric), k=k)
+    order = two_opt_or_opt(points, list(range(num_nodes)), neighbors, max_time=max_time, distance=distance)
+    order = order.to_list(start=0)
+    if order[1] == last:
+        order = [0] + order[1:][::-1]
+    return order
+
+
+def improve_segment(task):
+    # positions - pozycje fragmentu w tablicy trasy (po rotacji granic mogą się zawijać)
+    start, end, offset, max_time, k = task
+    tour, points, metric = shared["tour"], shared["points"], shared["metric"]
+    positions = np.arange(start + offset, end + offset) % len(tour)
+    cities = tour[positions]
+    segment_points = points[cities]
+    distance = scalar_distance(metric)
+    before = sum(distance(segment_points[i], segment_points[i + 1]) for i in range(len(cities) - 1))
+    order = improve_path(segment_points, metric=metric, max_time=max_time, k=k)
+    tour[positions] = cities[order]
+    after = sum(distance(segment_points[order[i]], segment_points[order[i + 1]]) for i in range(len(order) - 1))
+    return before - after
+
+
+def parallel_two_opt(points, tour, metric="EUC_2D", workers=None, rounds=6, max_time=60, k=8):
+    # tour - otwarta trasa z indeksami miast; zwraca poprawioną trasę jako listę
+    start_time = time.time()
+    workers = workers or os.cpu_count()
+    points = np.ascontiguousarray(points, dtype=float)
+    num_nodes = len(tour)
+    num_segments = max(1, min(workers, num_nodes // 16))
+    segment_length = num_nodes / num_segments
+    bounds = np.linspace(0, num_nodes, num_segments + 1).astype(int)
+
+    tour_memory = shared_memory.SharedMemory(create=True, size=num_nodes * 8)
+    points_memory = shared_memory.SharedMemory(create=True, size=points.nbytes)
+    try:
+        shared_tour = np.ndarray((num_nodes,), dtype=np.int64, buffer=tour_memory.buf)
+        shared_tour[:] = tour
+        np.ndarray(points.shape, dtype=float, buffer=points_memory.buf)[:] = points
+        with multiprocessing.get_context().Pool(
+            num_segments, initializer=attach_shared,
+            initargs=(tour_memory.name, points_memory.name, num_nodes, metric),
+        ) as pool:
+            for round_number in range(rounds):
+                remaining = max_time - (time.time() - start_time)
+                if remaining <= 0:
+                    break
+                # Granice przesuwamy co rundę o ułamek złotego podziału długości fragmentu,
+                # żeby krawędzie przy granicach trafiały w kolejnych rundach do środka fragmentów
+                offset = int(round_number * 0.618 * segment_length) % num_nodes
+                tasks = [
+                    (bounds[i], bounds[i + 1], offset, remaining / (rounds - round_number), k)
+                    for i in range(num_segments)
+                ]
+                gain = sum(pool.map(improve_segment, tasks))
+                if gain <= 1e-9 and round_number > 0:
+                    break
+        result = shared_tour.tolist()
+    finally:
+        tour_memory.close()
+        tour_memory.unlink()
+        points_memory.close()
+        points_memory.unlink()
+    return result
+
+
+def parallel_two_opt_tsp(coordinates, metric="EUC_2D", workers=None, max_time=60):
+    start_time = time.time()
+    node_ids, points = coordinates_to_array(coordinates)
+
+    tour = insertion_tour(spatial_points(points, metric), method="farthest")
+    tour = parallel_two_opt(points, tour, metric=metric, workers=workers, max_time=max_time)
+    total_cost = tour_length(points, tour, metric)
+    tour = [node_ids[idx] for idx in tour]
+    tour.append(tour[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+    for file_path in files:
+        tsp_name, coordinates = read_tsp_file(file_path)
+        for workers in (1, os.cpu_count()):
+            tour, tour_cost, execution_time = parallel_two_opt_tsp(coordinates, workers=workers)
+            total_execution_time += execution_time
+            print(f"TSP Name: {tsp_name} ({workers} workers)")
+            print(f"Tour cost: {tour_cost}")
+            print(f"Difference from optimal: {get_diff_result(os.path.basename(file_path), tour_cost)}")
+            print(f"Execution time: {execution_time} seconds")
+    print(f"Total Execution Time: {total_execution_time} seconds")
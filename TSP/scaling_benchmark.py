@@ -0,0 +1,143 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+import all_classic
+import show_quality
+import show_very_fast
+from generator import generate_tsp_file
+from insertion import farthest_insertion_tsp
+from two_level_list import nearest_neighbor_two_level_tsp
+
+
+def run_nearest_neighbor(file_path):
+    _, coordinates = show_quality.read_tsp_file(file_path)
+    G = all_classic.generate_complete_graph(coordinates)
+    all_classic.nearest_neighbor_tsp(G, min(G.keys()))
+
+
+def run_two_opt(file_path):
+    show_quality.process_tsp_file(file_path)
+
+
+def run_partitioned(file_path):
+    show_very_fast.nearest_neighbor_partitioned_tsp(file_path)
+
+
+def run_farthest_insertion(file_path):
+    _, coordinates = show_quality.read_tsp_file(file_path)
+    farthest_insertion_tsp(coordinates)
+
+
+def run_two_level_two_opt(file_path):
+    _, coordinates = show_quality.read_tsp_file(file_path)
+    nearest_neighbor_two_level_tsp(coordinates)
+
+
+# Nazwa -> (funkcja, największe n, dla którego ma sens ją uruchamiać, największy dopuszczalny
+# wykładnik czasu). Limity to zmierzona złożoność z zapasem: macierz pełna i najbliższy sąsiad
+# wierszami są kwadratowe z założenia, wstawianie na siatce i listach sąsiadów - nie.
+PIPELINES = {
+    "nearest_neighbor (all_classic)": (run_nearest_neighbor, 5000, 2.3),
+    "two_opt (show_quality)": (run_two_opt, 500, 2.8),
+    "partitioned 4x4 (show_very_fast)": (run_partitioned, 20000, 2.2),
+    "farthest insertion": (run_farthest_insertion, 1000000, 1.6),
+    "two-level 2-opt": (run_two_level_two_opt, 50000, 2.2),
+}
+
+
+def measure(function, file_path):
+    # Czas bez tracemalloc (śledzenie każdej alokacji spowalnia, najbardziej czysty Python),
+    # pamięć w osobnym uruchomieniu pod tracemalloc
+    start_time = time.perf_counter()
+    function(file_path)
+    execution_time = time.perf_counter() - start_time
+    tracemalloc.start()
+    function(file_path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return execution_time, peak / 2 ** 20
+
+
+def scaling_exponent(sizes, values):
+    # Nachylenie prostej w skali log-log: ~1 liniowo, ~2 kwadratowo
+    if len(sizes) < 2:
+        return float("nan")
+    return float(np.polyfit(np.log(sizes), np.log(np.maximum(values, 1e-9)), 1)[0])
+
+
+def run_benchmark(sizes, kind="uniform", pipelines=PIPELINES, output_dir=None):
+    results = {name: [] for name in pipelines}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_nodes in sizes:
+            file_path = generate_tsp_file(output_dir or tmp_dir, kind, num_nodes)
+            for name, (function, max_nodes, _) in pipelines.items():
+                if num_nodes > max_nodes:
+                    continue
+                execution_time, peak_memory = measure(function, file_path)
+                results[name].append((num_nodes, execution_time, peak_memory))
+                print(f"{name:36s} n={num_nodes:8d}  {execution_time:10.3f} s  {peak_memory:10.1f} MB")
+    return results
+
+
+def scaling_regressions(results, pipelines=PIPELINES):
+    # Potoki, których dopasowany wykładnik czasu przekracza limit z PIPELINES
+    # (potrzebne co najmniej trzy rozmiary, żeby dopasowanie coś znaczyło)
+    regressions = []
+    for name, rows in results.items():
+        if len(rows) < 3:
+            continue
+        sizes, times, _ = zip(*rows)
+        exponent = scaling_exponent(sizes, times)
+        if exponent > pipelines[name][2]:
+            regressions.append((name, exponent, pipelines[name][2]))
+    return regressions
+
+
+def plot_scaling(results, kind, output_dir):
+    fig, (ax_time, ax_memory) = plt.subplots(1, 2, figsize=(14, 6))
+    for name, rows in results.items():
+        if not rows:
+            continue
+        sizes, times, memory = zip(*rows)
+        ax_time.loglog(sizes, times, "o-", label=name)
+        ax_memory.loglog(sizes, memory, "o-", label=name)
+    ax_time.set_title(f"Time vs n ({kind})")
+    ax_time.set_xlabel("n")
+    ax_time.set_ylabel("seconds")
+    ax_memory.set_title(f"Peak traced memory vs n ({kind})")
+    ax_memory.set_xlabel("n")
+    ax_memory.set_ylabel("MB")
+    ax_time.legend()
+    ax_time.grid(True)
+    ax_memory.grid(True)
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    plot_path = os.path.join(output_dir, f"scaling_{kind}.png")
+    fig.savefig(plot_path)
+    plt.close(fig)
+    return plot_path
+
+
+if __name__ == "__main__":
+    sizes = [200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000, 1000000]
+    regressions = []
+    for kind in ("uniform", "clustered"):
+        results = run_benchmark(sizes, kind=kind)
+        regressions += [(kind, *regression) for regression in scaling_regressions(results)]
+        for name, rows in results.items():
+            if rows:
+                sizes_run, times, memory = zip(*rows)
+                print(f"{name:36s} time ~ n^{scaling_exponent(sizes_run, times):.2f}, "
+                      f"memory ~ n^{scaling_exponent(sizes_run, memory):.2f}")
+        plot_scaling(results, kind, "plots")
+    for kind, name, exponent, limit in regressions:
+        print(f"Scaling regression ({kind}): {name} time ~ n^{exponent:.2f}, limit n^{limit:.2f}")
+    if regressions:
+        sys.exit(1)
@@ -3,6 +3,11 @@ import math
 import numpy as np
 import os
 
+import kernels
+import metrics
+from cell_index import CellIndex
+from tour_output import save_result
+
 def read_tsp_file(file_path):
     coordinates = {}
     tsp_name = ""
@@ -27,20 +32,11 @@ def read_tsp_file(file_path):
 
     return tsp_name, coordinates
 
-def chebyshev_distance(coord1, coord2):
-    return max(abs(coord1[0] - coord2[0]), abs(coord1[1] - coord2[1]))
-
-def generate_distance_matrix_for_partition(partition_nodes, coordinates):
-    num_nodes = len(partition_nodes)
-    distance_matrix = np.zeros((num_nodes, num_nodes))
+def generate_distance_matrix_for_partition(partition_nodes, coordinates, metric="EUC_2D"):
     node_to_index = {node_id: idx for idx, node_id in enumerate(partition_nodes)}
-
-    for i, node_id1 in enumerate(partition_nodes):
-        for j, node_id2 in enumerate(partition_nodes):
-            if i != j:
-                distance_matrix[i][j] = chebyshev_distance(coordinates[node_id1], coordinates[node_id2])
-            else:
-                distance_matrix[i][j] = float('inf')
+    points = np.array([coordinates[node_id] for node_id in partition_nodes])
+    distance_matrix = kernels.distance_matrix(points, metric)
+    np.fill_diagonal(distance_matrix, float('inf'))
 
     return distance_matrix, node_to_index
 
@@ -67,47 +63,39 @@ def partition_space(coordinates):
 def nearest_neighbor_partitioned_tsp(file_path):
     start_time = time.time()
 
-    tsp_name, coordinates = read_tsp_file(file_path)
+    # Metryka z EDGE_WEIGHT_TYPE w nagłówku pliku
+    tsp_name, coordinates, metric = metrics.read_tsp_instance(file_path)
+    distance = metrics.scalar_distance(metric)
     partitions = partition_space(coordinates)
 
+    # Miasta partycji to bloki indeksu CSR, bez przeglądania wszystkich miast dla każdej komórki
+    node_ids = np.array(list(coordinates.keys()))
+    index = CellIndex.from_partitions(np.array(list(coordinates.values()), dtype=float), partitions)
+
     full_tour = []
     total_cost = 0
     global_node_to_index = {node_id: idx for idx, node_id in enumerate(coordinates.keys())}
 
-    for part in partitions:
-        min_x, max_x, min_y, max_y = part
-
-        cities_in_partition = [
-            node_id
-            for node_id, coord in coordinates.items()
-            if min_x <= coord[0] <= max_x and min_y <= coord[1] <= max_y
-        ]
+    for cell in index:
+        cities_in_partition = node_ids[cell].tolist()
 
         if not cities_in_partition:
             continue
 
-        distance_matrix, node_to_index = generate_distance_matrix_for_partition(cities_in_partition, coordinates)
+        distance_matrix, node_to_index = generate_distance_matrix_for_partition(cities_in_partition, coordinates, metric)
 
         start_node = cities_in_partition[0]
-        tour = [start_node]
-        unvisited = set(cities_in_partition)
-        unvisited.remove(start_node)
-
-        while unvisited:
-            current_node = tour[-1]
-            idx_current_node = node_to_index[current_node]
-            nearest_neighbor = min(
-                unvisited,
-                key=lambda node_id: distance_matrix[idx_current_node][node_to_index[node_id]],
-            )
-            tour.append(nearest_neighbor)
-            unvisited.remove(nearest_neighbor)
-            total_cost += distance_matrix[idx_current_node][node_to_index[nearest_neighbor]]
+        if full_tour:
+            # Koszt przejścia z poprzedniej partycji
+            total_cost += distance(coordinates[full_tour[-1]], coordinates[start_node])
+        order = kernels.nearest_neighbor_order(distance_matrix, node_to_index[start_node])
+        total_cost += distance_matrix[order[:-1], order[1:]].sum()
+        tour = [cities_in_partition[idx] for idx in order.tolist()]
 
         full_tour.extend(tour)
 
     if full_tour:
-        total_cost += chebyshev_distance(coordinates[full_tour[-1]], coordinates[full_tour[0]])
+        total_cost += distance(coordinates[full_tour[-1]], coordinates[full_tour[0]])
         full_tour.append(full_tour[0])
 
     end_time = time.time()
@@ -150,5 +138,5 @@ if __name__ == "__main__":
         print(f"Tour cost: {tour_cost}")
         print(f"Difference from optimal: {diff_result}")
         print(f"Execution time: {execution_time} seconds")
-        print(f"Tour sequence: {full_tour}")
+        save_result("show_fast", tsp_name, full_tour, tour_cost, execution_time)
     print(f"Total Execution Time: {total_execution_time} seconds")
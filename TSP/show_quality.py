@@ -1,8 +1,11 @@
 import time
-import math
 import numpy as np
 import os
 
+import kernels
+import metrics
+from tour_output import save_result
+
 def read_tsp_file(file_path):
     coordinates = {}
     tsp_name = ""
@@ -27,9 +30,6 @@ def read_tsp_file(file_path):
 
     return tsp_name, coordinates
 
-def euclidean_distance(coord1, coord2):
-    return math.sqrt((coord1[0] - coord2[0]) ** 2 + (coord1[1] - coord2[1]) ** 2)
-
 def calculate_tour_cost(tour, distance_matrix):
     total_cost = 0
     num_nodes = len(tour)
@@ -38,53 +38,45 @@ def calculate_tour_cost(tour, distance_matrix):
     total_cost += distance_matrix[tour[-1]][tour[0]]
     return total_cost
 
-def two_opt(tour, distance_matrix, max_time=50):
+def two_opt(tour, distance_matrix, max_time=50, lower_bound=None, target_gap=None):
     best = tour
     improved = True
     start_time = time.time()
+    # Opcjonalnie kończymy wcześniej, gdy trasa jest w granicy target_gap % od ograniczenia dolnego
+    target_cost = lower_bound * (1 + target_gap / 100) if lower_bound is not None and target_gap is not None else None
     while improved and time.time() - start_time < max_time:
+        if target_cost is not None and calculate_tour_cost(best, distance_matrix) <= target_cost:
+            break
         improved = False
-        for i in range(1, len(tour) - 2):
-            for j in range(i + 1, len(tour)):
-                if j - i == 1:
-                    continue
-                new_tour = tour[:i] + tour[i:j][::-1] + tour[j:]
-                if calculate_tour_cost(new_tour, distance_matrix) < calculate_tour_cost(best, distance_matrix):
-                    best = new_tour
-                    improved = True
+        # Najlepsze odwrócenie tour[i:j] w jednym przejściu (jądro z kernels.py)
+        delta, i, j = kernels.best_two_opt_move(tour, distance_matrix)
+        if delta < 0:
+            best = tour[:i] + tour[i:j][::-1] + tour[j:]
+            improved = True
         tour = best
     return best
 
-def nearest_neighbor_tsp(coordinates):
+def nearest_neighbor_tsp(coordinates, metric="EUC_2D", workers=None):
     start_time = time.time()
 
-    num_nodes = len(coordinates)
     node_to_index = {node_id: idx for idx, node_id in enumerate(coordinates.keys())}
     index_to_node = {idx: node_id for node_id, idx in node_to_index.items()}
-    distance_matrix = np.zeros((num_nodes, num_nodes))
-    for node_id1, coord1 in coordinates.items():
-        for node_id2, coord2 in coordinates.items():
-            idx1 = node_to_index[node_id1]
-            idx2 = node_to_index[node_id2]
-            distance_matrix[idx1][idx2] = euclidean_distance(coord1, coord2)
+    distance_matrix = kernels.distance_matrix(np.array(list(coordinates.values())), metric)
 
     start_node = min(coordinates.keys())
-    tour = [node_to_index[start_node]]
-    unvisited = set(node_to_index.values())
-    unvisited.remove(tour[0])
-
-    while unvisited:
-        current_node = tour[-1]
-        nearest_neighbor = min(
-            unvisited, key=lambda idx: distance_matrix[current_node][idx],
-        )
-        tour.append(nearest_neighbor)
-        unvisited.remove(nearest_neighbor)
-
+    tour = kernels.nearest_neighbor_order(distance_matrix, node_to_index[start_node]).tolist()
     tour.append(tour[0])
 
     # Apply 2-opt optimization with limited time
-    tour = two_opt(tour, distance_matrix)
+    if workers:
+        # 2-opt/Or-opt na fragmentach trasy w workers procesach; import lokalny, bo
+        # parallel_local_search sam importuje ten moduł
+        from parallel_local_search import parallel_two_opt
+        points = np.array(list(coordinates.values()))
+        tour = parallel_two_opt(points, tour[:-1], metric=metric, workers=workers)
+        tour.append(tour[0])
+    else:
+        tour = two_opt(tour, distance_matrix)
     total_cost = calculate_tour_cost(tour, distance_matrix)
 
     tour = [index_to_node[idx] for idx in tour]
@@ -110,9 +102,9 @@ def get_diff_result(problem, total_distance):
     else:
         return "Unknown problem"
 
-def process_tsp_file(file_path):
-    tsp_name, coordinates = read_tsp_file(file_path)
-    tour, tour_cost, execution_time = nearest_neighbor_tsp(coordinates)
+def process_tsp_file(file_path, workers=None):
+    tsp_name, coordinates, metric = metrics.read_tsp_instance(file_path)
+    tour, tour_cost, execution_time = nearest_neighbor_tsp(coordinates, metric, workers=workers)
     return tsp_name, tour, tour_cost, execution_time
 
 if __name__ == "__main__":
@@ -129,8 +121,8 @@ if __name__ == "__main__":
         total_execution_time += execution_time
         diff_result = get_diff_result(os.path.basename(file_path), tour_cost)
         print(f"TSP Name: {tsp_name}")
-        print(f"Tour: {tour}")
         print(f"Tour cost: {tour_cost}")
         print(f"Difference from optimal: {diff_result}")
         print(f"Execution time: {execution_time} seconds")
+        save_result("show_quality", tsp_name, tour, tour_cost, execution_time)
     print(f"Total Execution Time: {total_execution_time} seconds")
@@ -2,6 +2,13 @@ import time
 import numpy as np
 import os
 
+import border_refinement
+import kernels
+import metrics
+
+from cell_index import CellIndex
+from clustering import cluster_partitions
+
 def read_tsp_file(file_path):
     coordinates = {}
     tsp_name = ""
@@ -26,20 +33,11 @@ def read_tsp_file(file_path):
 
     return tsp_name, coordinates
 
-def chebyshev_distance(coord1, coord2):
-    return max(abs(coord1[0] - coord2[0]), abs(coord1[1] - coord2[1]))
-
-def generate_distance_matrix_for_partition(partition_nodes, coordinates):
-    num_nodes = len(partition_nodes)
-    distance_matrix = np.zeros((num_nodes, num_nodes))
+def generate_distance_matrix_for_partition(partition_nodes, coordinates, metric="EUC_2D"):
     node_to_index = {node_id: idx for idx, node_id in enumerate(partition_nodes)}
-
-    for i, node_id1 in enumerate(partition_nodes):
-        for j, node_id2 in enumerate(partition_nodes):
-            if i != j:
-                distance_matrix[i][j] = chebyshev_distance(coordinates[node_id1], coordinates[node_id2])
-            else:
-                distance_matrix[i][j] = float('inf')
+    points = np.array([coordinates[node_id] for node_id in partition_nodes])
+    distance_matrix = kernels.distance_matrix(points, metric)
+    np.fill_diagonal(distance_matrix, float('inf'))
 
     return distance_matrix, node_to_index
 
@@ -63,51 +61,53 @@ def partition_space(coordinates):
 
     return partitions
 
-def nearest_neighbor_partitioned_tsp(file_path):
+def partition_cities(coordinates, partitions):
+    # Każde miasto w dokładnie jednej partycji (indeks CSR, jeden przebieg po współrzędnych)
+    node_ids = np.array(list(coordinates.keys()))
+    points = np.array(list(coordinates.values()), dtype=float)
+    index = CellIndex.from_partitions(points, partitions)
+    return [node_ids[cell].tolist() for cell in index]
+
+def nearest_neighbor_partitioned_tsp(file_path, clustered=False, max_cluster_size=None, refine_borders=True):
     start_time = time.time()
 
-    tsp_name, coordinates = read_tsp_file(file_path)
-    partitions = partition_space(coordinates)
+    # Metryka z EDGE_WEIGHT_TYPE w nagłówku pliku
+    tsp_name, coordinates, metric = metrics.read_tsp_instance(file_path)
+    distance = metrics.scalar_distance(metric)
+    if clustered:
+        # Klastry k-means zamiast siatki 4x4 - podążają za gęstością miast
+        city_groups = cluster_partitions(coordinates, num_clusters=16, max_size=max_cluster_size)
+    else:
+        partitions = partition_space(coordinates)
+        city_groups = partition_cities(coordinates, partitions)
 
     full_tour = []
     total_cost = 0
     global_node_to_index = {node_id: idx for idx, node_id in enumerate(coordinates.keys())}
 
-    for part in partitions:
-        min_x, max_x, min_y, max_y = part
-
-        cities_in_partition = [
-            node_id
-            for node_id, coord in coordinates.items()
-            if min_x <= coord[0] <= max_x and min_y <= coord[1] <= max_y
-        ]
-
+    for cities_in_partition in city_groups:
         if not cities_in_partition:
             continue
 
-        distance_matrix, node_to_index = generate_distance_matrix_for_partition(cities_in_partition, coordinates)
+        distance_matrix, node_to_index = generate_distance_matrix_for_partition(cities_in_partition, coordinates, metric)
 
         start_node = cities_in_partition[0]
-        tour = [start_node]
-        unvisited = set(cities_in_partition)
-        unvisited.remove(start_node)
-
-        while unvisited:
-            current_node = tour[-1]
-            idx_current_node = node_to_index[current_node]
-            nearest_neighbor = min(
-                unvisited,
-                key=lambda node_id: distance_matrix[idx_current_node][node_to_index[node_id]],
-            )
-            tour.append(nearest_neighbor)
-            unvisited.remove(nearest_neighbor)
-            total_cost += distance_matrix[idx_current_node][node_to_index[nearest_neighbor]]
+        if full_tour:
+            # Koszt przejścia z poprzedniej partycji
+            total_cost += distance(coordinates[full_tour[-1]], coordinates[start_node])
+        order = kernels.nearest_neighbor_order(distance_matrix, node_to_index[start_node])
+        total_cost += distance_matrix[order[:-1], order[1:]].sum()
+        tour = [cities_in_partition[idx] for idx in order.tolist()]
 
         full_tour.extend(tour)
 
     if full_tour:
-        total_cost += chebyshev_distance(coordinates[full_tour[-1]], coordinates[full_tour[0]])
+        total_cost += distance(coordinates[full_tour[-1]], coordinates[full_tour[0]])
         full_tour.append(full_tour[0])
+        if refine_borders and not clustered:
+            # 2-opt/Or-opt tylko w pasie wokół granic komórek, gdzie zszycie psuje trasę
+            full_tour, _, change = border_refinement.refine_partition_borders(coordinates, full_tour, partitions, distance=distance)
+            total_cost += change
 
     end_time = time.time()
     execution_time = end_time - start_time
@@ -150,4 +150,9 @@ if __name__ == "__main__":
         print(f"Difference from optimal: {diff_result}")
         print(f"Execution time: {execution_time} seconds")
 
+        _, _, clustered_cost, clustered_time = nearest_neighbor_partitioned_tsp(file_path, clustered=True)
+        print(f"Clustered tour cost: {clustered_cost}")
+        print(f"Clustered difference from optimal: {get_diff_result(os.path.basename(file_path), clustered_cost)}")
+        print(f"Clustered execution time: {clustered_time} seconds")
+
     print(f"Total Execution Time: {total_execution_time} seconds")
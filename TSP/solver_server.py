@@ -0,0 +1,256 @@
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from metrics import read_tsp_instance, tour_length
+from insertion import insertion_tour
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from two_level_list import two_opt_or_opt
+
+# Długo działający serwer solverów: żądania JSON (jedno na linię) przez gniazdo Unix
+# albo TCP, kolejka priorytetowa, stała pula procesów z zaimportowanymi modułami
+# i pamięcią podręczną LRU wczytanych instancji oraz list sąsiadów w każdym procesie.
+#
+# {"op": "solve", "id": 1, "file": "files/pr1002.tsp", "solver": "two_opt",
+#  "max_time": 5, "priority": 0, "return_tour": false}
+# {"op": "cancel", "id": 1}
+# solver: "insertion" (sama trasa z wstawiania) albo "two_opt" (wstawianie + 2-opt/Or-opt)
+SOCKET_PATH = "solver.sock"
+INSTANCE_CACHE_SIZE = 32
+SOLVERS = ("insertion", "two_opt")
+
+cancel_flags = None
+
+
+def init_worker(flags):
+    global cancel_flags
+    cancel_flags = flags
+
+
+def warm_up():
+    return os.getpid()
+
+
+@lru_cache(maxsize=INSTANCE_CACHE_SIZE)
+def cached_instance(file_path, mtime):
+    # mtime w kluczu: zmieniony plik nie trafi do starej pozycji w pamięci podręcznej
+    tsp_name, coordinates, metric = read_tsp_instance(file_path)
+    node_ids, points = coordinates_to_array(coordinates)
+    return tsp_name, node_ids, points, metric
+
+
+@lru_cache(maxsize=INSTANCE_CACHE_SIZE)
+def cached_neighbors(file_path, mtime, k):
+    return nearest_neighbor_lists(cached_instance(file_path, mtime)[2], k=k)
+
+
+def load_request_instance(request, k):
+    if "file" in request:
+        mtime = os.path.getmtime(request["file"])
+        tsp_name, node_ids, points, metric = cached_instance(request["file"], mtime)
+        return tsp_name, node_ids, points, metric, lambda: cached_neighbors(request["file"], mtime, k)
+    node_ids, points = coordinates_to_array(
+        {idx + 1: tuple(point) for idx, point in enumerate(request["coordinates"])}
+    )
+    metric = request.get("metric", "EUC_2D")
+    return request.get("name", ""), node_ids, points, metric, lambda: nearest_neighbor_lists(points, k=k)
+
+
+def run_job(slot, request):
+    # Wykonywane w procesie puli. Budowa trasy i 2-opt co chwilę sprawdzają flagę anulowania
+    # ustawianą przez serwer oraz budżet czasu; 2-opt działa na jednej TwoLevelList
+    # z jedną kolejką aktywnych miast przez cały budżet
+    start_time = time.time()
+    solver = request.get("solver", "two_opt")
+    if solver not in SOLVERS:
+        raise ValueError(f"unknown solver {solver}")
+    k = request.get("k", 8)
+    max_time = request.get("max_time", 10)
+    tsp_name, node_ids, points, metric, neighbors = load_request_instance(request, k)
+    load_time = time.time() - start_time
+
+    def should_stop():
+        return bool(cancel_flags[slot]) or time.time() - start_time >= max_time
+
+    tour = insertion_tour(points, method="farthest", should_stop=should_stop)
+    if solver == "two_opt" and len(tour) >= 5 and not should_stop():
+        remaining = max_time - (time.time() - start_time)
+        tour = two_opt_or_opt(points, tour, neighbors(), max_time=remaining, should_stop=should_stop).to_list()
+    cancelled = bool(cancel_flags[slot])
+
+    response = {
+        "name": tsp_name,
+        "cost": tour_length(points, tour, metric),
+        "load_time": load_time,
+        "solve_time": time.time() - start_time - load_time,
+        "cancelled": cancelled,
+    }
+    if request.get("return_tour"):
+        tour = [int(node_ids[idx]) for idx in tour]
+        response["tour"] = tour + tour[:1]
+    return response
+
+
+class SolverServer:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count()
+        self.cancel_flags = multiprocessing.Array("b", self.workers, lock=False)
+        self.pool = None
+        self.queue = None
+        self.jobs = {}
+        self.counter = itertools.count()
+        self.dispatchers = []
+        self.server = None
+
+    async def start(self, socket_path=None, host="127.0.0.1", port=None):
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=init_worker, initargs=(self.cancel_flags,)
+        )
+        # Rozgrzanie puli: wszystkie procesy startują i importują moduły przed pierwszym żądaniem
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.pool, warm_up) for _ in range(self.workers)])
+
+        self.queue = asyncio.PriorityQueue()
+        self.dispatchers = [asyncio.create_task(self.dispatch(slot)) for slot in range(self.workers)]
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host=host, port=port)
+        return self.server
+
+    async def close(self):
+        # Oczekujące zadania kończymy od razu jako anulowane, działającym ustawiamy flagi
+        # i czekamy na ich (szybki) koniec; zamknięcie puli nie blokuje pętli zdarzeń
+        self.server.close()
+        running = []
+        for job in self.jobs.values():
+            if job["future"].done():
+                continue
+            if job["slot"] is None:
+                job["future"].set_result({"cancelled": True, "queue_time": time.time() - job["submitted"]})
+            else:
+                self.cancel_flags[job["slot"]] = 1
+                running.append(job["future"])
+        await asyncio.gather(*running, return_exceptions=True)
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        await self.server.wait_closed()
+        await asyncio.get_running_loop().run_in_executor(None, self.pool.shutdown)
+
+    async def dispatch(self, slot):
+        # Każdy dyspozytor ma na wyłączność jeden slot flagi anulowania i jeden proces puli
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job_id = await self.queue.get()
+            job = self.jobs.get(job_id)
+            if job is None or job["future"].done():
+                continue
+            job["slot"] = slot
+            self.cancel_flags[slot] = 0
+            job["queue_time"] = time.time() - job["submitted"]
+            try:
+                result = await loop.run_in_executor(self.pool, run_job, slot, job["request"])
+            except Exception as error:
+                result = {"error": str(error)}
+            job["slot"] = None
+            if not job["future"].done():
+                result["queue_time"] = job["queue_time"]
+                job["future"].set_result(result)
+
+    def submit(self, request):
+        job_id = request.get("id", next(self.counter))
+        if job_id in self.jobs:
+            raise ValueError(f"duplicate job id {job_id}")
+        future = asyncio.get_running_loop().create_future()
+        self.jobs[job_id] = {"request": request, "future": future, "slot": None, "submitted": time.time()}
+        # Mniejszy priorytet = wcześniej; przy remisie decyduje kolejność zgłoszenia
+        self.queue.put_nowait((request.get("priority", 0), next(self.counter), job_id))
+        return job_id, future
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job["future"].done():
+            return False
+        if job["slot"] is None:
+            job["future"].set_result({"cancelled": True, "queue_time": time.time() - job["submitted"]})
+        else:
+            self.cancel_flags[job["slot"]] = 1
+        return True
+
+    async def handle(self, reader, writer):
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def respond(message):
+            async with lock:
+                writer.write((json.dumps(message) + "\n").encode())
+                await writer.drain()
+
+        async def finish(job_id, future):
+            result = await future
+            self.jobs.pop(job_id, None)
+            await respond(dict(result, id=job_id))
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+            except ValueError:
+                await respond({"error": "invalid JSON"})
+                continue
+            op = request.get("op", "solve")
+            if op == "solve" and request.get("solver", "two_opt") not in SOLVERS:
+                await respond({"id": request.get("id"), "error": f"unknown solver {request.get('solver')}"})
+            elif op == "solve" and request.get("id") in self.jobs:
+                await respond({"id": request.get("id"), "error": f"duplicate job id {request.get('id')}"})
+            elif op == "solve":
+                job_id, future = self.submit(request)
+                task = asyncio.create_task(finish(job_id, future))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            elif op == "cancel":
+                await respond({"id": request.get("id"), "cancel_requested": self.cancel(request.get("id"))})
+            elif op == "ping":
+                await respond({"pong": True, "queued": self.queue.qsize(), "jobs": len(self.jobs)})
+            else:
+                await respond({"id": request.get("id"), "error": f"unknown op {op}"})
+        await asyncio.gather(*pending, return_exceptions=True)
+        writer.close()
+
+
+async def request_jobs(requests, socket_path=SOCKET_PATH):
+    # Prosty klient: wysyła wszystkie żądania jednym połączeniem i zbiera odpowiedzi
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    writer.write("".join(json.dumps(request) + "\n" for request in requests).encode())
+    await writer.drain()
+    expected = sum(1 for request in requests if request.get("op", "solve") in ("solve", "cancel", "ping"))
+    responses = [json.loads(await reader.readline()) for _ in range(expected)]
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+async def serve(socket_path=SOCKET_PATH, workers=None):
+    server = SolverServer(workers=workers)
+    await server.start(socket_path=socket_path)
+    print(f"Solver server listening on {socket_path} with {server.workers} workers")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
@@ -0,0 +1,806 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import random
+import tempfile
+import time
+import tracemalloc
+import unittest
+
+import numpy as np
+
+import all_classic
+import kernels
+import show_quality
+import show_very_fast
+from annealing import annealing_tsp
+from ant_colony import ant_colony_tsp
+from anytime import anytime_tsp, tour_cost
+from auto_config import DEFAULT_MODEL, auto_tsp, plan_pipeline, predict, read_cost_log, recalibrate
+from border_refinement import refine_partition_borders
+from cell_index import CellIndex
+from dedup import collapse_duplicates, collapsed_tsp
+from dynamic import DynamicTour
+from generator import grid_instance, uniform_instance, write_tsp_file
+from genetic import adjacent, attach_instance, common_edges, eax_crossover, genetic_tsp, improve, perturbed_population
+from insertion import cheapest_insertion_tsp, farthest_insertion_tsp
+from live_view import stop_view
+from lower_bound import held_karp_bound
+from metrics import distance_matrix, read_tsp_instance, scalar_distance, tour_length
+from multilevel import coarsen, multilevel_tour
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from out_of_core import out_of_core_tsp
+from parallel_local_search import improve_path
+from scaling_benchmark import scaling_regressions
+from solver_server import SolverServer, request_jobs
+from tour_merging import merge_tours, multi_start_nearest_neighbor, partition_crossover
+from tour_output import append_summary, read_tsplib_tour, shortcut_tour, write_npy_tour, write_tsplib_tour
+from tour_store import TourStore, instance_hash, warm_start_tsp
+from two_level_list import nearest_neighbor_two_level_tsp, two_opt_or_opt
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INSTANCES = ["lin105", "tsp225", "pr1002"]
+OPTIMAL = {"lin105": 14379, "tsp225": 3919, "pr1002": 259045}
+euc_2d = scalar_distance("EUC_2D")
+
+# Wartości odniesienia dla testów wydajności; TSP_RECORD_BASELINES=1 nadpisuje plik
+BASELINES_PATH = os.path.join(BASE_DIR, "perf_baselines.json")
+TIME_TOLERANCE = 3.0
+MEMORY_TOLERANCE = 1.5
+
+
+def instance_path(name):
+    return os.path.join(BASE_DIR, "files", f"{name}.tsp")
+
+
+def load_instance(name):
+    return show_quality.read_tsp_file(instance_path(name))[1]
+
+
+def euclidean_tour_cost(coordinates, tour):
+    return sum(
+        all_classic.euclidean_distance(coordinates[tour[i]], coordinates[tour[i + 1]])
+        for i in range(len(tour) - 1)
+    )
+
+
+def tsplib_tour_cost(coordinates, tour):
+    # Koszt w metryce EUC_2D z TSPLIB (krawędzie zaokrąglane), w której podane są optima
+    return sum(euc_2d(coordinates[tour[i]], coordinates[tour[i + 1]]) for i in range(len(tour) - 1))
+
+
+def run_nearest_neighbor(name):
+    coordinates = load_instance(name)
+    G = all_classic.generate_complete_graph(coordinates)
+    tour, cost, _ = all_classic.nearest_neighbor_tsp(G, min(G.keys()))
+    return coordinates, tour, cost
+
+
+def show_very_fast_with_coordinates(name):
+    tsp_name, tour, cost, execution_time = show_very_fast.nearest_neighbor_partitioned_tsp(instance_path(name))
+    return tsp_name, load_instance(name), tour, cost, execution_time
+
+
+def run_partitioned(name):
+    _, coordinates, tour, cost, _ = show_very_fast_with_coordinates(name)
+    return coordinates, tour, cost
+
+
+def run_partitioned_kernel(name):
+    # Sama pętla najbliższego sąsiada po komórkach, bez poprawiania granic
+    _, tour, cost, _ = show_very_fast.nearest_neighbor_partitioned_tsp(instance_path(name), refine_borders=False)
+    return load_instance(name), tour, cost
+
+
+def run_farthest_insertion(name):
+    coordinates = load_instance(name)
+    tour, cost, _ = farthest_insertion_tsp(coordinates)
+    return coordinates, tour, cost
+
+
+def run_cheapest_insertion(name):
+    coordinates = load_instance(name)
+    tour, cost, _ = cheapest_insertion_tsp(coordinates)
+    return coordinates, tour, cost
+
+
+def run_two_level_two_opt(name):
+    coordinates = load_instance(name)
+    tour, cost, _ = nearest_neighbor_two_level_tsp(coordinates)
+    return coordinates, tour, cost
+
+
+EUCLIDEAN_SOLVERS = {
+    "nearest_neighbor": run_nearest_neighbor,
+}
+
+TSPLIB_SOLVERS = {
+    "farthest_insertion": run_farthest_insertion,
+    "cheapest_insertion": run_cheapest_insertion,
+    "two_level_two_opt": run_two_level_two_opt,
+}
+
+# Szybkie solvery mierzymy też na rl5934, żeby czasy były wyraźnie powyżej progu szumu 50 ms
+PERFORMANCE_SOLVERS = {
+    "nearest_neighbor": (run_nearest_neighbor, INSTANCES),
+    "partitioned": (run_partitioned, INSTANCES + ["rl5934"]),
+    "partitioned_kernel": (run_partitioned_kernel, INSTANCES + ["rl5934"]),
+    "farthest_insertion": (run_farthest_insertion, INSTANCES),
+    "two_level_two_opt": (run_two_level_two_opt, INSTANCES),
+}
+
+
+class TourCorrectnessTest(unittest.TestCase):
+    def assertValidTour(self, coordinates, tour):
+        self.assertEqual(tour[0], tour[-1])
+        self.assertEqual(len(tour), len(coordinates) + 1)
+        self.assertEqual(set(tour), set(coordinates))
+
+    def test_solvers_visit_every_city_once(self):
+        for solvers, expected_cost in ((EUCLIDEAN_SOLVERS, euclidean_tour_cost), (TSPLIB_SOLVERS, tsplib_tour_cost)):
+            for solver_name, solver in solvers.items():
+                for name in INSTANCES:
+                    with self.subTest(solver=solver_name, instance=name):
+                        coordinates, tour, cost = solver(name)
+                        self.assertValidTour(coordinates, tour)
+                        self.assertAlmostEqual(cost, expected_cost(coordinates, tour), delta=1e-6 * cost)
+                        self.assertGreaterEqual(cost, OPTIMAL[name] * 0.999)
+
+    def test_two_opt_keeps_permutation_and_does_not_worsen(self):
+        coordinates = load_instance("lin105")
+        node_ids = list(coordinates.keys())
+        distance_matrix = np.array(
+            [[all_classic.euclidean_distance(coordinates[a], coordinates[b]) for b in node_ids] for a in node_ids]
+        )
+        tour = list(range(len(node_ids))) + [0]
+        improved = show_quality.two_opt(tour, distance_matrix, max_time=1)
+        self.assertEqual(sorted(improved[:-1]), list(range(len(node_ids))))
+        self.assertLessEqual(
+            show_quality.calculate_tour_cost(improved, distance_matrix),
+            show_quality.calculate_tour_cost(tour, distance_matrix),
+        )
+
+    def test_parallel_two_opt_keeps_segment_endpoints(self):
+        _, points = coordinates_to_array(load_instance("tsp225"))
+        order = improve_path(points[::-1].copy(), max_time=1)
+        self.assertEqual(sorted(order), list(range(len(points))))
+        self.assertEqual((order[0], order[-1]), (0, len(points) - 1))
+
+        for workers in (1, 3):
+            with self.subTest(workers=workers):
+                tsp_name, tour, cost, _ = show_quality.process_tsp_file(instance_path("pr1002"), workers=workers)
+                self.assertValidTour(load_instance("pr1002"), tour)
+                self.assertLess(cost, 1.1 * OPTIMAL["pr1002"])
+
+    def test_partitioned_cost_matches_recomputed_cost(self):
+        for name in INSTANCES:
+            with self.subTest(instance=name):
+                _, coordinates, tour, cost, _ = show_very_fast_with_coordinates(name)
+                recomputed = sum(
+                    euc_2d(coordinates[tour[i]], coordinates[tour[i + 1]])
+                    for i in range(len(tour) - 1)
+                )
+                self.assertAlmostEqual(cost, recomputed, delta=1e-6 * cost)
+                self.assertValidTour(coordinates, tour)
+
+    def test_partitions_cover_every_city(self):
+        for name in INSTANCES:
+            with self.subTest(instance=name):
+                coordinates = load_instance(name)
+                city_groups = show_very_fast.partition_cities(
+                    coordinates, show_very_fast.partition_space(coordinates)
+                )
+                self.assertEqual(sorted(city for group in city_groups for city in group), sorted(coordinates))
+
+    def test_cities_on_cell_borders_belong_to_one_cell(self):
+        # Siatka 5x5 punktów całkowitych i komórki o boku 1 - każde miasto leży na granicy
+        coordinates = {idx + 1: (float(idx // 5), float(idx % 5)) for idx in range(25)}
+        partitions = show_very_fast.partition_space(coordinates)
+        city_groups = show_very_fast.partition_cities(coordinates, partitions)
+        self.assertEqual(sorted(city for group in city_groups for city in group), sorted(coordinates))
+        for group, (min_x, max_x, min_y, max_y) in zip(city_groups, partitions):
+            for city in group:
+                x, y = coordinates[city]
+                self.assertTrue(min_x <= x <= max_x and min_y <= y <= max_y)
+
+        index = CellIndex.from_partitions(np.array(list(coordinates.values())), partitions)
+        self.assertTrue(all(np.shares_memory(cell, index.order) for cell in index if len(cell)))
+
+    def test_border_refinement_removes_duplicates_and_does_not_worsen(self):
+        for name in INSTANCES:
+            with self.subTest(instance=name):
+                tsp_name, tour, cost, _ = show_very_fast.nearest_neighbor_partitioned_tsp(
+                    instance_path(name), refine_borders=False
+                )
+                coordinates = load_instance(name)
+                partitions = show_very_fast.partition_space(coordinates)
+                # Trasa z powtórzeniami miast, jak zszyte trasy partycji w all16
+                refined, halo_size, change = refine_partition_borders(
+                    coordinates, tour[:5] + tour, partitions, distance=euc_2d
+                )
+                self.assertValidTour(coordinates, refined)
+                refined_cost = sum(
+                    euc_2d(coordinates[refined[i]], coordinates[refined[i + 1]])
+                    for i in range(len(refined) - 1)
+                )
+                self.assertLessEqual(change, 0)
+                self.assertAlmostEqual(refined_cost, cost + change, delta=1e-6 * cost)
+
+    def test_border_halo_grows_with_border_length(self):
+        # Czterokrotnie więcej miast to dwa razy dłuższe granice w liczbie miast
+        halo_sizes = []
+        for num_nodes in (10000, 40000):
+            points = uniform_instance(num_nodes)
+            coordinates = {idx + 1: tuple(point) for idx, point in enumerate(points.tolist())}
+            partitions = show_very_fast.partition_space(coordinates)
+            # Trasa przechodząca kolejno przez komórki, jak po zszyciu
+            order = (CellIndex.from_partitions(points, partitions).order + 1).tolist()
+            _, halo_size, _ = refine_partition_borders(coordinates, order + order[:1], partitions, max_time=0.1)
+            halo_sizes.append(halo_size)
+        self.assertLess(halo_sizes[0], 0.5 * 10000)
+        self.assertLess(halo_sizes[1], 2.6 * halo_sizes[0])
+
+    def test_coarsening_pairs_cities_on_a_lattice(self):
+        # Na siatce wszyscy sąsiedzi są w tej samej odległości - pary muszą powstać mimo remisów
+        points = grid_instance(4900)
+        coarse_points, weights, parent = coarsen(points, np.ones(len(points)))
+        self.assertLessEqual(len(coarse_points), 0.6 * len(points))
+        self.assertEqual(weights.sum(), len(points))
+        tour = multilevel_tour(points, coarse_size=100, max_time=1)
+        self.assertEqual(sorted(tour), list(range(len(points))))
+
+    def test_out_of_core_tour_visits_every_city_once(self):
+        coordinates = load_instance("pr1002")
+        with tempfile.TemporaryDirectory() as work_dir:
+            _, tour_path, cost, _ = out_of_core_tsp(instance_path("pr1002"), work_dir, tile_budget=200, time_per_tile=1)
+            tour = np.load(tour_path).tolist()
+        self.assertValidTour(coordinates, tour + tour[:1])
+        recomputed = sum(
+            euc_2d(coordinates[tour[i - 1]], coordinates[tour[i]]) for i in range(len(tour))
+        )
+        self.assertEqual(cost, recomputed)
+
+    def test_anytime_returns_valid_tour(self):
+        coordinates = load_instance("tsp225")
+        tour, cost, _ = anytime_tsp(coordinates, max_time=1, seed=0)
+        self.assertValidTour(coordinates, tour)
+        self.assertEqual(cost, tsplib_tour_cost(coordinates, tour))
+
+    def test_anytime_progress_is_throttled(self):
+        coordinates = load_instance("tsp225")
+        progress = queue.Queue()
+        tour, cost, _ = anytime_tsp(coordinates, max_time=1, seed=0, progress=progress, progress_interval=0.25)
+        snapshots = [progress.get() for _ in range(progress.qsize())]
+        self.assertLessEqual(len(snapshots), 1 / 0.25 + 2)
+        self.assertEqual(snapshots[-1][1], cost)
+        self.assertValidTour(coordinates, snapshots[-1][0])
+
+    def test_anytime_resumes_only_its_own_checkpoint(self):
+        coordinates = load_instance("tsp225")
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            checkpoint_path = os.path.join(checkpoint_dir, "tsp225.ckpt")
+            _, first_cost, _ = anytime_tsp(coordinates, max_time=0.5, seed=0, checkpoint_path=checkpoint_path)
+            tour, cost, _ = anytime_tsp(coordinates, max_time=0.5, checkpoint_path=checkpoint_path, resume=True)
+            self.assertValidTour(coordinates, tour)
+            self.assertLessEqual(cost, first_cost + 1e-6)
+            # Ta sama liczba miast, ale inne współrzędne
+            moved = dict(coordinates)
+            first = next(iter(moved))
+            moved[first] = (moved[first][0] + 1.0, moved[first][1])
+            with self.assertRaises(ValueError):
+                anytime_tsp(moved, max_time=0.5, checkpoint_path=checkpoint_path, resume=True)
+
+    def test_stop_view_returns_when_viewer_is_gone_or_stuck(self):
+        # Nikt nie czyta z pełnej kolejki: podgląd, który padł od razu, i taki, który utknął
+        for target, args in ((time.sleep, (0,)), (time.sleep, (60,))):
+            with self.subTest(seconds=args[0]):
+                snapshots = multiprocessing.Queue(maxsize=1)
+                snapshots.put((np.arange(10, dtype=np.int32), 0.0, 0.0))
+                viewer = multiprocessing.Process(target=target, args=args, daemon=True)
+                viewer.start()
+                start_time = time.time()
+                stop_view(snapshots, viewer, timeout=0.5)
+                self.assertLess(time.time() - start_time, 3)
+                self.assertFalse(viewer.is_alive())
+
+    def test_eax_crossover_keeps_common_edges(self):
+        _, points = coordinates_to_array(load_instance("tsp225"))
+        attach_instance(points, nearest_neighbor_lists(points, k=8))
+        rng = random.Random(0)
+        (first, second), (first_cost, _) = perturbed_population(*improve(list(range(len(points)))), 2, rng)
+        child, cost, _ = eax_crossover(first, first_cost, second, rng)
+        self.assertEqual(sorted(child), list(range(len(points))))
+        self.assertAlmostEqual(cost, tour_cost(points, child), delta=1e-6 * cost)
+        common = common_edges(first, second)
+        succ, pred = adjacent(np.array(child, dtype=np.int32))
+        following = np.roll(first, -1)[common]
+        self.assertTrue(((succ[first[common]] == following) | (pred[first[common]] == following)).all())
+
+    def test_genetic_returns_valid_tour(self):
+        coordinates = load_instance("tsp225")
+        tour, cost, _ = genetic_tsp(coordinates, workers=2, population_size=6, max_time=4, epoch_time=1, seed=0)
+        self.assertValidTour(coordinates, tour)
+        self.assertEqual(cost, tsplib_tour_cost(coordinates, tour))
+
+    def test_genetic_population_setup_respects_budget(self):
+        # Sama budowa populacji 30 tras dla 5000 miast trwa dłużej niż cały budżet
+        coordinates = {idx + 1: tuple(point) for idx, point in enumerate(uniform_instance(5000).tolist())}
+        start_time = time.time()
+        tour, _, _ = genetic_tsp(coordinates, workers=1, max_time=3, seed=0)
+        self.assertLess(time.time() - start_time, 4.5)
+        self.assertValidTour(coordinates, tour)
+
+    def test_partition_crossover_keeps_better_paths(self):
+        # Dwie kopie tej samej trasy z zamienionymi sąsiednimi miastami w różnych miejscach:
+        # każda zamiana to osobna składowa, więc potomek wraca do trasy bazowej
+        _, points = coordinates_to_array(load_instance("pr1002"))
+        base = np.array(two_opt_or_opt(points, list(range(len(points))), nearest_neighbor_lists(points)).to_list())
+        first, second = base.copy(), base.copy()
+        first[[10, 11]] = first[[11, 10]]
+        second[[500, 501]] = second[[501, 500]]
+        child, cost, count, feasible = partition_crossover(first, second, points)
+        self.assertEqual((count, feasible), (2, 2))
+        self.assertEqual(cost, tour_length(points, base))
+        self.assertLess(cost, min(tour_length(points, first), tour_length(points, second)))
+
+    def test_merged_tour_is_not_worse_than_inputs(self):
+        coordinates = load_instance("pr1002")
+        tours = multi_start_nearest_neighbor(coordinates, runs=5, seed=0)
+        tour, cost, _ = merge_tours(coordinates, tours)
+        self.assertValidTour(coordinates, tour)
+        self.assertEqual(cost, tsplib_tour_cost(coordinates, tour))
+        self.assertLessEqual(cost, min(tsplib_tour_cost(coordinates, other) for other in tours))
+
+    def test_annealing_improves_insertion_tour(self):
+        coordinates = load_instance("tsp225")
+        _, start_cost, _ = farthest_insertion_tsp(coordinates)
+        for cooling in ("geometric", "linear"):
+            with self.subTest(cooling=cooling):
+                tour, cost, _ = annealing_tsp(coordinates, max_time=1, seed=0, cooling=cooling)
+                self.assertValidTour(coordinates, tour)
+                self.assertEqual(cost, tsplib_tour_cost(coordinates, tour))
+                self.assertLess(cost, start_cost)
+
+    def test_ant_colony_returns_valid_tour(self):
+        coordinates = load_instance("lin105")
+        _, start_cost, _ = farthest_insertion_tsp(coordinates)
+        for local_search in (False, True):
+            with self.subTest(local_search=local_search):
+                tour, cost, _ = ant_colony_tsp(coordinates, ants=6, local_search=local_search, workers=2,
+                                               max_time=1, seed=0)
+                self.assertValidTour(coordinates, tour)
+                self.assertEqual(cost, tsplib_tour_cost(coordinates, tour))
+                if local_search:
+                    self.assertLess(cost, start_cost)
+
+    def test_ant_colony_local_search_respects_budget(self):
+        # Jedna iteracja 20 mrówek z 2-opt/Or-opt na 5000 miastach trwa dłużej niż budżet
+        coordinates = {idx + 1: tuple(point) for idx, point in enumerate(uniform_instance(5000).tolist())}
+        start_time = time.time()
+        tour, _, _ = ant_colony_tsp(coordinates, workers=1, max_time=2, seed=0)
+        self.assertLess(time.time() - start_time, 3.5)
+        self.assertValidTour(coordinates, tour)
+
+    def test_warm_start_reuses_stored_tour(self):
+        coordinates = load_instance("tsp225")
+        with tempfile.TemporaryDirectory() as store_dir:
+            store = TourStore(store_dir)
+            _, first_cost, _ = warm_start_tsp(coordinates, "tsp225", store=store, max_time=0.5, seed=0)
+            tour, second_cost, _ = warm_start_tsp(coordinates, "tsp225", store=store, max_time=0.5, seed=1)
+            key = instance_hash(*coordinates_to_array(coordinates))
+            history = store.history(key)
+            best_cost = store.best(key)[1]
+            configs = [json.loads(config) for config, in
+                       store.connection.execute("SELECT config FROM runs WHERE hash = ? ORDER BY id", (key,))]
+            store.close()
+        self.assertValidTour(coordinates, tour)
+        self.assertLessEqual(second_cost, first_cost)
+        self.assertEqual([run[2] for run in history], [0, 1])
+        self.assertEqual([config["constructor"] for config in configs], ["farthest_insertion", "stored"])
+        self.assertEqual(best_cost, second_cost)
+
+    def test_dynamic_tour_stays_valid_after_edits(self):
+        coordinates = load_instance("pr1002")
+        dynamic = DynamicTour(coordinates, max_time=1)
+        rng = np.random.default_rng(0)
+        node_ids = list(coordinates)
+        removed = rng.choice(node_ids, size=30, replace=False).tolist()
+        dynamic.update(removed=removed[:20])
+        for node_id in removed[20:]:
+            dynamic.remove(node_id)
+        for node_id in removed[:10]:
+            del coordinates[node_id]
+        for node_id in removed[10:]:
+            dynamic.add(node_id, coordinates[node_id])
+        moved = {node_ids[i]: (float(x), float(y)) for i, (x, y) in zip(range(500, 510), rng.uniform(0, 3000, size=(10, 2)))}
+        dynamic.update(moved=moved, added={100000: (1500.0, 1500.0)})
+        coordinates.update(moved)
+        coordinates[100000] = (1500.0, 1500.0)
+
+        tour = dynamic.tour()
+        self.assertValidTour(coordinates, tour)
+        self.assertEqual(dynamic.cost, tsplib_tour_cost(coordinates, tour))
+
+    def test_dynamic_tour_adds_far_away_cities(self):
+        # Miasta daleko poza zajętymi komórkami nie mogą wydłużać szukania sąsiadów
+        coordinates = load_instance("pr1002")
+        dynamic = DynamicTour(coordinates, max_time=1)
+        far = {100000: (5e4, 5e4), 100001: (2e5, 2e5), 100002: (1e6, 1e6), 100003: (-1e7, 3e5)}
+        start_time = time.time()
+        for node_id, position in far.items():
+            dynamic.add(node_id, position)
+        dynamic.move(100000, (-2e6, -2e6))
+        self.assertLess(time.time() - start_time, 1.0)
+        coordinates.update(far)
+        coordinates[100000] = (-2e6, -2e6)
+
+        tour = dynamic.tour()
+        self.assertValidTour(coordinates, tour)
+        self.assertEqual(dynamic.cost, tsplib_tour_cost(coordinates, tour))
+        with self.assertRaises(ValueError):
+            DynamicTour({})
+
+    def test_collapsed_duplicates_are_expanded_at_zero_cost(self):
+        coordinates = load_instance("pr1002")
+        rng = np.random.default_rng(0)
+        originals = rng.choice(list(coordinates), size=300).tolist()
+        for offset, node_id in enumerate(originals):
+            x, y = coordinates[node_id]
+            coordinates[2000 + offset] = (x + 0.1 * (offset % 2), y)
+        _, points = coordinates_to_array(coordinates)
+        self.assertEqual(len(collapse_duplicates(points)[0]), 1002 + len(set(originals[1::2])))
+        self.assertEqual(len(collapse_duplicates(points, epsilon=0.25)[0]), 1002)
+
+        for epsilon in (0.0, 0.25):
+            with self.subTest(epsilon=epsilon):
+                tour, cost, _ = collapsed_tsp(coordinates, epsilon=epsilon)
+                self.assertValidTour(coordinates, tour)
+                self.assertAlmostEqual(cost, sum(
+                    euc_2d(coordinates[tour[i]], coordinates[tour[i + 1]]) for i in range(len(tour) - 1)
+                ))
+
+    def test_collapse_merges_close_cities_across_cell_borders(self):
+        # 0.49 i 0.51 leżą w różnych komórkach siatki, a (0.2, 0.3) jest od nich dalej niż
+        # epsilon / 2, więc dołączenie go rozciągnęłoby grupę
+        points = np.array([[0.49, 0.0], [0.51, 0.0], [3.0, 3.0], [0.2, 0.3], [5.0, 5.0], [5.15, 5.15]])
+        representatives, parent = collapse_duplicates(points, epsilon=0.5)
+        self.assertEqual(representatives.tolist(), [0, 2, 3, 4])
+        self.assertEqual(parent.tolist(), [0, 0, 1, 2, 3, 3])
+
+    def test_collapse_keeps_group_diameter_within_epsilon(self):
+        # Siatka o boku 1: łańcuch par odległych o epsilon nie może zlać się w jedną grupę
+        points = np.column_stack(np.divmod(np.arange(900), 30)).astype(float)
+        self.assertEqual(len(collapse_duplicates(points, epsilon=1.0)[0]), 900)
+        coordinates = {idx + 1: tuple(point) for idx, point in enumerate(points.tolist())}
+        _, cost, _ = collapsed_tsp(coordinates, epsilon=1.0)
+        self.assertLess(cost, 1000)
+        # Wiele identycznych miast przy epsilon > 0: bez budowania par wewnątrz komórki
+        coincident = np.vstack([np.zeros((20000, 2)), [[0.3, 0.0], [5.0, 5.0]]])
+        representatives, parent = collapse_duplicates(coincident, epsilon=1.0)
+        self.assertEqual(representatives.tolist(), [0, 20001])
+        self.assertEqual(parent.max(), 1)
+
+    def test_held_karp_bound_is_below_optimum(self):
+        for name in INSTANCES:
+            with self.subTest(instance=name):
+                _, points = coordinates_to_array(load_instance(name))
+                bound = held_karp_bound(points, max_iterations=50)
+                self.assertLessEqual(bound, OPTIMAL[name])
+                self.assertGreater(bound, 0.9 * OPTIMAL[name])
+
+
+def read_opt_tour(name):
+    return read_tsplib_tour(os.path.join(BASE_DIR, "tour", f"{name}.opt.tour"))
+
+
+class MetricTest(unittest.TestCase):
+    def test_euc_2d_matches_known_optimum(self):
+        for name in INSTANCES:
+            with self.subTest(instance=name):
+                _, coordinates, metric = read_tsp_instance(instance_path(name))
+                self.assertEqual(metric, "EUC_2D")
+                node_ids, points = coordinates_to_array(coordinates)
+                node_to_index = {node_id: idx for idx, node_id in enumerate(node_ids)}
+                tour = [node_to_index[node_id] for node_id in read_opt_tour(name)]
+                # Plik tsp225.opt.tour ma długość 3916, a nie podane w TSPLIB 3919
+                self.assertAlmostEqual(tour_length(points, tour, metric), OPTIMAL[name], delta=0.001 * OPTIMAL[name])
+
+    def test_geo_matches_burma14_optimum(self):
+        points = np.array([
+            [16.47, 96.10], [16.47, 94.44], [20.09, 92.54], [22.39, 93.37], [25.23, 97.24],
+            [22.00, 96.05], [20.47, 97.02], [17.20, 96.29], [16.30, 97.38], [14.05, 98.12],
+            [16.53, 97.38], [21.52, 95.59], [19.41, 97.13], [20.09, 94.55],
+        ])
+        tour = [0, 1, 13, 2, 3, 4, 5, 11, 6, 12, 7, 10, 8, 9]
+        self.assertEqual(tour_length(points, tour, "GEO"), 3323)
+
+    def test_solvers_report_geo_cost(self):
+        # Solvery szukają na rzutowanych współrzędnych, ale koszt podają w metryce GEO
+        points = np.array([
+            [16.47, 96.10], [16.47, 94.44], [20.09, 92.54], [22.39, 93.37], [25.23, 97.24],
+            [22.00, 96.05], [20.47, 97.02], [17.20, 96.29], [16.30, 97.38], [14.05, 98.12],
+            [16.53, 97.38], [21.52, 95.59], [19.41, 97.13], [20.09, 94.55],
+        ])
+        coordinates = {idx + 1: tuple(point) for idx, point in enumerate(points.tolist())}
+        solvers = {
+            "farthest_insertion": lambda: farthest_insertion_tsp(coordinates, metric="GEO"),
+            "two_level_two_opt": lambda: nearest_neighbor_two_level_tsp(coordinates, metric="GEO"),
+            "anytime": lambda: anytime_tsp(coordinates, max_time=0.5, seed=0, metric="GEO"),
+            "dynamic": lambda: (lambda dynamic: (dynamic.tour(), dynamic.cost, 0))(
+                DynamicTour(coordinates, max_time=0.5, metric="GEO")),
+        }
+        for solver_name, solver in solvers.items():
+            with self.subTest(solver=solver_name):
+                tour, cost, _ = solver()
+                self.assertEqual(sorted(tour[:-1]), sorted(coordinates))
+                self.assertEqual(cost, tour_length(points, [node_id - 1 for node_id in tour[:-1]], "GEO"))
+                self.assertGreaterEqual(cost, 3323)
+
+    def test_matrix_and_scalar_kernels_agree(self):
+        points = np.random.default_rng(0).uniform(0, 1000, size=(50, 2))
+        for metric in ("EUC_2D", "CEIL_2D", "ATT", "GEO", "MAN_2D", "MAX_2D"):
+            with self.subTest(metric=metric):
+                matrix = distance_matrix(points, metric)
+                distance = scalar_distance(metric)
+                for i, j in [(0, 1), (3, 7), (10, 49), (20, 21)]:
+                    self.assertEqual(matrix[i, j], distance(points[i], points[j]))
+                self.assertTrue(np.allclose(matrix, matrix.T))
+
+
+class AutoConfigTest(unittest.TestCase):
+    def test_plan_fits_budget(self):
+        small = plan_pipeline(1000, 1.0, time_budget=10, memory_budget=1024, model=DEFAULT_MODEL)
+        self.assertEqual(small["constructor"], "farthest_insertion")
+        large = plan_pipeline(200000, 1.0, time_budget=10, memory_budget=256, model=DEFAULT_MODEL)
+        self.assertEqual(large["constructor"], "nearest_neighbor_matrix")
+        self.assertGreater(large["partitions"], 1)
+        self.assertEqual(large["improvement"], "or_opt")
+        self.assertLessEqual(sum(large["predicted"].values()), 10)
+        # Budowa list sąsiadów dla 200 tys. miast nie mieści się w 2 s obok konstrukcji
+        tight = plan_pipeline(200000, 1.0, time_budget=2, memory_budget=256, model=DEFAULT_MODEL)
+        self.assertEqual(tight["improvement"], "none")
+        self.assertNotIn("neighbor_lists", tight["predicted"])
+
+    def test_auto_tsp_logs_and_recalibrates(self):
+        coordinates = load_instance("tsp225")
+        with tempfile.TemporaryDirectory() as log_dir:
+            log_path = os.path.join(log_dir, "cost_log.jsonl")
+            tour, cost, execution_time, _ = auto_tsp(coordinates, time_budget=0.5, log_path=log_path, seed=0)
+            records = read_cost_log(log_path)
+        self.assertValidTour(coordinates, tour)
+        self.assertLess(execution_time, 0.5)
+        self.assertEqual(len(records), 1)
+
+        # Etap dwa razy wolniejszy niż przewidywany przesuwa model w stronę pomiaru
+        model = json.loads(json.dumps(DEFAULT_MODEL))
+        predicted = predict(model, "farthest_insertion", 5000)[0]
+        record = {
+            "clustering": 1.0, "actual": {"farthest_insertion": 2 * predicted},
+            "predicted": {"farthest_insertion": predicted},
+            "stage_sizes": {"farthest_insertion": 5000}, "stage_counts": {"farthest_insertion": 1},
+        }
+        recalibrate(model, [record])
+        self.assertGreater(predict(model, "farthest_insertion", 5000)[0], predicted)
+        # Ponowne przeliczanie tego samego logu zbiega do pomiaru, a nie przesuwa modelu dalej
+        for _ in range(30):
+            recalibrate(model, [record])
+        self.assertAlmostEqual(predict(model, "farthest_insertion", 5000)[0], 2 * predicted, delta=0.01 * predicted)
+
+    assertValidTour = TourCorrectnessTest.assertValidTour
+
+
+class KernelTest(unittest.TestCase):
+    # Pętle (cel kompilacji Numby) i wersje NumPy muszą dawać identyczne wyniki,
+    # także przy remisach, których w zaokrąglonym EUC_2D jest sporo
+    def test_loop_and_numpy_kernels_agree(self):
+        rng = np.random.default_rng(0)
+        for num_nodes in (5, 50, 300):
+            with self.subTest(num_nodes=num_nodes):
+                points = rng.integers(0, 100, size=(num_nodes, 2)).astype(float)
+                matrix = kernels.euc_2d_matrix_loop(points)
+                self.assertTrue(np.array_equal(matrix, distance_matrix(points, "EUC_2D")))
+
+                order = kernels.nearest_neighbor_order_loop(matrix, 3)
+                self.assertEqual(order.tolist(), kernels.nearest_neighbor_order_numpy(matrix, 3).tolist())
+                tour = np.append(rng.permutation(num_nodes), 0)
+                self.assertEqual(
+                    kernels.best_two_opt_move_loop(tour, matrix), kernels.best_two_opt_move_numpy(tour, matrix)
+                )
+
+
+class TourOutputTest(unittest.TestCase):
+    def test_writers_round_trip(self):
+        tour = read_opt_tour("pr1002")
+        closed = tour + tour[:1]
+        with tempfile.TemporaryDirectory() as output_dir:
+            tour_path = os.path.join(output_dir, "pr1002.tour")
+            npy_path = os.path.join(output_dir, "pr1002.npy")
+            summary_path = os.path.join(output_dir, "summary.jsonl")
+            write_tsplib_tour(tour_path, "pr1002", closed)
+            write_npy_tour(npy_path, closed)
+            append_summary(summary_path, {"name": "pr1002", "cost": 259045.0})
+            append_summary(summary_path, {"name": "pr1002", "cost": 259046.0})
+
+            self.assertEqual(read_tsplib_tour(tour_path), tour)
+            self.assertEqual(np.load(npy_path).tolist(), tour)
+            with open(summary_path) as file:
+                records = [json.loads(line) for line in file]
+        self.assertEqual([record["cost"] for record in records], [259045.0, 259046.0])
+
+    def test_writers_reject_repeated_cities(self):
+        # Trasa jak z all16: zamknięte podtrasy partycji sklejone jedna za drugą
+        walk = [1, 2, 3, 1, 4, 5, 4]
+        with tempfile.TemporaryDirectory() as output_dir:
+            tour_path = os.path.join(output_dir, "walk.tour")
+            with self.assertRaises(ValueError):
+                write_tsplib_tour(tour_path, "walk", walk)
+            with self.assertRaises(ValueError):
+                write_npy_tour(os.path.join(output_dir, "walk.npy"), walk)
+            write_tsplib_tour(tour_path, "walk", shortcut_tour(walk))
+            self.assertEqual(read_tsplib_tour(tour_path), [1, 2, 3, 4, 5])
+
+
+class SolverServerTest(unittest.TestCase):
+    def test_server_solves_prioritises_and_cancels(self):
+        async def session(socket_path):
+            server = SolverServer(workers=1)
+            await server.start(socket_path=socket_path)
+            try:
+                return await request_jobs([
+                    {"id": "first", "file": instance_path("pr1002"), "max_time": 2},
+                    {"id": "low", "file": instance_path("lin105"), "priority": 5},
+                    {"id": "high", "file": instance_path("tsp225"), "priority": 0, "return_tour": True},
+                    {"op": "cancel", "id": "low"},
+                    {"id": "unknown", "file": instance_path("lin105"), "solver": "simulated"},
+                    {"id": "first", "file": instance_path("lin105")},
+                ], socket_path)
+            finally:
+                await server.close()
+
+        with tempfile.TemporaryDirectory() as socket_dir:
+            responses = asyncio.run(session(os.path.join(socket_dir, "solver.sock")))
+        duplicates = [response for response in responses if "duplicate" in response.get("error", "")]
+        self.assertEqual([response["id"] for response in duplicates], ["first"])
+        results = {response["id"]: response for response in responses
+                   if "cancel_requested" not in response and response not in duplicates}
+        self.assertTrue(results["low"]["cancelled"])
+        self.assertIn("unknown solver", results["unknown"]["error"])
+        self.assertFalse(results["high"]["cancelled"])
+        self.assertLess(results["first"]["cost"], 1.2 * OPTIMAL["pr1002"])
+
+        coordinates = load_instance("tsp225")
+        tour = results["high"]["tour"]
+        self.assertEqual(tour[0], tour[-1])
+        self.assertEqual(sorted(tour[:-1]), sorted(coordinates))
+        self.assertEqual(results["high"]["cost"], sum(
+            euc_2d(coordinates[tour[i]], coordinates[tour[i + 1]]) for i in range(len(tour) - 1)
+        ))
+
+
+    def test_running_job_stops_when_cancelled(self):
+        # Samo wstawianie dla 100 tys. miast trwa kilka sekund - anulowanie musi je przerwać
+        async def session(socket_path, file_path):
+            server = SolverServer(workers=1)
+            await server.start(socket_path=socket_path)
+
+            async def cancel_later():
+                await asyncio.sleep(1)
+                return await request_jobs([{"op": "cancel", "id": "long"}], socket_path)
+
+            try:
+                start_time = time.time()
+                (result,), _ = await asyncio.gather(
+                    request_jobs([{"id": "long", "file": file_path, "max_time": 60}], socket_path),
+                    cancel_later(),
+                )
+                return result, time.time() - start_time
+            finally:
+                await server.close()
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            file_path = os.path.join(work_dir, "uniform100000.tsp")
+            write_tsp_file(file_path, "uniform100000", uniform_instance(100000))
+            result, elapsed = asyncio.run(session(os.path.join(work_dir, "solver.sock"), file_path))
+        self.assertTrue(result["cancelled"])
+        self.assertLess(elapsed, 10)
+
+    def test_close_cancels_running_jobs(self):
+        # Zamknięcie serwera w trakcie długiego zadania: klient dostaje odpowiedź, a pętla
+        # zdarzeń działa (zegar tyka) przez całe zamykanie
+        async def session(socket_path, file_path):
+            server = SolverServer(workers=1)
+            await server.start(socket_path=socket_path)
+            ticks = []
+
+            async def ticker():
+                while True:
+                    ticks.append(time.time())
+                    await asyncio.sleep(0.05)
+
+            async def close_later():
+                await asyncio.sleep(1)
+                clock = asyncio.create_task(ticker())
+                start_time = time.time()
+                await server.close()
+                clock.cancel()
+                return time.time() - start_time
+
+            (result,), close_time = await asyncio.gather(
+                request_jobs([{"id": "long", "file": file_path, "max_time": 60}], socket_path),
+                close_later(),
+            )
+            return result, close_time, ticks
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            file_path = os.path.join(work_dir, "uniform100000.tsp")
+            write_tsp_file(file_path, "uniform100000", uniform_instance(100000))
+            result, close_time, ticks = asyncio.run(session(os.path.join(work_dir, "solver.sock"), file_path))
+        self.assertTrue(result["cancelled"])
+        self.assertLess(close_time, 10)
+        self.assertLess(max(np.diff(ticks), default=0), 1.0)
+
+def measure(solver, name):
+    start_time = time.perf_counter()
+    solver(name)
+    execution_time = time.perf_counter() - start_time
+    tracemalloc.start()
+    solver(name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return execution_time, peak / 2 ** 20
+
+
+class PerformanceRegressionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.record = os.environ.get("TSP_RECORD_BASELINES") == "1"
+        if os.path.exists(BASELINES_PATH):
+            with open(BASELINES_PATH) as file:
+                cls.baselines = json.load(file)
+        else:
+            cls.baselines = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.record:
+            with open(BASELINES_PATH, "w") as file:
+                json.dump(cls.baselines, file, indent=2, sort_keys=True)
+                file.write("\n")
+
+    def test_scaling_guard_flags_quadratic_pipeline(self):
+        sizes = [1000, 2000, 4000, 8000]
+        results = {
+            "farthest insertion": [(n, 1e-4 * n * np.log(n), 1.0) for n in sizes],
+            "two-level 2-opt": [(n, 1e-8 * n ** 2.5, 1.0) for n in sizes],
+        }
+        self.assertEqual([name for name, _, _ in scaling_regressions(results)], ["two-level 2-opt"])
+
+    def test_solvers_within_baseline(self):
+        for solver_name, (solver, instances) in PERFORMANCE_SOLVERS.items():
+            for name in instances:
+                with self.subTest(solver=solver_name, instance=name):
+                    execution_time, peak_memory = measure(solver, name)
+                    if self.record:
+                        self.baselines.setdefault(solver_name, {})[name] = {
+                            "time": round(execution_time, 4),
+                            "peak_mb": round(peak_memory, 2),
+                        }
+                        continue
+                    baseline = self.baselines.get(solver_name, {}).get(name)
+                    if baseline is None:
+                        self.skipTest(f"no baseline for {solver_name}/{name}")
+                    # Drobne czasy są zdominowane przez szum, stąd minimalny próg 50 ms
+                    self.assertLessEqual(
+                        execution_time, max(baseline["time"] * TIME_TOLERANCE, 0.05),
+                        f"{solver_name}/{name} slowed down: {execution_time:.3f} s vs {baseline['time']:.3f} s",
+                    )
+                    self.assertLessEqual(
+                        peak_memory, max(baseline["peak_mb"] * MEMORY_TOLERANCE, 1.0),
+                        f"{solver_name}/{name} uses more memory: {peak_memory:.1f} MB vs {baseline['peak_mb']:.1f} MB",
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,204 @@
+import os
+import random
+import time
+
+import numpy as np
+
+from genetic import adjacent, common_edges, links_to_tour
+from kernels import distance_matrix, nearest_neighbor_order
+from metrics import get_metric, read_tsp_instance, spatial_points, tour_length
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import get_diff_result
+from two_level_list import two_opt_or_opt
+
+# Łączenie tras krzyżowaniem podziałowym (GPX): w grafie sumy dwóch tras usuwamy krawędzie
+# wspólne, a w każdej spójnej składowej tego, co zostało, wybieramy tańszy z dwóch zestawów
+# ścieżek. Wszystko w czasie liniowym względem liczby miast.
+
+
+def differing_links(tour, other):
+    # Dla każdego miasta lista sąsiadów w tour po krawędziach, których nie ma w other
+    links = [[] for _ in range(len(tour))]
+    different = ~common_edges(tour, other)
+    for u, v in zip(tour[different].tolist(), np.roll(tour, -1)[different].tolist()):
+        links[u].append(v)
+        links[v].append(u)
+    return links
+
+
+def partition_components(first_links, second_links):
+    # Etykiety spójnych składowych grafu krawędzi różniących trasy (-1 - miasto bez takich krawędzi)
+    label = [-1] * len(first_links)
+    count = 0
+    for origin in range(len(first_links)):
+        if label[origin] >= 0 or not first_links[origin]:
+            continue
+        label[origin] = count
+        stack = [origin]
+        while stack:
+            city = stack.pop()
+            for other in first_links[city] + second_links[city]:
+                if label[other] < 0:
+                    label[other] = count
+                    stack.append(other)
+        count += 1
+    return label, count
+
+
+def portal_pairs(tour, label, count):
+    # Trasa przechodzi przez składową kilkoma ścieżkami (także po krawędziach wspólnych wewnątrz
+    # niej); ich końce to "portale". Zwraca dla każdej składowej zbiór par końców tych ścieżek.
+    pairs = [set() for _ in range(count)]
+    labels = label[tour]
+    starts = np.flatnonzero(labels != np.roll(labels, 1))
+    ends = (np.roll(starts, -1) - 1) % len(tour)
+    labels, tour = labels.tolist(), tour.tolist()
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if labels[start] >= 0:
+            pairs[labels[start]].add((min(tour[start], tour[end]), max(tour[start], tour[end])))
+    return pairs
+
+
+def split_vertices(first, second):
+    # Miasta, w których obie krawędzie first różnią się od krawędzi second, dzielimy jak w GPX2
+    # na v i kopię v' połączone krawędzią wspólną: w obu trasach poprzednik łączy się z v,
+    # a następnik z v'. Dzięki temu składowe rozpadają się na mniejsze.
+    num_nodes = len(first)
+    different = ~common_edges(first, second)
+    split = first[different & np.roll(different, 1)]
+    ghost = np.full(num_nodes, -1)
+    ghost[split] = num_nodes + np.arange(len(split))
+
+    def expand(tour):
+        is_split = ghost[tour] >= 0
+        positions = np.arange(num_nodes) + np.cumsum(is_split) - is_split
+        expanded = np.empty(num_nodes + len(split), dtype=np.int64)
+        expanded[positions] = tour
+        expanded[positions[is_split] + 1] = ghost[tour[is_split]]
+        return expanded
+
+    return expand(first), expand(second), split
+
+
+def partition_crossover(first, second, points, metric="EUC_2D"):
+    # first, second - otwarte trasy z indeksami miast. Zwraca trasę nie dłuższą od obu rodziców,
+    # jej długość oraz liczbę składowych (wszystkich i wybieralnych niezależnie). Kierunek second
+    # wpływa na podział miast, więc sprawdzamy oba.
+    first = np.asarray(first, dtype=np.int64)
+    second = np.asarray(second, dtype=np.int64)
+    best = None
+    for oriented in (second, second[::-1]):
+        expanded_first, expanded_second, split = split_vertices(first, oriented)
+        expanded_points = np.vstack([points, points[split]])
+        child, _, count, feasible = split_crossover(expanded_first, expanded_second, expanded_points, metric)
+        # Koszt bez kopii miast: w metryce GEO nawet krawędź do kopii ma długość 1
+        child = [city for city in child if city < len(first)]
+        cost = tour_length(points, child, metric)
+        if best is None or cost < best[1]:
+            best = (child, cost, count, feasible)
+    return best
+
+
+def split_crossover(first, second, points, metric="EUC_2D"):
+    # GPX na trasach po podziale miast. Składowa, w której obie trasy łączą te same pary
+    # portali, może wziąć ścieżki z dowolnej trasy bez tworzenia podtras; pozostałe
+    # składowe bierzemy razem z jednej trasy.
+    first_links = differing_links(first, second)
+    second_links = differing_links(second, first)
+    label, count = partition_components(first_links, second_links)
+    if count == 0:
+        return first.tolist(), tour_length(points, first, metric), 0, 0
+
+    label = np.array(label)
+    side_costs = []
+    for tour, other in ((first, second), (second, first)):
+        different = ~common_edges(tour, other)
+        u, v = tour[different], np.roll(tour, -1)[different]
+        lengths = get_metric(metric)(points[u], points[v])
+        side_costs.append(np.bincount(label[u], weights=lengths, minlength=count))
+    first_cost, second_cost = side_costs
+
+    feasible = np.array([
+        first_pairs == second_pairs
+        for first_pairs, second_pairs in zip(
+            portal_pairs(first, label, count), portal_pairs(second, label, count)
+        )
+    ])
+    use_second = feasible & (second_cost < first_cost)
+    if second_cost[~feasible].sum() < first_cost[~feasible].sum():
+        use_second |= ~feasible
+
+    succ, pred = adjacent(first)
+    links = [[following, previous] for following, previous in zip(succ.tolist(), pred.tolist())]
+    for city in np.flatnonzero(label >= 0).tolist():
+        links[city] = [other for other in links[city] if other not in first_links[city]]
+        if use_second[label[city]]:
+            links[city] += second_links[city]
+        else:
+            links[city] += first_links[city]
+    child = links_to_tour(links)
+    return child, tour_length(points, child, metric), count, int(feasible.sum())
+
+
+def merge_tours(coordinates, tours, metric="EUC_2D"):
+    # tours - zamknięte trasy z numerami miast (jak zwracają solvery w repo). Trasy łączymy
+    # kolejno, zaczynając od najkrótszej; wynik nie jest dłuższy od najlepszej z nich.
+    start_time = time.time()
+    node_ids, points = coordinates_to_array(coordinates)
+    index_of = {node_id: idx for idx, node_id in enumerate(node_ids)}
+    tours = [np.array([index_of[node_id] for node_id in tour[:-1]]) for tour in tours]
+    tours.sort(key=lambda tour: tour_length(points, tour, metric))
+
+    merged, total_cost = tours[0], tour_length(points, tours[0], metric)
+    for tour in tours[1:]:
+        merged, total_cost, _, _ = partition_crossover(merged, tour, points, metric)
+    merged = [node_ids[idx] for idx in merged]
+    merged.append(merged[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return merged, total_cost, execution_time
+
+
+def multi_start_nearest_neighbor(coordinates, runs=20, seed=None, metric="EUC_2D"):
+    # Najbliższy sąsiad z losowych miast startowych, jak w kolejnych uruchomieniach all_classic.py
+    rng = random.Random(seed)
+    node_ids, points = coordinates_to_array(coordinates)
+    matrix = distance_matrix(points, metric)
+    tours = []
+    for _ in range(runs):
+        order = nearest_neighbor_order(matrix, rng.randrange(len(node_ids))).tolist()
+        tours.append([node_ids[idx] for idx in order + order[:1]])
+    return tours
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+    ]
+    for file_path in files:
+        tsp_name, coordinates, metric = read_tsp_instance(file_path)
+        node_ids, points = coordinates_to_array(coordinates)
+        index_of = {node_id: idx for idx, node_id in enumerate(node_ids)}
+        search_points = spatial_points(points, metric)
+        neighbors = nearest_neighbor_lists(search_points, k=8)
+        tours = multi_start_nearest_neighbor(coordinates, runs=20, seed=0, metric=metric)
+        # Te same starty poprawione 2-opt/Or-opt - lokalne optima łączą się znacznie lepiej
+        improved = []
+        for tour in tours:
+            order = two_opt_or_opt(search_points, [index_of[node_id] for node_id in tour[:-1]], neighbors).to_list()
+            improved.append([node_ids[idx] for idx in order + order[:1]])
+        print(f"TSP Name: {tsp_name}")
+        for label, group in (("nearest neighbor", tours), ("nearest neighbor + 2-opt/Or-opt", improved)):
+            best_single = min(tour_length(points, [index_of[node_id] for node_id in tour[:-1]], metric) for tour in group)
+            tour, tour_cost_value, execution_time = merge_tours(coordinates, group, metric)
+            total_execution_time += execution_time
+            print(f"{label}: best of {len(group)} tours {best_single:.1f} "
+                  f"({get_diff_result(os.path.basename(file_path), best_single)}), merged {tour_cost_value:.1f} "
+                  f"({get_diff_result(os.path.basename(file_path), tour_cost_value)}) in {execution_time:.3f} s")
+    print(f"Total Execution Time: {total_execution_time} seconds")
@@ -0,0 +1,102 @@
+import json
+import os
+import time
+
+import numpy as np
+
+# Zapis wyników zamiast drukowania całej trasy na stdout. Domyślnie powstaje tylko
+# podsumowanie JSON-lines; TSP_OUTPUT_FORMATS="jsonl,tour,npy" włącza pozostałe formaty,
+# a TSP_PRINT_TOUR=1 przywraca drukowanie listy miast.
+OUTPUT_DIR = "results"
+BUFFER_SIZE = 1 << 20
+
+
+def open_tour(tour):
+    # Trasy w repo są zamknięte (ostatnie miasto = pierwsze), pliki trzymają permutację
+    if len(tour) > 1 and tour[0] == tour[-1]:
+        return tour[:-1]
+    return tour
+
+
+def permutation_tour(tour):
+    # Plik TOUR musi zawierać każde miasto dokładnie raz; trasy sklejane z zamkniętych
+    # podtras (all16) powtarzają miasta i trzeba je najpierw skrócić (shortcut_tour)
+    tour = open_tour(tour)
+    if np.unique(np.asarray(tour)).size != len(tour):
+        raise ValueError("Tour visits some cities more than once")
+    return tour
+
+
+def shortcut_tour(tour):
+    # Pomija kolejne wizyty w tym samym mieście, zostawiając pierwszą; wynik jest zamknięty
+    tour = list(dict.fromkeys(tour))
+    return tour + tour[:1]
+
+
+def write_tsplib_tour(file_path, name, tour, comment=""):
+    tour = permutation_tour(tour)
+    header = (
+        f"NAME : {name}.tour\n"
+        f"COMMENT : {comment or f'Tour for {name}'}\n"
+        "TYPE : TOUR\n"
+        f"DIMENSION : {len(tour)}\n"
+        "TOUR_SECTION\n"
+    )
+    body = "\n".join(map(str, np.asarray(tour).tolist()))
+    with open(file_path, "w", buffering=BUFFER_SIZE) as file:
+        file.write(header)
+        file.write(body)
+        file.write("\n-1\nEOF\n")
+
+
+def read_tsplib_tour(file_path):
+    with open(file_path) as file:
+        tokens = file.read().split("TOUR_SECTION")[1].split()
+    tour = []
+    for token in tokens:
+        if token in ("-1", "EOF"):
+            break
+        tour.append(int(token))
+    return tour
+
+
+def write_npy_tour(file_path, tour):
+    tour = np.asarray(permutation_tour(tour))
+    dtype = np.int32 if len(tour) == 0 or tour.max() < 2 ** 31 else np.int64
+    np.save(file_path, tour.astype(dtype))
+
+
+def append_summary(file_path, record):
+    with open(file_path, "a", buffering=BUFFER_SIZE) as file:
+        file.write(json.dumps(record) + "\n")
+
+
+def output_formats():
+    return [fmt.strip() for fmt in os.environ.get("TSP_OUTPUT_FORMATS", "jsonl").split(",") if fmt.strip()]
+
+
+def save_result(solver, tsp_name, tour, tour_cost, execution_time, output_dir=OUTPUT_DIR, formats=None, **extra):
+    formats = output_formats() if formats is None else formats
+    if os.environ.get("TSP_PRINT_TOUR") == "1":
+        print(f"Tour: {list(tour)}")
+    if not formats:
+        return
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    if "tour" in formats:
+        write_tsplib_tour(os.path.join(output_dir, f"{tsp_name}.{solver}.tour"), tsp_name, tour,
+                          comment=f"{solver}, length {tour_cost}")
+    if "npy" in formats:
+        write_npy_tour(os.path.join(output_dir, f"{tsp_name}.{solver}.npy"), tour)
+    if "jsonl" in formats:
+        record = {
+            "solver": solver,
+            "name": tsp_name,
+            "dimension": len(open_tour(tour)),
+            "cost": float(tour_cost),
+            "time": execution_time,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        record.update(extra)
+        append_summary(os.path.join(output_dir, "summary.jsonl"), record)
@@ -0,0 +1,162 @@
+import json
+import os
+import random
+import sqlite3
+import time
+
+import numpy as np
+
+from anytime import anytime_two_opt, instance_fingerprint
+from insertion import insertion_tour
+from neighbors import coordinates_to_array
+from metrics import read_tsp_instance, spatial_points, tour_length
+from show_quality import get_diff_result
+
+# Magazyn najlepszych znanych tras: SQLite z kosztami, konfiguracją i czasami
+# oraz pliki .npy z permutacjami (indeksy w kolejności miast z coordinates_to_array,
+# czyli kolejności wczytania z pliku),
+# kluczem jest skrót zawartości instancji, a nie nazwa pliku
+STORE_DIR = "tour_store"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    hash TEXT PRIMARY KEY,
+    name TEXT,
+    dimension INTEGER,
+    best_cost REAL,
+    best_solver TEXT,
+    best_config TEXT,
+    updated TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT,
+    solver TEXT,
+    config TEXT,
+    cost REAL,
+    warm_start INTEGER,
+    construction_time REAL,
+    improvement_time REAL,
+    timestamp TEXT
+);
+"""
+
+
+def instance_hash(node_ids, points):
+    return instance_fingerprint(node_ids, points).hex()
+
+
+class TourStore:
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+        if not os.path.exists(os.path.join(directory, "tours")):
+            os.makedirs(os.path.join(directory, "tours"))
+        self.connection = sqlite3.connect(os.path.join(directory, "store.db"))
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def tour_path(self, key):
+        return os.path.join(self.directory, "tours", f"{key}.npy")
+
+    def best(self, key):
+        row = self.connection.execute(
+            "SELECT best_cost, best_solver, best_config FROM instances WHERE hash = ?", (key,)
+        ).fetchone()
+        if row is None or not os.path.exists(self.tour_path(key)):
+            return None
+        cost, solver, config = row
+        return np.load(self.tour_path(key)).tolist(), cost, solver, json.loads(config)
+
+    def record(self, key, name, tour, cost, solver, config, construction_time, improvement_time, warm_start=False):
+        # Zwraca True, jeśli trasa jest nowym rekordem dla tej instancji
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO runs (hash, solver, config, cost, warm_start, construction_time, improvement_time, timestamp)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, solver, json.dumps(config), cost, int(warm_start), construction_time, improvement_time, timestamp),
+            )
+            row = self.connection.execute("SELECT best_cost FROM instances WHERE hash = ?", (key,)).fetchone()
+            if row is not None and row[0] <= cost:
+                return False
+            # Plik trasy zapisujemy atomowo przed aktualizacją wiersza, żeby baza
+            # nigdy nie wskazywała na niedokończony plik
+            temporary_path = self.tour_path(key) + ".tmp.npy"
+            np.save(temporary_path, np.asarray(tour, dtype=np.int32))
+            os.replace(temporary_path, self.tour_path(key))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO instances (hash, name, dimension, best_cost, best_solver, best_config, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, name, len(tour), cost, solver, json.dumps(config), timestamp),
+            )
+        return True
+
+    def history(self, key):
+        return self.connection.execute(
+            "SELECT solver, cost, warm_start, construction_time, improvement_time, timestamp"
+            " FROM runs WHERE hash = ? ORDER BY id", (key,)
+        ).fetchall()
+
+
+def warm_start_tsp(coordinates, name="", store=None, max_time=50, seed=None, metric="EUC_2D"):
+    # Jeśli magazyn zna tę instancję, lokalne przeszukiwanie startuje od najlepszej
+    # zapisanej trasy; w przeciwnym razie budujemy ją od zera (farthest insertion).
+    # Koszty w magazynie są w metryce instancji, jak optima TSPLIB.
+    start_time = time.time()
+    own_store = store is None
+    store = store or TourStore()
+    node_ids, points = coordinates_to_array(coordinates)
+    key = instance_hash(node_ids, points)
+    search_points = spatial_points(points, metric)
+
+    stored = store.best(key)
+    if stored is not None:
+        tour, constructor = stored[0], "stored"
+    else:
+        tour, constructor = insertion_tour(search_points, method="farthest"), "farthest_insertion"
+    construction_time = time.time() - start_time
+
+    remaining = max_time - construction_time
+    tour, _, iteration = anytime_two_opt(search_points, tour, max_time=remaining, rng=random.Random(seed))
+    total_cost = tour_length(points, tour, metric)
+    improvement_time = time.time() - start_time - construction_time
+
+    config = {"constructor": constructor, "improvement": "anytime_two_opt", "max_time": max_time,
+              "seed": seed, "iterations": iteration}
+    store.record(key, name, tour, total_cost, "warm_start_tsp", config, construction_time, improvement_time,
+                 warm_start=stored is not None)
+    if own_store:
+        store.close()
+
+    tour = [node_ids[idx] for idx in tour]
+    tour.append(tour[0])
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+    ]
+    store = TourStore()
+    for file_path in files:
+        tsp_name, coordinates, metric = read_tsp_instance(file_path)
+        # Dwa uruchomienia pod rząd: drugie tylko poprawia trasę z pierwszego
+        for run in range(2):
+            tour, tour_cost, execution_time = warm_start_tsp(coordinates, tsp_name, store=store, max_time=10, metric=metric)
+            total_execution_time += execution_time
+            print(f"TSP Name: {tsp_name} (run {run + 1})")
+            print(f"Tour cost: {tour_cost}")
+            print(f"Difference from optimal: {get_diff_result(os.path.basename(file_path), tour_cost)}")
+            print(f"Execution time: {execution_time} seconds")
+    store.close()
+    print(f"Total Execution Time: {total_execution_time} seconds")
@@ -0,0 +1,425 @@
+import math
+import os
+import time
+from array import array
+
+import numpy as np
+
+from metrics import distances_from, read_tsp_instance, spatial_points, tour_length
+from neighbors import coordinates_to_array, nearest_neighbor_lists
+from show_quality import get_diff_result
+
+
+class TwoLevelList:
+    # Trasa podzielona na ~sqrt(n) segmentów. Każdy segment ma bit odwrócenia,
+    # więc odwrócenie fragmentu trasy to rozcięcie co najwyżej dwóch segmentów
+    # i odwrócenie kolejności segmentów pomiędzy nimi - O(sqrt(n)) zamiast O(n).
+    __slots__ = (
+        "num_nodes",
+        "group_size",
+        "segments",
+        "seg_reversed",
+        "seg_rank",
+        "order",
+        "city_seg",
+        "city_pos",
+    )
+
+    def __init__(self, tour):
+        self.num_nodes = len(tour)
+        self.group_size = max(8, int(math.sqrt(self.num_nodes)))
+        self.city_seg = array("i", bytes(4 * self.num_nodes))
+        self.city_pos = array("i", bytes(4 * self.num_nodes))
+        self._build(tour)
+
+    def _build(self, tour):
+        self.segments = []
+        self.seg_reversed = array("b")
+        for start in range(0, len(tour), self.group_size):
+            self._add_segment(array("i", tour[start:start + self.group_size]), 0)
+        self.order = list(range(len(self.segments)))
+        self.seg_rank = array("i", self.order)
+
+    def _add_segment(self, cities, reversed_flag):
+        seg_id = len(self.segments)
+        self.segments.append(cities)
+        self.seg_reversed.append(reversed_flag)
+        city_seg = self.city_seg
+        city_pos = self.city_pos
+        for pos, city in enumerate(cities):
+            city_seg[city] = seg_id
+            city_pos[city] = pos
+        return seg_id
+
+    def __len__(self):
+        return self.num_nodes
+
+    def __iter__(self):
+        for seg_id in self.order:
+            cities = self.segments[seg_id]
+            if self.seg_reversed[seg_id]:
+                yield from reversed(cities)
+            else:
+                yield from cities
+
+    def to_list(self, start=None):
+        tour = list(self)
+        if start is not None:
+            idx = tour.index(start)
+            tour = tour[idx:] + tour[:idx]
+        return tour
+
+    def _logical_pos(self, city):
+        seg_id = self.city_seg[city]
+        if self.seg_reversed[seg_id]:
+            return len(self.segments[seg_id]) - 1 - self.city_pos[city]
+        return self.city_pos[city]
+
+    def _key(self, city):
+        return self.seg_rank[self.city_seg[city]], self._logical_pos(city)
+
+    def _first(self, seg_id):
+        cities = self.segments[seg_id]
+        return cities[-1] if self.seg_reversed[seg_id] else cities[0]
+
+    def _last(self, seg_id):
+        cities = self.segments[seg_id]
+        return cities[0] if self.seg_reversed[seg_id] else cities[-1]
+
+    def next(self, city):
+        seg_id = self.city_seg[city]
+        cities = self.segments[seg_id]
+        pos = self.city_pos[city]
+        if self.seg_reversed[seg_id]:
+            if pos > 0:
+                return cities[pos - 1]
+        elif pos + 1 < len(cities):
+            return cities[pos + 1]
+        rank = self.seg_rank[seg_id] + 1
+        return self._first(self.order[rank if rank < len(self.order) else 0])
+
+    def prev(self, city):
+        seg_id = self.city_seg[city]
+        cities = self.segments[seg_id]
+        pos = self.city_pos[city]
+        if self.seg_reversed[seg_id]:
+            if pos + 1 < len(cities):
+                return cities[pos + 1]
+        elif pos > 0:
+            return cities[pos - 1]
+        return self._last(self.order[self.seg_rank[seg_id] - 1])
+
+    def between(self, a, b, c):
+        # Czy idąc od a w kierunku next dojdziemy do b, zanim miniemy c
+        key_a, key_b, key_c = self._key(a), self._key(b), self._key(c)
+        if key_a <= key_c:
+            return key_a <= key_b <= key_c
+        return key_b >= key_a or key_b <= key_c
+
+    def sequence(self, a, b, c):
+        return self.between(a, b, c)
+
+    def _split(self, seg_id, logical_pos):
+        # Rozcina segment tak, żeby miasto na pozycji logical_pos zaczynało nowy segment
+        cities = self.segments[seg_id]
+        if logical_pos <= 0 or logical_pos >= len(cities):
+            return
+        if self.seg_reversed[seg_id]:
+            cities = cities[::-1]
+        head, tail = cities[:logical_pos], cities[logical_pos:]
+        self.segments[seg_id] = head
+        self.seg_reversed[seg_id] = 0
+        city_pos = self.city_pos
+        for pos, city in enumerate(head):
+            city_pos[city] = pos
+        new_id = self._add_segment(tail, 0)
+        rank = self.seg_rank[seg_id] + 1
+        self.order.insert(rank, new_id)
+        self.seg_rank.append(0)
+        self._renumber(rank)
+
+    def _renumber(self, start_rank=0):
+        seg_rank = self.seg_rank
+        order = self.order
+        for rank in range(start_rank, len(order)):
+            seg_rank[order[rank]] = rank
+
+    def reverse(self, a, b):
+        # Odwraca fragment trasy od a do b (w kierunku next). Jeśli fragment obejmuje
+        # więcej niż połowę segmentów, odwracamy dopełnienie - cykl jest ten sam,
+        # zmienia się tylko jego orientacja.
+        if a == b:
+            return
+        seg_a, seg_b = self.city_seg[a], self.city_seg[b]
+        if seg_a == seg_b and self._logical_pos(a) <= self._logical_pos(b):
+            self._reverse_inside(seg_a, a, b)
+            return
+
+        num_segments = len(self.order)
+        span = (self.seg_rank[seg_b] - self.seg_rank[seg_a]) % num_segments
+        if 2 * span > num_segments:
+            a, b = self.next(b), self.prev(a)
+            if self.prev(a) == b:
+                self.order.reverse()
+                for seg_id in self.order:
+                    self.seg_reversed[seg_id] ^= 1
+                self._renumber()
+                return
+            if a == b:
+                return
+            seg_a, seg_b = self.city_seg[a], self.city_seg[b]
+            if seg_a == seg_b and self._logical_pos(a) <= self._logical_pos(b):
+                self._reverse_inside(seg_a, a, b)
+                return
+
+        self._split(self.city_seg[a], self._logical_pos(a))
+        self._split(self.city_seg[b], self._logical_pos(b) + 1)
+        rank_a = self.seg_rank[self.city_seg[a]]
+        rank_b = self.seg_rank[self.city_seg[b]]
+
+        order = self.order
+        if rank_a <= rank_b:
+            middle = order[rank_a:rank_b + 1]
+            middle.reverse()
+            order[rank_a:rank_b + 1] = middle
+            self._flip(middle)
+            self._renumber(rank_a)
+        else:
+            # Fragment przechodzi przez koniec listy segmentów
+            middle = order[rank_a:] + order[:rank_b + 1]
+            middle.reverse()
+            self.order = middle + order[rank_b + 1:rank_a]
+            self._flip(middle)
+            self._renumber()
+
+        if len(self.order) > 2 * (self.num_nodes // self.group_size + 1):
+            self._build(list(self))
+
+    def exchange(self, x1, y1, x2, y2):
+        # Ruch 2-opt niezależny od orientacji: krawędzie (x1, y1), (x2, y2)
+        # zastępujemy krawędziami (x1, x2), (y1, y2)
+        if self.next(x1) == y1:
+            self.reverse(y1, x2)
+        else:
+            self.reverse(x2, y1)
+
+    def _flip(self, seg_ids):
+        for seg_id in seg_ids:
+            self.seg_reversed[seg_id] ^= 1
+
+    def _reverse_inside(self, seg_id, a, b):
+        cities = self.segments[seg_id]
+        i, j = self.city_pos[a], self.city_pos[b]
+        if i > j:
+            i, j = j, i
+        cities[i:j + 1] = cities[i:j + 1][::-1]
+        city_pos = self.city_pos
+        for pos in range(i, j + 1):
+            city_pos[cities[pos]] = pos
+
+
+def two_opt_pass(tour_list, x, y, neighbor_rows, active, max_time=50, journal=None):
+    # 2-opt z listami sąsiadów i bitami "don't look" na istniejącej TwoLevelList, zaczynając
+    # od miast active. Zwraca zmianę kosztu; ruchy (x1, y1, x2, y2) dopisuje do journal,
+    # żeby można je było cofnąć (undo_exchanges). Koszt zależy od liczby ruchów, nie od n.
+    start_time = time.time()
+
+    def dist(u, v):
+        return math.hypot(x[u] - x[v], y[u] - y[v])
+
+    queue = list(active)
+    queued = set(queue)
+    total = 0.0
+    while queue and time.time() - start_time < max_time:
+        a = queue.pop()
+        queued.discard(a)
+        for direction in (0, 1):
+            b = tour_list.next(a) if direction == 0 else tour_list.prev(a)
+            d_ab = dist(a, b)
+            improved = False
+            for c in neighbor_rows[a]:
+                d_ac = dist(a, c)
+                if d_ac >= d_ab:
+                    break
+                d = tour_list.next(c) if direction == 0 else tour_list.prev(c)
+                if c == b or d == a:
+                    continue
+                delta = d_ac + dist(b, d) - d_ab - dist(c, d)
+                if delta < -1e-9:
+                    tour_list.exchange(a, b, c, d)
+                    if journal is not None:
+                        journal.append((a, b, c, d))
+                    total += delta
+                    for city in (a, b, c, d):
+                        if city not in queued:
+                            queued.add(city)
+                            queue.append(city)
+                    improved = True
+                    break
+            if improved:
+                break
+    return total
+
+
+def undo_exchanges(tour_list, journal):
+    # Ruch exchange(x1, y1, x2, y2) cofa exchange(x1, x2, y1, y2); cofamy od końca
+    for x1, y1, x2, y2 in reversed(journal):
+        tour_list.exchange(x1, x2, y1, y2)
+
+
+def two_opt_two_level(points, tour, neighbors, max_time=50, active=None):
+    # active - miasta, od których zaczynamy (domyślnie wszystkie)
+    tour_list = TwoLevelList(tour)
+    x, y = points[:, 0].tolist(), points[:, 1].tolist()
+    two_opt_pass(tour_list, x, y, neighbors.tolist(), tour if active is None else active, max_time=max_time)
+    return tour_list.to_list(start=tour[0])
+
+
+def two_opt_or_opt(points, tour, neighbors, max_time=50, active=None, distance=None, max_segment=3,
+                   should_stop=None):
+    # 2-opt + Or-opt (przenoszenie fragmentów do max_segment miast) na TwoLevelList.
+    # Or-opt jest złożony z dwóch lub trzech ruchów 2-opt, więc działa przy dowolnej orientacji.
+    # distance(u, v) pozwala podać inną metrykę niż euklidesowa; should_stop() jest sprawdzane
+    # co 256 miast z kolejki i pozwala przerwać pracę z zewnątrz (np. anulowanie zadania).
+    start_time = time.time()
+    tour_list = tour if isinstance(tour, TwoLevelList) else TwoLevelList(tour)
+    num_nodes = len(tour_list)
+    neighbor_rows = neighbors.tolist()
+    if distance is None:
+        x, y = points[:, 0].tolist(), points[:, 1].tolist()
+
+        def distance(u, v):
+            return math.hypot(x[u] - x[v], y[u] - y[v])
+
+    queue = list(tour_list if active is None else active)
+    in_queue = bytearray(num_nodes)
+    for city in queue:
+        in_queue[city] = 1
+
+    def push(*cities):
+        for city in cities:
+            if not in_queue[city]:
+                in_queue[city] = 1
+                queue.append(city)
+
+    def try_two_opt(a):
+        for succ in (tour_list.next, tour_list.prev):
+            b = succ(a)
+            d_ab = distance(a, b)
+            for c in neighbor_rows[a]:
+                d_ac = distance(a, c)
+                if d_ac >= d_ab:
+                    break
+                d = succ(c)
+                if c == b or d == a:
+                    continue
+                if d_ac + distance(b, d) - d_ab - distance(c, d) < -1e-9:
+                    tour_list.exchange(a, b, c, d)
+                    push(a, b, c, d)
+                    return True
+        return False
+
+    def try_or_opt(s1):
+        if num_nodes < 8:
+            return False
+        for length in range(1, max_segment + 1):
+            segment = [s1]
+            for _ in range(length - 1):
+                segment.append(tour_list.next(segment[-1]))
+            s2 = segment[-1]
+            p, n = tour_list.prev(s1), tour_list.next(s2)
+            if p in segment or n in segment:
+                return False
+            removed_gain = distance(p, s1) + distance(s2, n) - distance(p, n)
+            if removed_gain <= 1e-9:
+                continue
+            for end in (s1, s2):
+                for c in neighbor_rows[end]:
+                    if distance(end, c) >= removed_gain:
+                        break
+                    if c in segment:
+                        continue
+                    for d in (tour_list.next(c), tour_list.prev(c)):
+                        if d in segment or {c, d} == {p, n}:
+                            continue
+                        # Wstawienie między c i d w obu orientacjach fragmentu
+                        first, last = (c, d) if tour_list.next(c) == d else (d, c)
+                        d_first_last = distance(first, last)
+                        forward = distance(first, s1) + distance(s2, last) - d_first_last
+                        backward = distance(first, s2) + distance(s1, last) - d_first_last
+                        if min(forward, backward) < removed_gain - 1e-9:
+                            # Kolejne wymiany krawędzi: (p,s1),(first,last) -> (p,first),(s1,last),
+                            # potem (p,first),(s2,n) -> (p,n),(first,s2)
+                            if tour_list.next(p) == s1:
+                                tour_list.exchange(p, s1, first, last)
+                            else:
+                                tour_list.exchange(s1, p, last, first)
+                            tour_list.exchange(p, first, n, s2)
+                            if forward < backward:
+                                tour_list.exchange(first, s2, s1, last)
+                            push(p, n, s1, s2, c, d)
+                            return True
+        return False
+
+    steps = 0
+    while queue and time.time() - start_time < max_time:
+        steps += 1
+        if should_stop is not None and steps % 256 == 0 and should_stop():
+            break
+        a = queue.pop()
+        in_queue[a] = 0
+        if try_two_opt(a) or try_or_opt(a):
+            push(a)
+
+    return tour_list
+
+
+def nearest_neighbor_two_level_tsp(coordinates, max_time=50, metric="EUC_2D"):
+    start_time = time.time()
+    node_ids, points = coordinates_to_array(coordinates)
+    num_nodes = len(node_ids)
+
+    # Najbliższy sąsiad na macierzy odległości liczonej wierszami (w metryce instancji);
+    # 2-opt działa na współrzędnych z spatial_points
+    visited = np.zeros(num_nodes, dtype=bool)
+    tour = [0]
+    visited[0] = True
+    for _ in range(num_nodes - 1):
+        row = distances_from(points, points[tour[-1]], metric)
+        row[visited] = np.inf
+        nearest_neighbor = int(np.argmin(row))
+        tour.append(nearest_neighbor)
+        visited[nearest_neighbor] = True
+
+    search_points = spatial_points(points, metric)
+    neighbors = nearest_neighbor_lists(search_points, k=8)
+    tour = two_opt_two_level(search_points, tour, neighbors, max_time=max_time)
+    total_cost = tour_length(points, tour, metric)
+    tour.append(tour[0])
+    tour = [node_ids[idx] for idx in tour]
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return tour, total_cost, execution_time
+
+
+if __name__ == "__main__":
+    total_execution_time = 0
+    files = [
+        "files/lin105.tsp",
+        "files/tsp225.tsp",
+        "files/pr1002.tsp",
+        "files/pr2392.tsp",
+        "files/rl5934.tsp",
+    ]
+    for file_path in files:
+        tsp_name, coordinates, metric = read_tsp_instance(file_path)
+        tour, tour_cost, execution_time = nearest_neighbor_two_level_tsp(coordinates, metric=metric)
+        total_execution_time += execution_time
+        diff_result = get_diff_result(os.path.basename(file_path), tour_cost)
+        print(f"TSP Name: {tsp_name}")
+        print(f"Tour cost: {tour_cost}")
+        print(f"Difference from optimal: {diff_result}")
+        print(f"Execution time: {execution_time} seconds")
+    print(f"Total Execution Time: {total_execution_time} seconds")